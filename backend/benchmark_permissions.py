@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del sistema de permisos
+Compara la implementación anterior (sets de Enum + dict de secciones por
+llamada) con los bitmasks compilados de utils/permissions.py
+Ejecutar con: python benchmark_permissions.py [iteraciones]
+"""
+
+import sys
+import timeit
+from typing import Callable, Dict, List
+
+from utils.permissions import (
+    Permission,
+    ROLE_PERMISSIONS,
+    can_access_section,
+    get_permissions_payload,
+    has_all_permissions,
+    has_any_permission,
+    has_permission,
+)
+
+ROLE = "agente_restaurante"
+ANY_PERMS = [Permission.VIEW_MIEMBROS, Permission.CREATE_SALES]
+ALL_PERMS = [Permission.VIEW_POS, Permission.CREATE_SALES, Permission.MANAGE_PAYMENTS]
+
+# ============= IMPLEMENTACIÓN ANTERIOR (referencia) =============
+
+def legacy_has_permission(role: str, permission: Permission) -> bool:
+    return permission in ROLE_PERMISSIONS.get(role, set())
+
+def legacy_has_any_permission(role: str, permissions: List[Permission]) -> bool:
+    role_perms = ROLE_PERMISSIONS.get(role, set())
+    return any(perm in role_perms for perm in permissions)
+
+def legacy_has_all_permissions(role: str, permissions: List[Permission]) -> bool:
+    role_perms = ROLE_PERMISSIONS.get(role, set())
+    return all(perm in role_perms for perm in permissions)
+
+def legacy_can_access_section(role: str, section: str) -> bool:
+    section_permissions = {
+        "dashboard": [Permission.VIEW_DASHBOARD],
+        "miembros": [Permission.VIEW_MIEMBROS],
+        "grupos": [Permission.VIEW_GRUPOS],
+        "pos": [Permission.VIEW_POS],
+        "admin": [Permission.MANAGE_USERS, Permission.MANAGE_INVITES],
+    }
+    return legacy_has_any_permission(role, section_permissions.get(section, []))
+
+def legacy_permissions_payload(role: str) -> Dict:
+    return {
+        "role": role,
+        "permissions": [perm.value for perm in ROLE_PERMISSIONS.get(role, set())],
+        "sections": {
+            section: legacy_can_access_section(role, section)
+            for section in ("dashboard", "miembros", "grupos", "pos", "admin")
+        },
+    }
+
+# ============= BENCHMARK =============
+
+CASES = [
+    ("has_permission", lambda: legacy_has_permission(ROLE, Permission.CREATE_SALES),
+                       lambda: has_permission(ROLE, Permission.CREATE_SALES)),
+    ("has_any_permission", lambda: legacy_has_any_permission(ROLE, ANY_PERMS),
+                           lambda: has_any_permission(ROLE, ANY_PERMS)),
+    ("has_all_permissions", lambda: legacy_has_all_permissions(ROLE, ALL_PERMS),
+                            lambda: has_all_permissions(ROLE, ALL_PERMS)),
+    ("can_access_section", lambda: legacy_can_access_section(ROLE, "pos"),
+                           lambda: can_access_section(ROLE, "pos")),
+    ("/auth/permissions payload", lambda: legacy_permissions_payload(ROLE),
+                                  lambda: get_permissions_payload(ROLE)),
+]
+
+def measure(fn: Callable[[], object], number: int) -> float:
+    """Mejor de 5 corridas, en nanosegundos por llamada"""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e9
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    # Las dos implementaciones deben coincidir antes de comparar tiempos
+    for role in ROLE_PERMISSIONS:
+        for perm in Permission:
+            assert legacy_has_permission(role, perm) == has_permission(role, perm)
+        for section in ("dashboard", "miembros", "grupos", "pos", "admin", "inexistente"):
+            assert legacy_can_access_section(role, section) == can_access_section(role, section)
+        assert legacy_has_any_permission(role, ANY_PERMS) == has_any_permission(role, ANY_PERMS)
+        assert legacy_has_all_permissions(role, ALL_PERMS) == has_all_permissions(role, ALL_PERMS)
+        legacy = legacy_permissions_payload(role)
+        compiled = get_permissions_payload(role)
+        assert set(legacy["permissions"]) == set(compiled["permissions"])
+        assert legacy["sections"] == compiled["sections"]
+
+    print("=" * 64)
+    print(f"🔐 Benchmark de permisos ({number:,} iteraciones, rol: {ROLE})")
+    print("=" * 64)
+    print(f"{'caso':<28}{'anterior':>12}{'bitmask':>12}{'speedup':>10}")
+    for name, legacy_fn, compiled_fn in CASES:
+        legacy_ns = measure(legacy_fn, number)
+        compiled_ns = measure(compiled_fn, number)
+        speedup = legacy_ns / compiled_ns if compiled_ns > 0 else 0
+        print(f"{name:<28}{legacy_ns:>10.0f}ns{compiled_ns:>10.0f}ns{speedup:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
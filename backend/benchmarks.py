@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks de los caminos calientes en Python puro
+Mide, sin base de datos ni red:
+
+- core/cache.py: _generate_cache_key y SimpleCache.get/set
+- utils/permissions.py: has_permission, has_any_permission, can_access_section
+- reporte_ventas / reporte_productos: _resumir_ventas, _filtrar_ventas_por_producto,
+  _agrupar_productos_vendidos
+- get_movimientos_cuenta: _merge_movimientos (unión + orden por fecha)
+
+Los casos con datos se corren con datasets sintéticos de 1k/100k/1M filas
+(1M es opcional: ocupa ~1GB de memoria). Los resultados se pueden guardar como
+línea base y comparar después; la comparación sale con código 1 si algún caso
+empeora más que la tolerancia.
+
+Ejecutar con:
+    python benchmarks.py run [--sizes 1k,100k] [--only reporte] [--save]
+    python benchmarks.py compare [--baseline .benchmarks/baseline.json] [--tolerance 0.15]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+os.environ.setdefault("FIREBASE_CREDENTIALS_PATH", "firebase-disabled.json")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+from core.cache import SimpleCache, _generate_cache_key
+from routes.pos_cuentas import _merge_movimientos
+from routes.pos_reportes import _agrupar_productos_vendidos, _filtrar_ventas_por_producto, _resumir_ventas
+from utils.permissions import Permission, can_access_section, has_any_permission, has_permission
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmarks", "baseline.json")
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+PRODUCTOS = 150
+
+# ============= DATASETS SINTÉTICOS =============
+
+def make_ventas(n: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Ventas con items embebidos, como las devuelve select('*,venta_items(*)')"""
+    rng = random.Random(seed)
+    productos = [f"prod-{i:04d}" for i in range(PRODUCTOS)]
+    start = datetime(2025, 1, 1, 12)
+    ventas = []
+    for i in range(n):
+        items = [
+            {"producto_uuid": rng.choice(productos), "cantidad": rng.randint(1, 3), "total_item": 5000.0}
+            for _ in range(rng.randint(1, 3))
+        ]
+        ventas.append({
+            "uuid": f"venta-{i}",
+            "total": float(sum(item["total_item"] for item in items)),
+            "is_fiado": rng.random() < 0.2,
+            "created_at": (start + timedelta(minutes=i % 43200)).isoformat(),
+            "venta_items": items,
+        })
+    return ventas
+
+
+def make_items(n: int, seed: int = 2) -> List[Dict[str, Any]]:
+    """venta_items con producto embebido, como en reporte_productos"""
+    rng = random.Random(seed)
+    productos = [(f"prod-{i:04d}", {"nombre": f"Producto {i}", "codigo": f"P{i:04d}"}) for i in range(PRODUCTOS)]
+    items = []
+    for _ in range(n):
+        producto_uuid, info = rng.choice(productos)
+        cantidad = rng.randint(1, 3)
+        items.append({
+            "producto_uuid": producto_uuid,
+            "cantidad": cantidad,
+            "total_item": 5000.0 * cantidad,
+            "productos": info,
+        })
+    return items
+
+
+def make_movimientos(n: int, seed: int = 3) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any], Dict[str, Dict[str, str]]]:
+    """Mitad movimientos de cuenta, mitad ventas pagadas, con fechas desordenadas"""
+    rng = random.Random(seed)
+    vendedores = {f"vend-{i}": {"nombre": f"Vendedor {i}", "tipo": "mesero"} for i in range(20)}
+    vendedor_ids = list(vendedores)
+    start = datetime(2025, 1, 1)
+    movimientos, ventas_pagadas, ventas_vendedores = [], [], {}
+    for i in range(n // 2):
+        fecha = (start + timedelta(minutes=rng.randrange(525600))).isoformat()
+        venta_uuid = f"venta-{i}" if i % 2 == 0 else None
+        if venta_uuid:
+            ventas_vendedores[venta_uuid] = rng.choice(vendedor_ids)
+        movimientos.append({
+            "uuid": f"mov-{i}",
+            "fecha": fecha,
+            "tipo": "cargo" if venta_uuid else "pago",
+            "monto": 12000,
+            "venta_uuid": venta_uuid,
+            "created_by_uuid": None if venta_uuid else rng.choice(vendedor_ids),
+        })
+    for i in range(n - n // 2):
+        ventas_pagadas.append({
+            "uuid": f"pagada-{i}",
+            "created_at": (start + timedelta(minutes=rng.randrange(525600))).isoformat(),
+            "total": 8000,
+            "numero_ticket": i,
+            "vendedor_uuid": rng.choice(vendedor_ids),
+        })
+    return movimientos, ventas_pagadas, ventas_vendedores, vendedores
+
+# ============= CASOS =============
+
+# (nombre, usa_dataset, setup(n) -> función a medir)
+Case = Tuple[str, bool, Callable[[int], Callable[[], Any]]]
+
+
+def _cache_get_setup(n: int) -> Callable[[], Any]:
+    cache = SimpleCache()
+    for i in range(n):
+        cache.set(f"key-{i}", {"i": i}, 300)
+    return lambda: cache.get("key-7")
+
+
+def _cache_set_setup(_: int) -> Callable[[], Any]:
+    cache = SimpleCache()
+    return lambda: cache.set("productos", [1, 2, 3], 180)
+
+
+def _cache_key_setup(_: int) -> Callable[[], Any]:
+    kwargs = {"q": "perez", "grupo": None, "page": 2, "page_size": 50, "current_user": {"sub": "x"}}
+    return lambda: _generate_cache_key("list_miembros", "miembros_list", (), kwargs)
+
+
+def _resumir_setup(n: int) -> Callable[[], Any]:
+    ventas = make_ventas(n)
+    return lambda: _resumir_ventas(ventas)
+
+
+def _filtrar_setup(n: int) -> Callable[[], Any]:
+    ventas = make_ventas(n)
+    return lambda: _filtrar_ventas_por_producto(ventas, "prod-0042")
+
+
+def _agrupar_setup(n: int) -> Callable[[], Any]:
+    items = make_items(n)
+    return lambda: _agrupar_productos_vendidos(items)
+
+
+def _merge_setup(n: int) -> Callable[[], Any]:
+    movimientos, ventas_pagadas, ventas_vendedores, vendedores = make_movimientos(n)
+    return lambda: _merge_movimientos(movimientos, ventas_pagadas, ventas_vendedores, vendedores)
+
+
+CASES: List[Case] = [
+    ("cache._generate_cache_key", False, _cache_key_setup),
+    ("cache.SimpleCache.set", False, _cache_set_setup),
+    ("cache.SimpleCache.get", True, _cache_get_setup),
+    ("permissions.has_permission", False, lambda _: lambda: has_permission("agente_restaurante", Permission.CREATE_SALES)),
+    ("permissions.has_any_permission", False, lambda _: lambda: has_any_permission(
+        "agente_restaurante", [Permission.VIEW_MIEMBROS, Permission.CREATE_SALES])),
+    ("permissions.can_access_section", False, lambda _: lambda: can_access_section("agente_restaurante", "pos")),
+    ("reporte_ventas._resumir_ventas", True, _resumir_setup),
+    ("reporte_ventas._filtrar_por_producto", True, _filtrar_setup),
+    ("reporte_productos._agrupar", True, _agrupar_setup),
+    ("movimientos._merge_movimientos", True, _merge_setup),
+]
+
+# ============= MEDICIÓN =============
+
+def measure(fn: Callable[[], Any], repeat: int, min_time: float) -> float:
+    """Mejor de `repeat` corridas, en nanosegundos por llamada (número de llamadas automático)"""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    # autorange llega a ~0.2s; para casos lentos basta con menos llamadas
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def run_cases(sizes: List[str], only: Optional[str], repeat: int, min_time: float) -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    for name, uses_dataset, setup in CASES:
+        if only and only not in name:
+            continue
+        for size in (sizes if uses_dataset else ["-"]):
+            n = SIZES.get(size, 1_000)
+            fn = setup(n)
+            key = f"{name}[{size}]" if uses_dataset else name
+            results[key] = measure(fn, repeat, min_time)
+            print(f"  {key:<46}{_format_ns(results[key]):>14}", flush=True)
+    return results
+
+
+def _format_ns(ns: float) -> str:
+    if ns >= 1e9:
+        return f"{ns / 1e9:.2f}s"
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f}ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f}µs"
+    return f"{ns:.0f}ns"
+
+
+def save_baseline(path: str, results: Dict[str, float]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results_ns": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    print(f"\n💾 Línea base guardada en {path}")
+
+
+def compare(baseline: Dict[str, float], results: Dict[str, float], tolerance: float) -> bool:
+    """Imprimir la comparación; False si algún caso empeoró más que la tolerancia"""
+    ok = True
+    print(f"\n{'caso':<46}{'base':>12}{'actual':>12}{'cambio':>10}")
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:<46}{'-':>12}{_format_ns(current):>12}{'nuevo':>10}")
+            continue
+        change = (current - base) / base
+        regression = change > tolerance
+        ok = ok and not regression
+        mark = "❌" if regression else ("🚀" if change < -tolerance else "  ")
+        print(f"{key:<46}{_format_ns(base):>12}{_format_ns(current):>12}{change:>+9.1%} {mark}")
+    return ok
+
+# ============= MAIN =============
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de caminos calientes")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command in ("run", "compare"):
+        p = sub.add_parser(command)
+        p.add_argument("--sizes", default="1k,100k", help="Tamaños de dataset: 1k,100k,1m")
+        p.add_argument("--only", help="Solo casos cuyo nombre contenga este texto")
+        p.add_argument("--repeat", type=int, default=5)
+        p.add_argument("--min-time", type=float, default=0.2, help="Segundos aproximados por corrida")
+        p.add_argument("--baseline", default=DEFAULT_BASELINE)
+    sub.choices["run"].add_argument("--save", action="store_true", help="Guardar como línea base")
+    sub.choices["compare"].add_argument("--tolerance", type=float, default=0.15, help="Empeoramiento máximo (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip().lower() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"Tamaños desconocidos: {', '.join(unknown)} (opciones: {', '.join(SIZES)})")
+
+    baseline: Dict[str, float] = {}
+    if args.command == "compare":
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)["results_ns"]
+        except FileNotFoundError:
+            print(f"❌ No existe la línea base {args.baseline}; créala con: python benchmarks.py run --save")
+            return 2
+
+    print("=" * 64)
+    print(f"⏱️  Micro-benchmarks (Python {platform.python_version()}, tamaños: {', '.join(sizes)})")
+    print("=" * 64)
+    started = time.perf_counter()
+    results = run_cases(sizes, args.only, args.repeat, args.min_time)
+    print(f"\nTiempo total: {time.perf_counter() - started:.1f}s")
+
+    if args.command == "run":
+        if args.save:
+            save_baseline(args.baseline, results)
+        return 0
+    return 0 if compare(baseline, results, args.tolerance) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Bulkheads por prioridad: cupos de concurrencia separados por clase de request
+Un reporte de fin de mes o los movimientos de una cuenta grande compiten por
+el mismo worker (event loop, pool de hilos, conexiones a Supabase) que las
+ventas en el mostrador. Cada clase tiene su propio cupo y su propia cola:
+
+- pos_critical: escrituras del POS (ventas, pagos, turnos, sync/push). Cupo y
+  cola grandes; solo se rechaza si la cola está llena o la espera se vence
+- interactive: lecturas normales de las pantallas
+- reports: reportes, exportaciones y listados pesados. Cupo chico: el
+  excedente espera poco y se rechaza con 429 + Retry-After
+
+Las clases no se prestan cupos entre sí: muchos reportes a la vez nunca
+ocupan el lugar de una venta. Los cupos son por worker (event loop).
+"""
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+from fnmatch import translate
+from starlette.types import ASGIApp, Receive, Scope, Send
+import asyncio
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class Bulkhead:
+    """
+    Cupo de concurrencia con cola acotada
+
+    max_concurrent: requests de la clase en ejecución a la vez
+    max_queue: requests esperando un lugar; más allá se rechaza de inmediato
+    queue_timeout: segundos máximos de espera en la cola
+    shed_status: 429 (el cliente debe bajar el ritmo) o 503 (servidor ocupado)
+    retry_after: segundos sugeridos en el header Retry-After
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout: float,
+        shed_status: int = 503,
+        retry_after: int = 5
+    ):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.shed_status = shed_status
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self) -> bool:
+        """Tomar un lugar; False si la request se debe rechazar"""
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        elif self.waiting >= self.max_queue:
+            self.rejected += 1
+            return False
+        else:
+            self.waiting += 1
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                return False
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+        }
+
+
+class BulkheadRegistry:
+    """Bulkheads del proceso por nombre de clase (los usa el middleware y /api/metrics)"""
+
+    def __init__(self):
+        self._bulkheads: Dict[str, Bulkhead] = {}
+
+    def register(self, bulkheads: Iterable[Bulkhead]):
+        for bulkhead in bulkheads:
+            self._bulkheads[bulkhead.name] = bulkhead
+
+    def get(self, name: str) -> Optional[Bulkhead]:
+        return self._bulkheads.get(name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: bulkhead.get_stats() for name, bulkhead in self._bulkheads.items()}
+
+
+bulkheads = BulkheadRegistry()
+
+
+def _compile(pattern: str) -> Pattern[str]:
+    return re.compile(translate(pattern))
+
+
+class BulkheadMiddleware:
+    """
+    Middleware ASGI que asigna cada request a una clase y la hace pasar por su bulkhead
+
+    rules: [(clase, métodos o None = todos, patrón glob del path)]; gana la primera que coincide
+    default: clase de las requests que no coinciden con ninguna regla
+    exempt: patrones que no pasan por ningún bulkhead (health checks, métricas)
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        classes: Sequence[Bulkhead],
+        rules: Sequence[Tuple[str, Optional[Sequence[str]], str]],
+        default: str,
+        exempt: Sequence[str] = (),
+        registry: Optional[BulkheadRegistry] = None
+    ):
+        self.app = app
+        self.classes = {bulkhead.name: bulkhead for bulkhead in classes}
+        self.rules: List[Tuple[Bulkhead, Optional[frozenset], Pattern[str]]] = [
+            (self.classes[name], frozenset(methods) if methods else None, _compile(pattern))
+            for name, methods, pattern in rules
+        ]
+        self.default = self.classes[default]
+        self.exempt = [_compile(pattern) for pattern in exempt]
+        (registry if registry is not None else bulkheads).register(classes)
+
+    def classify(self, method: str, path: str) -> Optional[Bulkhead]:
+        if any(pattern.match(path) for pattern in self.exempt):
+            return None
+        for bulkhead, methods, pattern in self.rules:
+            if (methods is None or method in methods) and pattern.match(path):
+                return bulkhead
+        return self.default
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['method'] == 'OPTIONS':
+            await self.app(scope, receive, send)
+            return
+        bulkhead = self.classify(scope['method'], scope['path'])
+        if bulkhead is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await bulkhead.acquire():
+            logger.warning(
+                f"Bulkhead '{bulkhead.name}' full ({bulkhead.active} active, {bulkhead.waiting} waiting): "
+                f"shedding {scope['method']} {scope['path']}"
+            )
+            await _send_shed(send, bulkhead)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            bulkhead.release()
+
+
+async def _send_shed(send: Send, bulkhead: Bulkhead):
+    body = json.dumps({"detail": "Servidor ocupado, intente de nuevo en unos segundos"}).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': bulkhead.shed_status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'retry-after', str(bulkhead.retry_after).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
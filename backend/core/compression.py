@@ -0,0 +1,263 @@
+"""
+Compresión de respuestas con negociación br / zstd / gzip
+Reemplaza a GZipMiddleware:
+- elige la codificación según Accept-Encoding (q-values); a igual q prefiere
+  br, luego zstd, luego gzip. br y zstd solo se ofrecen si están instalados
+  brotli / zstandard
+- solo comprime tipos de texto (JSON, HTML, CSS, JS, SVG...) sin
+  Content-Encoding previo: imágenes, zip o PDF pasan tal cual
+- las respuestas GET 200 se cachean ya comprimidas, por codificación y hash
+  del cuerpo: listados que se repiten (catálogo, miembros) se sirven sin
+  volver a comprimir. La clave es el contenido, así que nunca se entrega un
+  cuerpo distinto al que generó el handler
+- las respuestas en streaming se comprimen por bloques, sin cachear
+"""
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import config
+import gzip
+import hashlib
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 6
+GZIP_LEVEL = 6
+
+# Orden de preferencia del servidor entre codificaciones con igual q
+SUPPORTED_ENCODINGS: Tuple[str, ...] = tuple(
+    name for name, module in (('br', brotli), ('zstd', zstandard), ('gzip', gzip)) if module is not None
+)
+
+_COMPRESSIBLE_PREFIXES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+_COMPRESSIBLE_SUFFIXES = ('+json', '+xml')
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Codificación a usar según el header Accept-Encoding (None = sin comprimir)"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    wildcard = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in SUPPORTED_ENCODINGS:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type.startswith(_COMPRESSIBLE_PREFIXES) or media_type.endswith(_COMPRESSIBLE_SUFFIXES)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _StreamEncoder:
+    """Compresor incremental para respuestas en streaming"""
+
+    def __init__(self, encoding: str):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._process, self._finish = compressor.process, compressor.finish
+        elif encoding == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self._process, self._finish = compressor.compress, compressor.flush
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._process, self._finish = compressor.compress, compressor.flush
+
+    def process(self, chunk: bytes) -> bytes:
+        return self._process(chunk)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+class CompressedBodyCache:
+    """LRU de cuerpos comprimidos por (codificación, hash del cuerpo), acotado en bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key: Tuple[str, bytes], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'encodings': list(SUPPORTED_ENCODINGS),
+            'entries': len(self._entries),
+            'size_bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits / total * 100) if total else 0, 2),
+        }
+
+
+# Caché global del proceso (la usa el middleware y la muestra /api/metrics)
+compressed_bodies = CompressedBodyCache(max_bytes=config.COMPRESSION_CACHE_MAX_BYTES)
+
+
+class CompressionMiddleware:
+    """Middleware ASGI de compresión con caché de cuerpos comprimidos"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1000, body_cache: Optional[CompressedBodyCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.body_cache = body_cache if body_cache is not None else compressed_bodies
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, scope, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, encoding: str, send: Send):
+        self.middleware = middleware
+        self.cacheable_request = scope['method'] == 'GET'
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.compress = False
+        self.cacheable = False
+        self.encoder: Optional[_StreamEncoder] = None
+
+    async def send(self, message: Message):
+        message_type = message['type']
+        if message_type == 'http.response.start':
+            # Se retiene hasta ver el primer bloque del cuerpo
+            headers = Headers(raw=message.get('headers', []))
+            self.start_message = message
+            self.compress = (
+                'content-encoding' not in headers
+                and is_compressible(headers.get('content-type', ''))
+            )
+            self.cacheable = (
+                self.cacheable_request
+                and message['status'] == 200
+                and 'no-store' not in headers.get('cache-control', '')
+            )
+            return
+
+        if message_type == 'http.response.body' and self.encoder is not None:
+            await self._send_stream_chunk(message)
+            return
+        if message_type != 'http.response.body' or self.start_message is None:
+            await self._send(message)
+            return
+
+        start, self.start_message = self.start_message, None
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if not self.compress or (not more_body and len(body) < self.middleware.minimum_size):
+            await self._send(start)
+            await self._send(message)
+            return
+
+        headers = MutableHeaders(raw=list(start.get('headers', [])))
+        headers['Content-Encoding'] = self.encoding
+        headers.add_vary_header('Accept-Encoding')
+
+        if more_body:
+            # Streaming: compresión por bloques, sin largo conocido
+            del headers['Content-Length']
+            start['headers'] = headers.raw
+            self.encoder = _StreamEncoder(self.encoding)
+            await self._send(start)
+            await self._send_stream_chunk(message)
+            return
+
+        compressed = self._compressed(body)
+        headers['Content-Length'] = str(len(compressed))
+        start['headers'] = headers.raw
+        await self._send(start)
+        await self._send({'type': 'http.response.body', 'body': compressed})
+
+    def _compressed(self, body: bytes) -> bytes:
+        if not self.cacheable:
+            return compress(body, self.encoding)
+        cache = self.middleware.body_cache
+        key = (self.encoding, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress(body, self.encoding)
+            cache.set(key, compressed)
+        return compressed
+
+    async def _send_stream_chunk(self, message: Message):
+        more_body = message.get('more_body', False)
+        chunk = self.encoder.process(message.get('body', b''))
+        if not more_body:
+            chunk += self.encoder.finish()
+        elif not chunk:
+            return
+        await self._send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
@@ -1,10 +1,66 @@
+from typing import TYPE_CHECKING, Any, Optional
 from dotenv import load_dotenv
 from pathlib import Path
-from supabase import create_client, Client
 from fastapi.security import HTTPBearer
 import os
+import tempfile
+import threading
+
+if TYPE_CHECKING:
+    from supabase import Client
+
 load_dotenv()
 
+
+class LazySupabaseClient:
+    """
+    Cliente de Supabase creado en el primer uso
+    Importar supabase (httpx, postgrest, storage, realtime) y crear el cliente
+    toma cientos de ms; así no se paga al importar la app. Los routers guardan
+    esta referencia y cada atributo (table, rpc, storage...) se delega al
+    cliente real.
+
+    PostgREST, Storage y Auth comparten un solo httpx.Client con pool
+    keep-alive, HTTP/2 y reintentos (core.http_transport).
+    """
+
+    def __init__(self, url: str, key: str):
+        self._url = url
+        self._key = key
+        self._client: Optional["Client"] = None
+        self._lock = threading.Lock()
+        self.transport: Optional[Any] = None
+        self.http_client: Optional[Any] = None
+
+    @property
+    def initialized(self) -> bool:
+        return self._client is not None
+
+    def get_client(self) -> "Client":
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client
+                    from supabase.lib.client_options import SyncClientOptions
+                    from .http_transport import build_http_client, build_transport
+                    self.transport = build_transport()
+                    self.http_client = build_http_client(self.transport)
+                    self._client = create_client(
+                        self._url, self._key, options=SyncClientOptions(httpx_client=self.http_client)
+                    )
+                client = self._client
+        return client
+
+    def close(self):
+        """Cerrar las conexiones del pool (al apagar el worker)"""
+        if self.http_client is not None:
+            self.http_client.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get_client(), name)
+
+
 class Config:
       SECRET_KEY: str = "super-secret-key-change-in-production"
       ROOT_DIR = Path(__file__).parent
@@ -14,7 +70,75 @@ class Config:
       supabase_url = os.environ.get('SUPABASE_URL', 'https://example.supabase.co')
       supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY', 'dummy-key')
       supabase_anon_key = os.environ.get('SUPABASE_ANON_KEY', 'dummy-anon-key')
-      supabase: Client = create_client(supabase_url, supabase_key)
+      supabase: "Client" = LazySupabaseClient(supabase_url, supabase_key)  # type: ignore[assignment]
+      DB_QUERY_TIMEOUT_SECONDS = float(os.environ.get('DB_QUERY_TIMEOUT_SECONDS', '10'))
+      # Reportes de fin de mes y movimientos de cuentas grandes (clase "reports" del bulkhead)
+      REPORT_QUERY_TIMEOUT_SECONDS = float(os.environ.get('REPORT_QUERY_TIMEOUT_SECONDS', '30'))
+
+      # Transporte HTTP hacia Supabase (pool keep-alive, timeouts, reintentos)
+      SUPABASE_HTTP2 = os.environ.get('SUPABASE_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+      SUPABASE_HTTP_MAX_CONNECTIONS = int(os.environ.get('SUPABASE_HTTP_MAX_CONNECTIONS', '64'))
+      SUPABASE_HTTP_MAX_KEEPALIVE = int(os.environ.get('SUPABASE_HTTP_MAX_KEEPALIVE', '32'))
+      SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get('SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS', '30'))
+      SUPABASE_HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('SUPABASE_HTTP_CONNECT_TIMEOUT_SECONDS', '5'))
+      SUPABASE_HTTP_TIMEOUT_SECONDS = float(os.environ.get('SUPABASE_HTTP_TIMEOUT_SECONDS', '30'))
+      SUPABASE_HTTP_RETRIES = int(os.environ.get('SUPABASE_HTTP_RETRIES', '2'))
+      SUPABASE_HTTP_RETRY_BACKOFF_SECONDS = float(os.environ.get('SUPABASE_HTTP_RETRY_BACKOFF_SECONDS', '0.1'))
+      SUPABASE_HTTP_RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get('SUPABASE_HTTP_RETRY_BACKOFF_MAX_SECONDS', '1'))
+
+      # Sincronización offline (sync/push)
+      SYNC_PUSH_BATCH_SIZE = int(os.environ.get('SYNC_PUSH_BATCH_SIZE', '50'))
+      SYNC_PUSH_CONCURRENCY = int(os.environ.get('SYNC_PUSH_CONCURRENCY', '4'))
+      SYNC_PULL_PAGE_SIZE = int(os.environ.get('SYNC_PULL_PAGE_SIZE', '1000'))
+      SYNC_PULL_LAG_SECONDS = int(os.environ.get('SYNC_PULL_LAG_SECONDS', '2'))
+
+      # Idempotencia de escrituras POS (Idempotency-Key)
+      IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', '5000'))
+      IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '21600'))
+      # Vencimiento de la marca "en curso" si el worker que la tomó muere
+      IDEMPOTENCY_INFLIGHT_SECONDS = int(os.environ.get('IDEMPOTENCY_INFLIGHT_SECONDS', '60'))
+
+      # Índice de uploads por contenido (sha256 → URL) en el estado compartido
+      UPLOAD_DEDUP_TTL_SECONDS = int(os.environ.get('UPLOAD_DEDUP_TTL_SECONDS', '86400'))
+      UPLOAD_DEDUP_MAX_ENTRIES = int(os.environ.get('UPLOAD_DEDUP_MAX_ENTRIES', '2000'))
+      UPLOAD_DEDUP_PRUNE_SECONDS = float(os.environ.get('UPLOAD_DEDUP_PRUNE_SECONDS', '300'))
+
+      # Estado compartido entre workers (versiones de recursos, ETags)
+      SHARED_STATE_DIR = os.environ.get(
+            'SHARED_STATE_DIR',
+            '/dev/shm/churchapp' if os.path.isdir('/dev/shm') else os.path.join(tempfile.gettempdir(), 'churchapp')
+      )
+      ETAG_MAX_AGE_SECONDS = int(os.environ.get('ETAG_MAX_AGE_SECONDS', '300'))
+
+      # Login con Google (certificados, ID tokens verificados, filas app_users)
+      FIREBASE_TOKEN_CACHE_SIZE = int(os.environ.get('FIREBASE_TOKEN_CACHE_SIZE', '1024'))
+      FIREBASE_CERTS_DEFAULT_MAX_AGE = int(os.environ.get('FIREBASE_CERTS_DEFAULT_MAX_AGE', '3600'))
+      # Cota de lo que tarda en verse un cambio de rol/activo hecho directo en
+      # Supabase (las rutas del backend invalidan la fila al escribirla)
+      APP_USERS_CACHE_TTL_SECONDS = int(os.environ.get('APP_USERS_CACHE_TTL_SECONDS', '60'))
+
+      # Métricas de latencia (histogramas por ruta, /api/metrics)
+      METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '5'))
+      # Token fijo opcional para que Prometheus lea /api/metrics/prometheus sin JWT
+      METRICS_SCRAPE_TOKEN = os.environ.get('METRICS_SCRAPE_TOKEN', '')
+      # Consultas a la misma tabla en un request a partir de las cuales se avisa posible N+1
+      DB_N_PLUS_ONE_THRESHOLD = int(os.environ.get('DB_N_PLUS_ONE_THRESHOLD', '10'))
+
+      # Compresión de respuestas (br/zstd/gzip) y caché de cuerpos ya comprimidos por worker
+      COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1000'))
+      COMPRESSION_CACHE_MAX_BYTES = int(os.environ.get('COMPRESSION_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+      # Bulkheads por prioridad (cupo en ejecución / cola / espera máxima en la cola, por worker)
+      BULKHEADS_ENABLED = os.environ.get('BULKHEADS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+      BULKHEAD_POS_CONCURRENCY = int(os.environ.get('BULKHEAD_POS_CONCURRENCY', '32'))
+      BULKHEAD_POS_QUEUE = int(os.environ.get('BULKHEAD_POS_QUEUE', '256'))
+      BULKHEAD_POS_QUEUE_TIMEOUT = float(os.environ.get('BULKHEAD_POS_QUEUE_TIMEOUT', '15'))
+      BULKHEAD_INTERACTIVE_CONCURRENCY = int(os.environ.get('BULKHEAD_INTERACTIVE_CONCURRENCY', '16'))
+      BULKHEAD_INTERACTIVE_QUEUE = int(os.environ.get('BULKHEAD_INTERACTIVE_QUEUE', '64'))
+      BULKHEAD_INTERACTIVE_QUEUE_TIMEOUT = float(os.environ.get('BULKHEAD_INTERACTIVE_QUEUE_TIMEOUT', '5'))
+      BULKHEAD_REPORTS_CONCURRENCY = int(os.environ.get('BULKHEAD_REPORTS_CONCURRENCY', '2'))
+      BULKHEAD_REPORTS_QUEUE = int(os.environ.get('BULKHEAD_REPORTS_QUEUE', '4'))
+      BULKHEAD_REPORTS_QUEUE_TIMEOUT = float(os.environ.get('BULKHEAD_REPORTS_QUEUE_TIMEOUT', '10'))
 
       # Google OAuth
       GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID', 'dummy-client-id')
@@ -0,0 +1,124 @@
+"""
+Capa de acceso a datos: helpers para ejecutar consultas de Supabase
+sin bloquear el event loop y lanzarlas en paralelo cuando son independientes
+"""
+from typing import Any, Iterator, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fastapi import HTTPException
+from .config import config
+from .profiling import to_thread
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_http_read_timeout: ContextVar[Optional[float]] = ContextVar('http_read_timeout', default=None)
+
+
+@contextmanager
+def http_timeout(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Timeout de lectura para las peticiones HTTP a Supabase hechas dentro del bloque
+    Lo aplica el transporte compartido (core.http_transport); se propaga a
+    asyncio.to_thread porque copia el contexto.
+
+    Uso:
+        with http_timeout(30):
+            supabase.table('ventas').select('*').execute()
+    """
+    token = _http_read_timeout.set(seconds)
+    try:
+        yield
+    finally:
+        _http_read_timeout.reset(token)
+
+
+def current_http_timeout() -> Optional[float]:
+    return _http_read_timeout.get()
+
+
+async def run_query(query: Any, timeout: Optional[float] = None) -> Any:
+    """
+    Ejecutar una consulta (builder de postgrest/rpc) en un hilo con timeout
+
+    El cliente de Supabase es síncrono; ejecutarlo en un hilo evita bloquear
+    el event loop mientras se espera la respuesta de PostgREST. El mismo
+    timeout se aplica a la lectura HTTP, así el hilo tampoco queda colgado.
+    """
+    if timeout is None:
+        timeout = config.DB_QUERY_TIMEOUT_SECONDS
+    try:
+        with http_timeout(timeout):
+            return await asyncio.wait_for(to_thread(query.execute), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Query timed out after {timeout}s")
+        raise HTTPException(status_code=504, detail="Tiempo de espera agotado consultando la base de datos")
+
+
+async def gather_queries(
+    *queries: Any,
+    timeout: Optional[float] = None,
+    return_exceptions: bool = False
+) -> List[Any]:
+    """
+    Ejecutar varias consultas independientes de forma concurrente
+
+    Devuelve los resultados en el mismo orden que las consultas. Las entradas
+    None se devuelven como None (útil para consultas condicionales). Si una
+    consulta falla, las demás se cancelan y se propaga el primer error, salvo
+    que return_exceptions=True, en cuyo caso el error ocupa su posición.
+
+    Uso:
+        venta_res, items_res = await gather_queries(
+            supabase.table('ventas').select('*').eq('uuid', venta_uuid),
+            supabase.table('venta_items').select('*').eq('venta_uuid', venta_uuid),
+        )
+    """
+    tasks = [
+        asyncio.ensure_future(run_query(q, timeout)) if q is not None else None
+        for q in queries
+    ]
+    pending = [t for t in tasks if t is not None]
+    try:
+        await asyncio.gather(*pending, return_exceptions=return_exceptions)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        raise
+
+    results: List[Any] = []
+    for task in tasks:
+        if task is None:
+            results.append(None)
+        elif task.cancelled():
+            results.append(asyncio.CancelledError())
+        elif task.exception() is not None:
+            results.append(task.exception())
+        else:
+            results.append(task.result())
+    return results
+
+
+async def gather_queries_bounded(
+    queries: List[Any],
+    limit: int,
+    timeout: Optional[float] = None,
+    return_exceptions: bool = True
+) -> List[Any]:
+    """
+    Como gather_queries, pero con como máximo `limit` consultas en vuelo
+
+    Pensado para lotes grandes (p. ej. sincronización offline) donde lanzar
+    todas las consultas a la vez saturaría PostgREST y el pool de hilos.
+    Por defecto los errores se devuelven en su posición para no perder
+    el resultado de las demás consultas.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _run(query: Any) -> Any:
+        async with semaphore:
+            return await run_query(query, timeout)
+
+    return await asyncio.gather(*(_run(q) for q in queries), return_exceptions=return_exceptions)
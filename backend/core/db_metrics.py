@@ -0,0 +1,126 @@
+"""
+Registro de consultas a Supabase por request
+Los hooks del cliente httpx de PostgREST anotan cada llamada (tabla, operación,
+duración) en el registro del request actual (contextvar). El middleware de
+timing lo abre al inicio y al final:
+- agrega el header Server-Timing (db;dur=...;desc="N queries")
+- avisa en el log cuando un request repite muchas consultas a la misma tabla
+  (patrón N+1: una consulta por fila de un listado)
+
+Las consultas corren en hilos (asyncio.to_thread copia el contexto), así que
+se registran en el mismo request.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from contextvars import ContextVar
+from collections import Counter
+from .config import config
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_START_KEY = 'churchapp_db_start'
+
+
+class RequestQueries:
+    """Consultas hechas durante un request: (tabla, operación, ms)"""
+
+    __slots__ = ('calls',)
+
+    def __init__(self):
+        self.calls: List[Tuple[str, str, float]] = []
+
+    def record(self, table: str, operation: str, duration_ms: float):
+        # list.append es atómico: no hace falta lock aunque registren varios hilos
+        self.calls.append((table, operation, duration_ms))
+
+    @property
+    def count(self) -> int:
+        return len(self.calls)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(ms for _, _, ms in self.calls)
+
+    def repeated(self, threshold: int) -> Dict[Tuple[str, str], int]:
+        """(tabla, operación) consultadas más de threshold veces"""
+        counts = Counter((table, op) for table, op, _ in self.calls)
+        return {key: n for key, n in counts.items() if n > threshold}
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_ms:.1f};desc="{self.count} queries"'
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar('request_queries', default=None)
+
+
+def begin_request() -> Tuple[RequestQueries, Any]:
+    """Abrir el registro del request actual; devuelve (registro, token para end_request)"""
+    queries = RequestQueries()
+    return queries, _current.set(queries)
+
+
+def end_request(token: Any):
+    _current.reset(token)
+
+
+def current_queries() -> Optional[RequestQueries]:
+    return _current.get()
+
+
+def check_n_plus_one(queries: RequestQueries, method: str, route: str):
+    """Log de advertencia si una tabla se consultó más de DB_N_PLUS_ONE_THRESHOLD veces"""
+    for (table, operation), n in queries.repeated(config.DB_N_PLUS_ONE_THRESHOLD).items():
+        logger.warning(f"Possible N+1: {method} {route} ran {n} {operation} queries on '{table}'")
+
+
+# ============= HOOKS DE HTTPX =============
+
+def _operation(method: str, path: str, prefer: str) -> Tuple[str, str]:
+    """Tabla y operación a partir de la URL de PostgREST (/rest/v1/<tabla> o /rest/v1/rpc/<fn>)"""
+    _, _, resource = path.partition('/rest/v1/')
+    resource = resource.strip('/') or path
+    if resource.startswith('rpc/'):
+        return resource, 'rpc'
+    if method == 'GET':
+        return resource, 'select'
+    if method == 'HEAD':
+        return resource, 'count'
+    if method == 'POST':
+        return resource, 'upsert' if 'resolution=' in prefer else 'insert'
+    if method == 'PATCH':
+        return resource, 'update'
+    if method == 'DELETE':
+        return resource, 'delete'
+    return resource, method.lower()
+
+
+def _on_request(request: Any):
+    if _current.get() is not None:
+        request.extensions[_START_KEY] = time.perf_counter()
+
+
+def _on_response(response: Any):
+    queries = _current.get()
+    if queries is None:
+        return
+    request = response.request
+    start = request.extensions.get(_START_KEY)
+    # La sesión es compartida con Storage y Auth: solo se cuentan consultas a PostgREST
+    if start is None or '/rest/v1/' not in request.url.path:
+        return
+    # Hasta recibir los encabezados: el tiempo de la base, sin la lectura del cuerpo
+    duration_ms = (time.perf_counter() - start) * 1000
+    table, operation = _operation(request.method, request.url.path, request.headers.get('prefer', ''))
+    queries.record(table, operation, duration_ms)
+
+
+def install_hooks(client: Any):
+    """
+    Agregar los hooks a la sesión httpx de PostgREST del cliente (idempotente)
+    El cliente recrea la sesión tras eventos de auth, por eso se llama en cada request.
+    """
+    hooks = client.postgrest.session.event_hooks
+    if _on_response not in hooks['response']:
+        hooks['request'].append(_on_request)
+        hooks['response'].append(_on_response)
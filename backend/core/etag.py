@@ -0,0 +1,89 @@
+"""
+GET condicional (ETag / If-None-Match) para listados que se consultan seguido
+El ETag se deriva de un contador de versión por recurso que se incrementa en
+cada escritura; si el cliente ya tiene la versión actual se responde 304 sin
+ejecutar el handler (ni consulta a Supabase ni serialización)
+"""
+from typing import Callable, Optional
+from fastapi import Request, Response
+from .config import config
+from .shared_state import SharedStore
+import functools
+import hashlib
+import inspect
+import time
+import uuid
+
+_versions = SharedStore('resource_versions')
+
+
+def get_resource_version(resource: str) -> str:
+    """Versión actual de un recurso (compartida entre workers)"""
+    version = _versions.get(resource)
+    if version is None:
+        version = bump_resource_version(resource)
+    return version
+
+
+def bump_resource_version(resource: str) -> str:
+    """Marcar un recurso como modificado; llamar después de cada escritura"""
+    version = f"{time.time_ns():x}-{uuid.uuid4().hex[:8]}"
+    _versions.set(resource, version)
+    return version
+
+
+def _compute_etag(resource: str, request: Request) -> str:
+    """ETag fuerte: recurso + versión + parámetros de consulta + ventana de expiración"""
+    parts = [resource, get_resource_version(resource), str(sorted(request.query_params.multi_items()))]
+    # Ventana máxima: acota lo que puede durar una respuesta si los datos
+    # cambian fuera de la API (panel de Supabase, triggers, otro host)
+    if config.ETAG_MAX_AGE_SECONDS > 0:
+        parts.append(str(int(time.time() // config.ETAG_MAX_AGE_SECONDS)))
+    digest = hashlib.sha1("|".join(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def conditional_get(resource: str):
+    """
+    Decorador para endpoints GET con soporte de If-None-Match
+
+    Debe ir debajo del decorador de la ruta. Las dependencias (autenticación)
+    se resuelven antes, así un 304 nunca se entrega sin validar al usuario.
+
+    Uso:
+        @pos_productos_router.get("/productos")
+        @conditional_get("productos")
+        async def list_productos(...):
+    """
+    def decorator(func: Callable):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs.pop('etag_request')
+            response: Response = kwargs.pop('etag_response')
+
+            etag = _compute_etag(resource, request)
+            if _etag_matches(request.headers.get('if-none-match'), etag):
+                return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+            result = await func(*args, **kwargs)
+            # Si el handler devuelve la respuesta armada, FastAPI no copia los headers de `response`
+            target = result if isinstance(result, Response) else response
+            target.headers['ETag'] = etag
+            target.headers['Cache-Control'] = 'no-cache'
+            return result
+
+        signature = inspect.signature(func)
+        extra = [
+            inspect.Parameter('etag_request', inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            inspect.Parameter('etag_response', inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ]
+        wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), *extra])
+        return wrapper
+    return decorator
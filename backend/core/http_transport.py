@@ -0,0 +1,182 @@
+"""
+Transporte HTTP compartido para el cliente de Supabase
+Un solo httpx.Client (PostgREST, Storage y Auth) con:
+- pool de conexiones keep-alive acotado y HTTP/2 si está instalado h2: bajo
+  carga se reutilizan conexiones en vez de abrir un handshake TLS por consulta
+- timeouts de conexión / lectura / pool configurables; core.db.http_timeout()
+  ajusta la lectura por llamada (run_query lo usa con su propio timeout, así
+  el hilo no queda esperando a PostgREST después de haber respondido 504)
+- reintentos con backoff exponencial y jitter completo:
+  * errores de conexión (la petición no llegó a enviarse): cualquier método
+    cuyo cuerpo se pueda reenviar
+  * errores de lectura y 429/502/503/504: solo métodos idempotentes (GET,
+    HEAD, OPTIONS); un POST/PATCH que pudo haberse aplicado nunca se repite
+  * con un http_timeout() activo, ese timeout es el plazo total: ReadTimeout
+    no se reintenta y ningún reintento empieza si su espera pasa el plazo
+  * PoolTimeout (pool agotado) no se reintenta: solo agregaría carga
+"""
+from typing import Any, Dict, Optional
+from .config import config
+from .db import current_http_timeout
+import httpx
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+# La petición no llegó al servidor: reintentar es seguro para cualquier método
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+# La petición pudo haberse procesado: solo se reintentan lecturas
+_READ_ERRORS = (httpx.ReadError, httpx.ReadTimeout, httpx.RemoteProtocolError)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class RetryingTransport(httpx.BaseTransport):
+    """Transporte que envuelve a HTTPTransport con timeouts por llamada y reintentos"""
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        http2: bool = False
+    ):
+        self._transport = transport
+        self.http2 = http2
+        self.retries = max(0, retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {'requests': 0, 'retries': 0, 'recovered': 0, 'failed': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        # Retry-After (429/503) manda, pero acotado: el cliente está esperando
+        if response is not None:
+            retry_after = response.headers.get('retry-after', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        # Jitter completo: evita que todos los hilos reintenten a la vez
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        seconds = current_http_timeout()
+        # El que llamó (run_query) deja de esperar a los `seconds`: seguir
+        # reintentando después solo mantendría ocupado el hilo
+        deadline = time.monotonic() + seconds if seconds is not None else None
+
+        idempotent = request.method in IDEMPOTENT_METHODS
+        # Un cuerpo en streaming (p. ej. multipart desde archivo) no se puede reenviar
+        replayable = idempotent or isinstance(request.stream, httpx.ByteStream)
+        self._count('requests')
+
+        attempt = 0
+        while True:
+            response = None
+            error: Optional[Exception] = None
+            if deadline is not None:
+                # Cada intento lee a lo sumo lo que queda del plazo
+                timeout = dict(request.extensions.get('timeout', {}))
+                timeout['read'] = max(deadline - time.monotonic(), 0.001)
+                request.extensions['timeout'] = timeout
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.PoolTimeout:
+                self._count('failed')
+                raise
+            except _CONNECT_ERRORS as e:
+                if not replayable or attempt >= self.retries:
+                    self._count('failed')
+                    raise
+                error, reason = e, type(e).__name__
+            except _READ_ERRORS as e:
+                if (
+                    not idempotent or attempt >= self.retries
+                    or (deadline is not None and isinstance(e, httpx.ReadTimeout))
+                ):
+                    self._count('failed')
+                    raise
+                error, reason = e, type(e).__name__
+            else:
+                if not idempotent or response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    if attempt:
+                        self._count('failed' if response.status_code in RETRY_STATUSES else 'recovered')
+                    return response
+                reason = f"HTTP {response.status_code}"
+
+            delay = self._backoff(attempt, response)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                # Sin tiempo para otro intento: se entrega el último resultado
+                self._count('failed')
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            attempt += 1
+            self._count('retries')
+            logger.warning(
+                f"Supabase {request.method} {request.url.path} failed ({reason}), "
+                f"retry {attempt}/{self.retries} in {delay * 1000:.0f}ms"
+            )
+            time.sleep(delay)
+
+    def close(self):
+        self._transport.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['max_retries'] = self.retries
+        stats['http2'] = self.http2
+        return stats
+
+
+def build_transport() -> RetryingTransport:
+    """Pool de conexiones + reintentos según la configuración"""
+    http2 = config.SUPABASE_HTTP2 and _http2_available()
+    if config.SUPABASE_HTTP2 and not http2:
+        logger.warning("SUPABASE_HTTP2 enabled but h2 is not installed; using HTTP/1.1")
+    return RetryingTransport(
+        httpx.HTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=config.SUPABASE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.SUPABASE_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=config.SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        ),
+        retries=config.SUPABASE_HTTP_RETRIES,
+        backoff_base=config.SUPABASE_HTTP_RETRY_BACKOFF_SECONDS,
+        backoff_max=config.SUPABASE_HTTP_RETRY_BACKOFF_MAX_SECONDS,
+        http2=http2,
+    )
+
+
+def build_http_client(transport: httpx.BaseTransport) -> httpx.Client:
+    """httpx.Client compartido por PostgREST, Storage y Auth"""
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(
+            config.SUPABASE_HTTP_TIMEOUT_SECONDS,
+            connect=config.SUPABASE_HTTP_CONNECT_TIMEOUT_SECONDS,
+            pool=config.SUPABASE_HTTP_CONNECT_TIMEOUT_SECONDS,
+        ),
+        follow_redirects=True,
+    )
@@ -0,0 +1,250 @@
+"""
+Idempotencia para endpoints de escritura del POS
+Guarda la primera respuesta de cada Idempotency-Key y la reutiliza en los
+reintentos (Wi-Fi inestable en tablets) sin volver a tocar Supabase.
+
+Las respuestas y las marcas "en curso" viven en el estado compartido
+(SharedStore): con --workers 4 el reintento suele caer en otro worker.
+"""
+from typing import Any, Callable, Dict, Optional, Set
+from decimal import Decimal
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from .config import config
+from .shared_state import SharedStore
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Parámetros que no forman parte de la "identidad" de la solicitud
+_IGNORED_PARAMS = {"current_user", "idempotency_request", "idempotency_response"}
+
+# Intervalo de sondeo mientras otro worker procesa la misma clave
+_POLL_SECONDS = 0.05
+
+
+class IdempotencyStore:
+    """
+    Respuestas idempotentes compartidas entre workers, con TTL y tope de entradas
+
+    Cada clave pasa por dos estados: 'pending' (un worker la está procesando;
+    vence a los inflight_seconds por si ese worker muere) y 'done' (respuesta
+    guardada hasta ttl_seconds). La reserva se hace bajo el lock del
+    namespace, así dos reintentos simultáneos nunca ejecutan el endpoint dos veces.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 5000,
+        ttl_seconds: int = 21600,
+        inflight_seconds: int = 60,
+        prune_interval: float = 60.0,
+        store: Optional[SharedStore] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.inflight_seconds = inflight_seconds
+        self.prune_interval = prune_interval
+        self._store = store if store is not None else SharedStore('idempotency')
+        self._claims: Set[str] = set()
+        self._replays = 0
+        self._last_prune = 0.0
+
+    @staticmethod
+    def _file_key(key: str) -> str:
+        # La clave del cliente es arbitraria: largo fijo y seguro como nombre de archivo
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def _expired(entry: Dict[str, Any]) -> bool:
+        return time.time() >= entry.get('expires_at', 0)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Obtener la entrada vigente ('pending' o 'done') de una clave"""
+        entry = self._store.get(self._file_key(key))
+        if entry is None or self._expired(entry):
+            return None
+        return entry
+
+    def claim(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Reservar una clave para procesarla
+
+        Devuelve None si la reserva es de este llamador, o la entrada vigente
+        (de otro worker o ya terminada) si no.
+        """
+        file_key = self._file_key(key)
+        with self._store.lock():
+            entry = self._store.get(file_key)
+            if entry is not None and not self._expired(entry):
+                return entry
+            self._store.set(file_key, {
+                'state': 'pending',
+                'token': uuid.uuid4().hex,
+                'fingerprint': fingerprint,
+                'expires_at': time.time() + self.inflight_seconds,
+            })
+        self._claims.add(key)
+        return None
+
+    def set(self, key: str, fingerprint: str, value: Any):
+        """Guardar la respuesta de una clave reservada"""
+        self._store.set(self._file_key(key), {
+            'state': 'done',
+            'fingerprint': fingerprint,
+            'value': value,
+            'expires_at': time.time() + self.ttl_seconds,
+        })
+        self._claims.discard(key)
+
+    def release(self, key: str):
+        """Liberar una reserva sin respuesta (el endpoint falló): el reintento vuelve a ejecutar"""
+        if key not in self._claims:
+            return
+        self._claims.discard(key)
+        file_key = self._file_key(key)
+        with self._store.lock():
+            entry = self._store.get(file_key)
+            if entry is not None and entry.get('state') == 'pending':
+                self._store.delete(file_key)
+
+    def prune(self) -> int:
+        """Borrar entradas vencidas y recortar al tope (lo llama el decorador cada prune_interval)"""
+        self._last_prune = time.monotonic()
+        return self._store.prune(self._expired, self.max_entries)
+
+    def prune_due(self) -> bool:
+        return time.monotonic() - self._last_prune >= self.prune_interval
+
+    def clear(self):
+        """Limpiar todas las respuestas guardadas"""
+        self._store.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener estadísticas del almacén"""
+        return {
+            'entries': sum(1 for _ in self._store.keys()),
+            'max_entries': self.max_entries,
+            'in_flight': len(self._claims),
+            'replays': self._replays,
+        }
+
+
+# Instancia global (compartida entre workers vía SharedStore)
+idempotency_store = IdempotencyStore(
+    max_entries=config.IDEMPOTENCY_MAX_ENTRIES,
+    ttl_seconds=config.IDEMPOTENCY_TTL_SECONDS,
+    inflight_seconds=config.IDEMPOTENCY_INFLIGHT_SECONDS,
+)
+
+
+async def _wait_for_entry(key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    Reservar la clave o esperar a que el worker que la tiene termine
+
+    Devuelve None si la reserva quedó para este request, o la entrada 'done'
+    a reutilizar. Si el otro worker falla, su marca se borra y se reintenta
+    la reserva; si muere, la marca vence a los inflight_seconds.
+    """
+    while True:
+        entry = idempotency_store.claim(key, fingerprint)
+        if entry is None or entry.get('state') == 'done':
+            return entry
+        if entry.get('fingerprint') != fingerprint:
+            return entry
+        await asyncio.sleep(_POLL_SECONDS)
+
+
+def idempotent(scope: str, key_from: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None):
+    """
+    Decorador para endpoints de escritura idempotentes
+
+    La clave se toma del header Idempotency-Key o, si no viene, de
+    key_from(kwargs) (p. ej. el client_ticket_id de la venta). Sin clave, el
+    endpoint se ejecuta normalmente. Solo se guardan respuestas exitosas;
+    los errores (HTTPException) no se reutilizan para permitir el reintento.
+
+    Debe ir debajo del decorador de la ruta para que FastAPI registre el wrapper:
+        @pos_ventas_router.post("/ventas")
+        @idempotent("ventas", key_from=lambda kw: kw['venta'].client_ticket_id)
+        async def create_venta(...):
+    """
+    def decorator(func: Callable):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs.pop('idempotency_request')
+            response: Response = kwargs.pop('idempotency_response')
+
+            client_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not client_key and key_from is not None:
+                client_key = key_from(kwargs)
+            if not client_key:
+                return await func(*args, **kwargs)
+
+            current_user = kwargs.get('current_user') or {}
+            actor = current_user.get('sub') or current_user.get('uid') or 'anon'
+            key = f"{scope}:{actor}:{client_key}"
+            fingerprint = _fingerprint(kwargs)
+
+            # Reservar la clave o esperar al reintento que ya la está procesando
+            entry = await _wait_for_entry(key, fingerprint)
+            if entry is not None:
+                if entry['fingerprint'] != fingerprint:
+                    raise HTTPException(
+                        status_code=422,
+                        detail=f"{IDEMPOTENCY_HEADER} ya fue usada con otros parámetros"
+                    )
+                idempotency_store._replays += 1
+                response.headers[REPLAYED_HEADER] = "true"
+                return entry['value']
+
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException:
+                idempotency_store.release(key)
+                raise
+            try:
+                idempotency_store.set(key, fingerprint, jsonable_encoder(result))
+            except Exception as e:
+                # La escritura ya se hizo: un fallo al guardar no debe convertirla en error
+                idempotency_store.release(key)
+                logger.error(f"Could not store idempotent response for {scope}: {e}")
+            if idempotency_store.prune_due():
+                await asyncio.to_thread(idempotency_store.prune)
+            return result
+
+        # Exponer Request/Response a FastAPI sin cambiar la firma del endpoint
+        signature = inspect.signature(func)
+        extra = [
+            inspect.Parameter('idempotency_request', inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            inspect.Parameter('idempotency_response', inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ]
+        wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), *extra])
+        return wrapper
+    return decorator
+
+
+def _fingerprint(kwargs: Dict[str, Any]) -> str:
+    """Huella de los parámetros para detectar claves reutilizadas con otro payload"""
+    data = {}
+    for k, v in sorted(kwargs.items()):
+        if k in _IGNORED_PARAMS:
+            continue
+        if isinstance(v, BaseModel):
+            v = v.model_dump(mode='json')
+        elif isinstance(v, Decimal):
+            v = str(v)
+        data[k] = v
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
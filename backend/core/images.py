@@ -0,0 +1,104 @@
+"""
+Variantes redimensionadas de las fotos de miembros
+Al subir una foto se guardan, junto al original, versiones WebP pequeñas para
+listas (thumb) y para la ficha (medium). Las rutas son fijas por foto:
+
+    {foto_id}/original.jpg   (extensión según el content type)
+    {foto_id}/thumb.webp
+    {foto_id}/medium.webp
+
+así las URLs de las variantes se derivan de foto_url sin otra columna. Las
+fotos anteriores (guardadas como {uuid}.jpg) no tienen variantes.
+"""
+from typing import Any, Dict, Optional
+import io
+import re
+
+# Lado mayor en píxeles de cada variante
+VARIANT_SIZES = {
+    'thumb': 160,
+    'medium': 640,
+}
+WEBP_QUALITY = 80
+# Las rutas incluyen un uuid nuevo por foto: el contenido nunca cambia
+IMMUTABLE_CACHE_SECONDS = 31536000
+# Tope de píxeles a decodificar: un PNG de 5MB puede expandirse a cientos de
+# megapíxeles (bomba de descompresión). Por encima solo se guarda el original
+MAX_SOURCE_PIXELS = 40_000_000
+
+# Extensión del original según el content type ya validado (el nombre de
+# archivo puede no traerla, p. ej. "blob" desde la cámara de una tablet)
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+}
+
+# La extensión es opcional: hay originales guardados como {foto_id}/original
+_ORIGINAL_RE = re.compile(r'^(?P<base>.*/[0-9a-f-]{36})/original(?:\.[A-Za-z0-9]+)?(?P<query>\?.*)?$')
+
+
+def extension_for(content_type: Optional[str]) -> str:
+    return CONTENT_TYPE_EXTENSIONS.get((content_type or '').lower(), '')
+
+
+def original_path(foto_id: str, ext: str) -> str:
+    return f"{foto_id}/original{ext.lower()}"
+
+
+def variant_path(foto_id: str, variant: str) -> str:
+    return f"{foto_id}/{variant}.webp"
+
+
+def build_variants(source_path: str) -> Dict[str, bytes]:
+    """
+    Generar las variantes WebP de una imagen en disco (CPU: llamar en un hilo)
+    Respeta la orientación EXIF y no amplía imágenes pequeñas. Lanza
+    ValueError si la imagen supera MAX_SOURCE_PIXELS (no se decodifica).
+    """
+    # Pillow se importa al procesar la primera foto, no al arrancar
+    from PIL import Image, ImageOps
+
+    variants: Dict[str, bytes] = {}
+    with Image.open(source_path) as img:
+        # open() solo lee el encabezado: validar el tamaño antes de decodificar
+        width, height = img.size
+        if width * height > MAX_SOURCE_PIXELS:
+            raise ValueError(f"image too large to resize ({width}x{height})")
+        largest = max(VARIANT_SIZES.values())
+        # JPEG: decodificar directamente a menor escala cuando la foto es grande
+        img.draft('RGB', (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+        # De mayor a menor, reutilizando la anterior como fuente
+        current = img
+        for name, size in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+            current = current.copy()
+            current.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            current.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+            variants[name] = buffer.getvalue()
+    return variants
+
+
+def variant_urls(foto_url: Optional[str]) -> Dict[str, Optional[str]]:
+    """URLs de las variantes a partir de foto_url (None si la foto no tiene variantes)"""
+    urls: Dict[str, Optional[str]] = {f'foto_{name}_url': None for name in VARIANT_SIZES}
+    if not foto_url:
+        return urls
+    match = _ORIGINAL_RE.match(foto_url)
+    if match is None:
+        return urls
+    for name in VARIANT_SIZES:
+        urls[f'foto_{name}_url'] = f"{match.group('base')}/{name}.webp{match.group('query') or ''}"
+    return urls
+
+
+def with_variant_urls(miembro: Dict[str, Any]) -> Dict[str, Any]:
+    """Agregar foto_thumb_url/foto_medium_url a una fila de miembros"""
+    miembro.update(variant_urls(miembro.get('foto_url')))
+    return miembro
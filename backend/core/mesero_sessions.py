@@ -0,0 +1,116 @@
+"""
+Sesiones de meseros temporales activos
+Conjunto compartido entre workers con los meseros habilitados para vender y
+sus credenciales (hash del PIN). Se llena al abrir turno y se revoca al
+desactivar/cerrar, así ni la venta ni el login consultan usuarios_temporales.
+Si un mesero no está cargado (worker nuevo, reinicio) se consulta la base y
+se vuelve a cargar.
+"""
+from typing import Any, Dict, Iterable, Optional
+from datetime import datetime
+from .shared_state import SharedStore
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def parse_validity(fin_validity: Any) -> Optional[float]:
+    """Convertir fin_validity (ISO 8601) a timestamp; None si no hay límite"""
+    if not fin_validity or not isinstance(fin_validity, str):
+        return None
+    try:
+        return datetime.fromisoformat(fin_validity.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class ActiveMeseros:
+    """Conjunto de meseros activos (uuid → fin de validez) y sus credenciales (username → datos de login)"""
+
+    def __init__(self):
+        self._store = SharedStore('active_meseros')
+        self._credentials = SharedStore('mesero_credentials')
+        self._meta = SharedStore('active_meseros_meta')
+
+    def generation(self) -> Optional[str]:
+        """Marca que cambia en cada revocación"""
+        return self._meta.get('generation')
+
+    def activate(self, mesero_uuid: str, fin_validity: Any = None):
+        """Habilitar un mesero hasta su fin de validez"""
+        self._store.set(mesero_uuid, {'expires_at': parse_validity(fin_validity)})
+
+    def preload_credentials(self, mesero: Dict[str, Any]):
+        """Guardar uuid, username, display_name, pin_hash y validez para el login"""
+        self._credentials.set(mesero['username'], {
+            'uuid': mesero['uuid'],
+            'username': mesero['username'],
+            'display_name': mesero.get('display_name'),
+            'pin_hash': mesero['pin_hash'],
+            'expires_at': parse_validity(mesero.get('fin_validity')),
+        })
+
+    def get_credentials(self, username: str) -> Optional[Dict[str, Any]]:
+        """Credenciales precargadas de un mesero, o None si no están cargadas"""
+        return self._credentials.get(username)
+
+    def restore_credentials(self, mesero: Dict[str, Any], generation: Optional[str]):
+        """Recargar credenciales leídas de la base (ver restore)"""
+        if self.generation() == generation:
+            self.preload_credentials(mesero)
+
+    def restore(self, mesero_uuid: str, fin_validity: Any, generation: Optional[str]):
+        """
+        Recargar un mesero verificado en la base
+
+        generation se lee antes de la consulta: si hubo una revocación en el
+        medio, el resultado de la base ya no es confiable y no se recarga.
+        """
+        if self.generation() == generation:
+            self.activate(mesero_uuid, fin_validity)
+
+    def _bump_generation(self):
+        self._meta.set('generation', f"{time.time_ns():x}")
+
+    def is_active(self, mesero_uuid: str) -> bool:
+        """True si el mesero está en el conjunto y su validez no ha vencido"""
+        entry = self._store.get(mesero_uuid)
+        if entry is None:
+            return False
+        expires_at = entry.get('expires_at')
+        if expires_at is not None and time.time() > expires_at:
+            self._store.delete(mesero_uuid)
+            return False
+        return True
+
+    def revoke(self, mesero_uuid: str):
+        """Revocar un mesero (efecto inmediato en todos los workers)"""
+        self.revoke_many([mesero_uuid])
+
+    def revoke_many(self, mesero_uuids: Iterable[str]):
+        revoked = set(mesero_uuids)
+        self._bump_generation()
+        for mesero_uuid in revoked:
+            self._store.delete(mesero_uuid)
+        # Pocos meseros por turno: recorrer las credenciales es suficiente
+        for username in list(self._credentials.keys()):
+            entry = self._credentials.get(username)
+            if entry is not None and entry.get('uuid') in revoked:
+                self._credentials.delete(username)
+
+    def revoke_all(self):
+        """Revocar todos los meseros y sus credenciales (cierre de turno)"""
+        self._bump_generation()
+        self._store.clear()
+        self._credentials.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'active': sum(1 for _ in self._store.keys()),
+            'preloaded_credentials': sum(1 for _ in self._credentials.keys()),
+        }
+
+
+# Instancia global (compartida entre workers vía SharedStore)
+active_meseros = ActiveMeseros()
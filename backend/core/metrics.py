@@ -0,0 +1,222 @@
+"""
+Métricas de latencia por ruta
+Histogramas de buckets fijos por (método, ruta, status), con el total de
+bytes enviados en la respuesta. La ruta es la plantilla
+("/api/pos/ventas/{venta_uuid}"), no el path, para no crear una serie por
+cada uuid.
+
+Cada worker acumula en memoria y publica su copia en el estado compartido
+cada pocos segundos; /api/metrics suma las copias de los workers vivos.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_left
+from .config import config
+from .shared_state import SharedStore
+import os
+import threading
+import time
+
+# Límites superiores de los buckets, en segundos (el último implícito es +Inf)
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0
+)
+SLOW_REQUEST_SECONDS = 1.0
+UNMATCHED_ROUTE = "unmatched"
+
+SeriesKey = Tuple[str, str, int]
+
+
+class LatencyHistogram:
+    """Histograma acumulativo de buckets fijos (compatible con Prometheus)"""
+
+    __slots__ = ('counts', 'count', 'total', 'max', 'bytes')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Bytes del cuerpo de las respuestas (no es parte del histograma)
+        self.bytes = 0
+
+    def observe(self, seconds: float, response_bytes: int = 0):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.bytes += response_bytes
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.bytes += other.bytes
+
+    def percentile(self, q: float) -> float:
+        """Percentil aproximado (interpolación lineal dentro del bucket), en segundos"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max
+                # Nunca por encima del máximo observado
+                return min(lower + (upper - lower) * ((rank - seen) / n), self.max)
+            seen += n
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'counts': self.counts, 'count': self.count, 'total': self.total, 'max': self.max, 'bytes': self.bytes}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        hist = cls()
+        if len(data.get('counts', [])) == len(hist.counts):
+            hist.counts = list(data['counts'])
+            hist.count = data['count']
+            hist.total = data['total']
+            hist.max = data.get('max', 0.0)
+            hist.bytes = data.get('bytes', 0)
+        return hist
+
+
+class RequestMetrics:
+    """Registro de latencias del proceso, publicado periódicamente para los demás workers"""
+
+    def __init__(self, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self._series: Dict[SeriesKey, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._store = SharedStore('request_metrics')
+        self._last_flush = 0.0
+        self._started_at = time.time()
+
+    def record(self, method: str, route: str, status: int, seconds: float, response_bytes: int = 0):
+        key = (method, route, status)
+        with self._lock:
+            hist = self._series.get(key)
+            if hist is None:
+                hist = self._series[key] = LatencyHistogram()
+            hist.observe(seconds, response_bytes)
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._last_flush = now
+            self.flush()
+
+    def flush(self):
+        """Publicar la copia de este worker en el estado compartido"""
+        with self._lock:
+            series = [[m, r, s, h.to_dict()] for (m, r, s), h in self._series.items()]
+        self._store.set(str(os.getpid()), {'started_at': self._started_at, 'series': series})
+
+    def collect(self) -> Dict[SeriesKey, LatencyHistogram]:
+        """Histogramas sumados de todos los workers vivos (este incluido, al día)"""
+        self.flush()
+        merged: Dict[SeriesKey, LatencyHistogram] = {}
+        for pid in list(self._store.keys()):
+            if not _process_alive(pid):
+                self._store.delete(pid)
+                continue
+            snapshot = self._store.get(pid)
+            if snapshot is None:
+                continue
+            for method, route, status, data in snapshot.get('series', []):
+                key = (method, route, int(status))
+                hist = merged.get(key)
+                if hist is None:
+                    hist = merged[key] = LatencyHistogram()
+                hist.merge(LatencyHistogram.from_dict(data))
+        return merged
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+        self._store.clear()
+
+
+def _process_alive(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def summarize(series: Dict[SeriesKey, LatencyHistogram]) -> Dict[str, Any]:
+    """Vista JSON: totales y p50/p95/p99 por ruta (ms), rutas más lentas primero"""
+    total = LatencyHistogram()
+    slow = 0
+    slow_bucket = bisect_left(LATENCY_BUCKETS, SLOW_REQUEST_SECONDS) + 1
+    routes: List[Dict[str, Any]] = []
+    for (method, route, status), hist in series.items():
+        total.merge(hist)
+        slow += sum(hist.counts[slow_bucket:])
+        routes.append({
+            'method': method,
+            'route': route,
+            'status': status,
+            'count': hist.count,
+            'avg_ms': _ms(hist.total / hist.count if hist.count else 0.0),
+            'p50_ms': _ms(hist.percentile(0.50)),
+            'p95_ms': _ms(hist.percentile(0.95)),
+            'p99_ms': _ms(hist.percentile(0.99)),
+            'avg_bytes': round(hist.bytes / hist.count) if hist.count else 0,
+        })
+    routes.sort(key=lambda r: r['p95_ms'], reverse=True)
+    return {
+        'total': total.count,
+        'avg_response_time_ms': _ms(total.total / total.count if total.count else 0.0),
+        'p50_ms': _ms(total.percentile(0.50)),
+        'p95_ms': _ms(total.percentile(0.95)),
+        'p99_ms': _ms(total.percentile(0.99)),
+        'slow_requests': slow,
+        'slow_request_rate': round((slow / total.count * 100) if total.count else 0, 2),
+        'routes': routes,
+    }
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def prometheus_text(series: Dict[SeriesKey, LatencyHistogram], extra_gauges: Optional[Iterable[Tuple[str, str, float]]] = None) -> str:
+    """Formato de exposición de texto de Prometheus (histograma http_request_duration_seconds)"""
+    lines = [
+        '# HELP http_request_duration_seconds Request latency by route template',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for (method, route, status), hist in sorted(series.items()):
+        labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, hist.counts):
+            cumulative += n
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+        lines.append(f'http_request_duration_seconds_sum{{{labels}}} {hist.total}')
+        lines.append(f'http_request_duration_seconds_count{{{labels}}} {hist.count}')
+    lines.append('# HELP http_response_size_bytes Response body size by route template')
+    lines.append('# TYPE http_response_size_bytes summary')
+    for (method, route, status), hist in sorted(series.items()):
+        labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+        lines.append(f'http_response_size_bytes_sum{{{labels}}} {hist.bytes}')
+        lines.append(f'http_response_size_bytes_count{{{labels}}} {hist.count}')
+    for name, help_text, value in extra_gauges or ():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Instancia global del proceso
+request_metrics = RequestMetrics(flush_interval=config.METRICS_FLUSH_SECONDS)
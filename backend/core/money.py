@@ -0,0 +1,80 @@
+"""
+Montos de dinero como enteros en centavos
+La base guarda numeric(12,2) y la API habla en pesos (número JSON). Dentro del
+backend los montos son int en centavos: se convierten una sola vez al entrar
+(modelos con el tipo Money, filas de Supabase con to_cents) y vuelven a pesos
+solo al salir (from_cents, o el serializador de Money en model_dump).
+Sumas y comparaciones son exactas, sin tolerancias tipo "> 0.01".
+"""
+from typing import Annotated, Any, Iterable, Union
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from pydantic import BeforeValidator, PlainSerializer, WithJsonSchema
+import math
+
+Cents = int
+
+# numeric(12,2): hasta 10 dígitos enteros
+MAX_CENTS = 10 ** 12 - 1
+
+
+def _checked(cents: Cents, value: Any) -> Cents:
+    if -MAX_CENTS <= cents <= MAX_CENTS:
+        return cents
+    raise ValueError(f"Monto fuera de rango: {value!r}")
+
+
+def to_cents(value: Any) -> Cents:
+    """
+    Pesos (int, float, Decimal o str de la base / del cliente) a centavos
+
+    Con más de 2 decimales redondea ROUND_HALF_UP sobre el valor decimal
+    escrito (1.005 y "1.005" dan 101, igual que numeric(12,2)). Rechaza con
+    ValueError NaN, Infinity y montos fuera de numeric(12,2).
+    """
+    # Camino rápido: PostgREST devuelve numeric como número JSON (float o int)
+    kind = type(value)
+    if kind is float:
+        if not math.isfinite(value):
+            raise ValueError(f"Monto inválido: {value!r}")
+        scaled = value * 100
+        cents = scaled.__round__()
+        # Con a lo sumo 2 decimales (lo que guarda la base) value * 100 queda a
+        # un error mínimo de un entero; si no, se redondea sobre el decimal escrito
+        if abs(scaled - cents) < 1e-6:
+            return _checked(cents, value)
+    elif kind is int:
+        return _checked(value * 100, value)
+    if value is None or value == '':
+        return 0
+    if kind is bool:
+        raise ValueError("Monto inválido")
+    try:
+        # repr/str de un float es el decimal más corto que lo representa
+        amount = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+        if not amount.is_finite():
+            raise ValueError(f"Monto inválido: {value!r}")
+        return _checked(int((amount * 100).to_integral_value(rounding=ROUND_HALF_UP)), value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Monto inválido: {value!r}")
+
+
+def from_cents(cents: Cents) -> Union[int, float]:
+    """Centavos a pesos para JSON / Supabase (int si no hay centavos)"""
+    if cents % 100 == 0:
+        return cents // 100
+    return cents / 100
+
+
+def sum_cents(rows: Iterable[Any], field: str) -> Cents:
+    """Suma exacta de una columna de dinero de filas de Supabase"""
+    return sum(to_cents(row.get(field)) for row in rows)
+
+
+# Campo de dinero para modelos: recibe pesos, se guarda en centavos y
+# model_dump lo devuelve en pesos
+Money = Annotated[
+    Cents,
+    BeforeValidator(to_cents),
+    PlainSerializer(from_cents),
+    WithJsonSchema({'type': 'number', 'description': 'Monto en pesos (hasta 2 decimales)'}),
+]
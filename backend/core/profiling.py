@@ -0,0 +1,272 @@
+"""
+Perfilado bajo demanda (cProfile) de requests seleccionados
+Un admin arma una sesión con un patrón de path (glob, p. ej.
+"/api/pos/reportes/*") y una cantidad N de requests. Los próximos N requests
+que coincidan, en cualquier worker, se ejecutan con cProfile y sus
+estadísticas quedan en disco; al consultar se suman en un solo pstats.
+
+- Los cupos se reservan creando archivos con O_EXCL: entre todos los workers
+  nunca se perfilan más de N requests.
+- Un worker perfila un request a la vez; si hay otro en curso el request pasa
+  sin perfilar y no consume cupo.
+- En el hilo del event loop el perfilador se enciende solo mientras corre un
+  paso de este request: las demás corrutinas del loop no se mezclan.
+- El trabajo enviado a hilos con profiling.to_thread (run_query y las
+  agregaciones de reportes) se perfila dentro del hilo y se suma al mismo
+  resultado. asyncio.to_thread directo y los endpoints síncronos no se ven.
+"""
+from typing import Any, Awaitable, Callable, Dict, Generator, List, Optional, TypeVar
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from .config import config
+from .shared_state import SharedStore
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import shutil
+import threading
+import time
+import uuid
+
+T = TypeVar('T')
+
+MAX_PROFILED_REQUESTS = 200
+# Cada cuánto un worker vuelve a leer la sesión armada
+_SESSION_CHECK_SECONDS = 1.0
+
+
+class RequestProfiler:
+    """Sesiones de perfilado compartidas entre workers"""
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self.base_dir = os.path.join(base_dir or config.SHARED_STATE_DIR, 'profiles')
+        self._meta = SharedStore('profiling')
+        self._session: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._busy = False
+
+    # ----- control (endpoints de admin) -----
+
+    def arm(self, pattern: str, requests: int, ttl_seconds: int) -> Dict[str, Any]:
+        """Armar una sesión nueva; descarta la anterior y sus resultados"""
+        self.disarm()
+        session = {
+            'id': uuid.uuid4().hex,
+            'pattern': pattern,
+            'requests': max(1, min(requests, MAX_PROFILED_REQUESTS)),
+            'armed_at': time.time(),
+            'expires_at': time.time() + ttl_seconds,
+        }
+        os.makedirs(self._session_dir(session['id']), mode=0o700, exist_ok=True)
+        self._meta.set('session', session)
+        self._session, self._checked_at = session, time.monotonic()
+        return session
+
+    def disarm(self):
+        session = self._meta.get('session')
+        self._meta.delete('session')
+        self._session = None
+        if session is not None:
+            shutil.rmtree(self._session_dir(session['id']), ignore_errors=True)
+
+    def status(self) -> Optional[Dict[str, Any]]:
+        session = self._meta.get('session')
+        if session is None:
+            return None
+        session_dir = self._session_dir(session['id'])
+        names = _listdir(session_dir)
+        return {
+            **session,
+            'claimed': sum(1 for n in names if n.startswith('slot-')),
+            'completed': sum(1 for n in names if n.endswith('.prof')),
+            'expired': time.time() >= session['expires_at'],
+        }
+
+    def stats(self) -> Optional[pstats.Stats]:
+        """Estadísticas sumadas de los requests perfilados (None si no hay ninguno)"""
+        session = self._meta.get('session')
+        if session is None:
+            return None
+        session_dir = self._session_dir(session['id'])
+        files = sorted(os.path.join(session_dir, n) for n in _listdir(session_dir) if n.endswith('.prof'))
+        if not files:
+            return None
+        stats = pstats.Stats(files[0], stream=io.StringIO())
+        for path in files[1:]:
+            stats.add(path)
+        return stats
+
+    # ----- por request (middleware) -----
+
+    def maybe_start(self, path: str) -> Optional["_ActiveProfile"]:
+        """Iniciar el perfilado si hay sesión armada para este path y queda cupo"""
+        session = self._current_session()
+        if session is None or self._busy or not fnmatchcase(path, session['pattern']):
+            return None
+        slot = self._claim_slot(session)
+        if slot is None:
+            return None
+        self._busy = True
+        active = _ActiveProfile(self, session['id'], slot, path)
+        active.token = _active_profile.set(active)
+        return active
+
+    def _finish(self, active: "_ActiveProfile"):
+        _active_profile.reset(active.token)
+        self._busy = False
+        with active.lock:
+            # Un hilo que termine después del request (timeout) ya no se suma
+            active.closed = True
+            profiles = [active.profile, *active.thread_profiles]
+        session_dir = self._session_dir(active.session_id)
+        if not os.path.isdir(session_dir):
+            # Sesión desarmada mientras corría el request
+            return
+        target = os.path.join(session_dir, f"{active.slot:04d}-{os.getpid()}.prof")
+        tmp = f"{target}.tmp"
+        with open(tmp, 'wb') as f:
+            marshal.dump(_merge_profiles(profiles), f)
+        os.replace(tmp, target)
+
+    def _current_session(self) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        if now - self._checked_at >= _SESSION_CHECK_SECONDS:
+            self._checked_at = now
+            self._session = self._meta.get('session')
+        session = self._session
+        if session is None or time.time() >= session['expires_at']:
+            return None
+        return session
+
+    def _claim_slot(self, session: Dict[str, Any]) -> Optional[int]:
+        session_dir = self._session_dir(session['id'])
+        for slot in range(session['requests']):
+            try:
+                fd = os.open(os.path.join(session_dir, f"slot-{slot}"), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+            except FileExistsError:
+                continue
+            except FileNotFoundError:
+                # Sesión desarmada por otro worker
+                self._session = None
+                return None
+            os.close(fd)
+            return slot
+        # Sin cupo: dejar de revisar hasta la próxima lectura de la sesión
+        self._session = None
+        return None
+
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.base_dir, session_id)
+
+
+class _ActiveProfile:
+    """Perfilado de un request: el paso por el event loop más los hilos que usó"""
+    __slots__ = ('profiler', 'profile', 'session_id', 'slot', 'path', 'token', 'lock', 'closed', 'thread_profiles')
+
+    def __init__(self, profiler: RequestProfiler, session_id: str, slot: int, path: str):
+        self.profiler = profiler
+        self.profile = cProfile.Profile()
+        self.session_id = session_id
+        self.slot = slot
+        self.path = path
+        self.token: Any = None
+        self.lock = threading.Lock()
+        self.closed = False
+        self.thread_profiles: List[cProfile.Profile] = []
+
+    def wrap(self, awaitable: Awaitable[T]) -> Awaitable[T]:
+        """Perfilar en el event loop solo los pasos de este awaitable"""
+        return _ProfiledAwaitable(awaitable, self.profile)
+
+    def run_in_thread(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Ejecutar func (ya dentro del hilo) con su propio cProfile"""
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            with self.lock:
+                if not self.closed:
+                    self.thread_profiles.append(profile)
+
+    def finish(self):
+        self.profiler._finish(self)
+
+
+class _ProfiledAwaitable:
+    """Awaitable que enciende el perfilador solo mientras avanza el awaitable interno"""
+    __slots__ = ('awaitable', 'profile')
+
+    def __init__(self, awaitable: Awaitable[Any], profile: cProfile.Profile):
+        self.awaitable = awaitable
+        self.profile = profile
+
+    def __await__(self) -> Generator[Any, Any, Any]:
+        iterator = self.awaitable.__await__()
+        step: Callable[[Any], Any] = iterator.send
+        value: Any = None
+        while True:
+            self.profile.enable()
+            try:
+                yielded = step(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profile.disable()
+            # Mientras el request espera, el loop corre otras corrutinas sin perfilar
+            try:
+                value = yield yielded
+                step = iterator.send
+            except BaseException as exc:
+                value = exc
+                step = iterator.throw
+
+
+_active_profile: ContextVar[Optional[_ActiveProfile]] = ContextVar('active_profile', default=None)
+
+
+async def to_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    asyncio.to_thread que, si el request actual se está perfilando, perfila
+    también el trabajo dentro del hilo (sin sesión activa es igual a to_thread)
+    """
+    active = _active_profile.get()
+    if active is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return await asyncio.to_thread(active.run_in_thread, func, *args, **kwargs)
+
+
+def _merge_profiles(profiles: List[cProfile.Profile]) -> Dict[Any, Any]:
+    """Sumar varios cProfile en un dict de pstats (los vacíos se omiten)"""
+    stats = pstats.Stats(stream=io.StringIO())
+    for profile in profiles:
+        profile.create_stats()
+        if profile.stats:
+            stats.add(profile)
+    return stats.stats
+
+
+def _listdir(path: str) -> List[str]:
+    try:
+        return os.listdir(path)
+    except FileNotFoundError:
+        return []
+
+
+def format_stats(stats: pstats.Stats, sort: str = 'cumulative', limit: int = 50) -> str:
+    """Salida de texto de pstats (print_stats) ordenada y recortada"""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def dump_stats(stats: pstats.Stats) -> bytes:
+    """Formato binario de pstats (cargable con pstats.Stats, snakeviz, flameprof)"""
+    return marshal.dumps(stats.stats)
+
+
+# Instancia global del proceso (la sesión armada se comparte vía archivos)
+request_profiler = RequestProfiler()
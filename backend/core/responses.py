@@ -0,0 +1,47 @@
+"""
+Respuestas JSON con orjson
+FastJSONResponse es la clase de respuesta por defecto de la app: serializa
+con orjson (datetime, date, UUID y dataclasses nativos; Decimal vía default)
+en lugar de json.dumps. También renderiza los 422 de validación: el handler
+por defecto usa json.dumps y un input como Infinity lo convertía en 500.
+
+Los listados grandes (productos, ventas, cuentas, miembros) devuelven la
+respuesta directamente: FastAPI no pasa el contenido por jsonable_encoder ni
+valida contra response_model, que queda solo como esquema de la documentación.
+Las filas de Supabase ya son tipos JSON, no hace falta convertirlas.
+"""
+from typing import Any
+from decimal import Decimal
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+import orjson
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(mode='json')
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada con orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+    """Mismo cuerpo que el handler de FastAPI; orjson escribe inf/nan del input como null"""
+    return FastJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
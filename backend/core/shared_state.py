@@ -0,0 +1,121 @@
+"""
+Estado compartido entre workers del mismo host
+Uvicorn corre varios procesos (--workers 4); lo que uno invalida debe verse
+en los demás. Cada clave es un archivo pequeño en un directorio en memoria
+(/dev/shm cuando existe), así leer cuesta una syscall y no una consulta.
+"""
+from typing import Any, Callable, Iterator, Optional
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+from .config import config
+import fcntl
+import json
+import os
+import uuid
+
+# Archivo de lock del namespace; no es una clave
+_LOCK_FILE = '.lock'
+
+
+class SharedStore:
+    """Almacén clave→valor JSON compartido entre procesos (un archivo por clave)"""
+
+    def __init__(self, namespace: str, base_dir: Optional[str] = None):
+        self.path = os.path.join(base_dir or config.SHARED_STATE_DIR, namespace)
+        # Puede guardar datos sensibles (hashes de PIN): solo el usuario del proceso
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, quote(str(key), safe=''))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Obtener valor o default si no existe"""
+        try:
+            with open(self._file(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return default
+
+    def set(self, key: str, value: Any):
+        """Guardar valor de forma atómica (escritura temporal + rename)"""
+        target = self._file(key)
+        tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(value, f, default=str)
+        os.replace(tmp, target)
+
+    def contains(self, key: str) -> bool:
+        """Verificar existencia sin leer el contenido"""
+        return os.path.exists(self._file(key))
+
+    def delete(self, key: str):
+        """Eliminar clave (no falla si no existe)"""
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self) -> Iterator[str]:
+        """Iterar sobre las claves guardadas"""
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith('.tmp') and name != _LOCK_FILE:
+                yield unquote(name)
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """
+        Lock exclusivo del namespace entre procesos (flock)
+
+        Para leer-y-escribir una clave sin que otro worker se meta en el
+        medio. Debe cubrir solo operaciones de archivo, nunca una consulta.
+        """
+        fd = os.open(os.path.join(self.path, _LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def prune(self, expired: Callable[[Any], bool], max_entries: Optional[int] = None) -> int:
+        """
+        Eliminar claves vencidas y, si sobran, las más antiguas (por mtime)
+
+        expired(valor) decide si una entrada venció. Devuelve cuántas se borraron.
+        """
+        removed = 0
+        alive = []
+        for key in list(self.keys()):
+            target = self._file(key)
+            value = self.get(key)
+            try:
+                if value is None or expired(value):
+                    os.remove(target)
+                    removed += 1
+                else:
+                    alive.append((os.path.getmtime(target), target))
+            except FileNotFoundError:
+                pass
+        if max_entries is not None and len(alive) > max_entries:
+            alive.sort()
+            for _, target in alive[:len(alive) - max_entries]:
+                try:
+                    os.remove(target)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def clear(self):
+        """Eliminar todas las claves del namespace"""
+        # Se borran archivos y no el directorio: otro worker puede estar escribiendo
+        for name in os.listdir(self.path):
+            if name.endswith('.tmp') or name == _LOCK_FILE:
+                continue
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
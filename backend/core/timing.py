@@ -0,0 +1,81 @@
+"""
+Middleware ASGI de timing y métricas por request
+Reemplaza al @app.middleware("http") (BaseHTTPMiddleware): no crea una tarea
+ni un stream intermedio por request y no retiene el cuerpo, así que las
+respuestas en streaming pasan tal cual.
+
+- X-Process-Time y Server-Timing se agregan al inicio de la respuesta
+  (tiempo hasta los encabezados)
+- el histograma por ruta registra el tiempo total, cuerpo incluido, el status
+  y los bytes enviados
+- abre el registro de consultas a Supabase y el perfilado bajo demanda
+"""
+from typing import Any
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .db_metrics import begin_request, end_request, check_n_plus_one, install_hooks as install_db_hooks
+from .metrics import request_metrics, SLOW_REQUEST_SECONDS, UNMATCHED_ROUTE
+from .profiling import request_profiler
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimingMiddleware:
+    """
+    Middleware ASGI puro con perf_counter_ns
+
+    db_client: cliente de Supabase cuyas consultas se cuentan por request.
+    """
+
+    def __init__(self, app: ASGIApp, db_client: Any):
+        self.app = app
+        self.db_client = db_client
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        install_db_hooks(self.db_client)
+        queries, token = begin_request()
+        profile = request_profiler.maybe_start(scope['path'])
+        start = time.perf_counter_ns()
+        # Si la app falla antes de responder, ServerErrorMiddleware devuelve 500
+        status = 500
+        sent_bytes = 0
+
+        async def timed_send(message: Message):
+            nonlocal status, sent_bytes
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                elapsed_ms = (time.perf_counter_ns() - start) / 1e6
+                message['headers'] = [
+                    *message.get('headers', ()),
+                    (b'x-process-time', f"{elapsed_ms / 1000:.4f}".encode()),
+                    (b'server-timing', f"{queries.server_timing()}, app;dur={elapsed_ms:.1f}".encode()),
+                ]
+            elif message['type'] == 'http.response.body':
+                sent_bytes += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            app_call = self.app(scope, receive, timed_send)
+            await (profile.wrap(app_call) if profile is not None else app_call)
+        finally:
+            end_request(token)
+            if profile is not None:
+                profile.finish()
+            seconds = (time.perf_counter_ns() - start) / 1e9
+
+            # El router deja la ruta que coincidió en el scope
+            route_path = getattr(scope.get('route'), 'path', UNMATCHED_ROUTE)
+            method = scope['method']
+            request_metrics.record(method, route_path, status, seconds, sent_bytes)
+            check_n_plus_one(queries, method, route_path)
+
+            if seconds > SLOW_REQUEST_SECONDS:
+                logger.warning(
+                    f"Slow request: {method} {scope['path']} took {seconds:.4f}s "
+                    f"({queries.count} queries, {queries.total_ms:.1f}ms in db, {sent_bytes} bytes)"
+                )
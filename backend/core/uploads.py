@@ -0,0 +1,192 @@
+"""
+Recepción de archivos con memoria acotada
+- UploadSizeLimitMiddleware: rechaza por Content-Length antes de leer el
+  cuerpo y corta cuerpos sin Content-Length al superar el límite
+- spool_upload: copia el UploadFile por bloques a un temporal en disco,
+  verificando el tamaño y calculando el sha256 mientras se lee; storage
+  sube desde el archivo
+"""
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, UploadFile
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024
+# Margen para los encabezados y separadores del multipart
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class _BodyTooLarge(HTTPException):
+    """HTTPException para que FastAPI no la convierta en error de parseo (400)"""
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=_too_large_detail(limit))
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Middleware ASGI que limita el tamaño del cuerpo por ruta
+
+    limits: {path: bytes máximos del archivo}; al límite se le suma el
+    margen del multipart.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = {path: size + MULTIPART_OVERHEAD for path, size in limits.items()}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['method'] != 'POST' or scope['path'] not in self.limits:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits[scope['path']]
+        for name, value in scope['headers']:
+            if name == b'content-length':
+                try:
+                    too_large = int(value) > limit
+                except ValueError:
+                    too_large = False
+                if too_large:
+                    await _send_too_large(send, limit)
+                    return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    raise _BodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message: Message):
+            nonlocal response_started
+            if message['type'] == 'http.response.start':
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await _send_too_large(send, limit)
+
+
+def _too_large_detail(limit: int) -> str:
+    max_mb = (limit - MULTIPART_OVERHEAD) / (1024 * 1024)
+    return f"Archivo muy grande. Máximo {max_mb:g}MB"
+
+
+async def _send_too_large(send: Send, limit: int):
+    body = json.dumps({"detail": _too_large_detail(limit)}).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': 413,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class SpooledUpload:
+    """Archivo recibido, guardado en un temporal en disco (sha256: hex del contenido)"""
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def open(self):
+        """Abrir para lectura (BufferedReader, aceptado por storage.upload)"""
+        return open(self.path, 'rb')
+
+    def cleanup(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc: Any):
+        self.cleanup()
+
+
+async def spool_upload(file: UploadFile, max_bytes: int, too_large_detail: Optional[str] = None) -> SpooledUpload:
+    """
+    Copiar un UploadFile por bloques a un temporal, cortando al superar max_bytes
+    Nunca hay más de CHUNK_SIZE bytes del archivo en memoria
+    """
+    fd, path = tempfile.mkstemp(prefix='upload-')
+    size = 0
+    hasher = hashlib.sha256()
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=too_large_detail or f"Archivo muy grande. Máximo {max_bytes // (1024 * 1024)}MB"
+                    )
+                await asyncio.to_thread(_write_chunk, out, hasher, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return SpooledUpload(path, size, hasher.hexdigest())
+
+
+def _write_chunk(out: Any, hasher: Any, chunk: bytes):
+    hasher.update(chunk)
+    out.write(chunk)
+
+
+def _file_options(content_type: str, cache_seconds: Optional[int]) -> Dict[str, str]:
+    options = {"content-type": content_type}
+    if cache_seconds is not None:
+        options["cache-control"] = str(cache_seconds)
+    return options
+
+
+def upload_to_storage(
+    storage: Any,
+    bucket_name: str,
+    path: str,
+    upload: SpooledUpload,
+    content_type: str,
+    cache_seconds: Optional[int] = None
+):
+    """Subir a Supabase Storage leyendo desde disco (httpx envía el archivo por bloques)"""
+    with upload.open() as fh:
+        return storage.from_(bucket_name).upload(
+            path=path,
+            file=fh,
+            file_options=_file_options(content_type, cache_seconds)
+        )
+
+
+def upload_bytes_to_storage(
+    storage: Any,
+    bucket_name: str,
+    path: str,
+    data: bytes,
+    content_type: str,
+    cache_seconds: Optional[int] = None
+):
+    """Subir contenido ya generado en memoria (variantes pequeñas)"""
+    return storage.from_(bucket_name).upload(
+        path=path,
+        file=data,
+        file_options=_file_options(content_type, cache_seconds)
+    )
@@ -0,0 +1,675 @@
+#!/usr/bin/env python3
+"""
+Pruebas de carga reproducibles contra la app en proceso
+Levanta server.app con un cliente de Supabase falso en memoria (latencia
+configurable por consulta) y reproduce los escenarios de un día de servicio:
+
+- login_burst: todos los meseros inician sesión al abrir el turno
+- selling:     20 meseros vendiendo a la vez
+- sync_push:   tablets que vuelven a tener red y empujan ventas offline (con reintentos)
+- reports:     reportes de ventas y productos de fin de mes
+- selling_during_reports: ventas mientras varios administradores corren reportes
+
+Las requests van por ASGI (httpx.ASGITransport) a un solo event loop, como un
+worker de uvicorn: las consultas síncronas al cliente bloquean el loop igual
+que en producción. Reporta throughput y p50/p95/p99 por escenario y, con
+--check, termina con código 1 si se supera algún umbral (para CI).
+
+Ejecutar con: python loadtest.py [--scenario selling] [--db-latency-ms 20] [--check]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Estado compartido aislado y sin credenciales reales: antes de importar la app
+_STATE_DIR = tempfile.mkdtemp(prefix="churchapp-loadtest-")
+os.environ["SHARED_STATE_DIR"] = _STATE_DIR
+os.environ.setdefault("FIREBASE_CREDENTIALS_PATH", os.path.join(_STATE_DIR, "firebase-disabled.json"))
+
+import httpx
+
+from core import config
+from core.db_metrics import current_queries
+
+MESERO_PIN = "1234"
+
+# p95/p99 máximos (ms) y tasa de error máxima por escenario, con los parámetros por defecto.
+# Línea base medida (peor de varias corridas y seeds) + ~40% de margen: bajar al mejorar
+# el escenario. El p99 de selling_during_reports separa bulkheads activos (~190-300ms)
+# de BULKHEADS_ENABLED=false (~580-700ms)
+DEFAULT_THRESHOLDS: Dict[str, Dict[str, float]] = {
+    "login_burst": {"p95_ms": 45, "error_rate": 0.0},
+    "selling": {"p95_ms": 280, "error_rate": 0.0},
+    "sync_push": {"p95_ms": 340, "error_rate": 0.0},
+    "reports": {"p95_ms": 2500, "error_rate": 0.0},
+    "selling_during_reports": {"p95_ms": 260, "p99_ms": 420, "error_rate": 0.0},
+}
+
+# ============= SUPABASE FALSO =============
+
+class FakeResult:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _get_path(row: Dict[str, Any], column: str) -> Any:
+    """Valor de una columna; 'ventas.is_deleted' lee del recurso embebido"""
+    value: Any = row
+    for part in column.split("."):
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _like(value: Any, pattern: str, case_insensitive: bool) -> bool:
+    if value is None:
+        return False
+    text, pattern = str(value), pattern.replace("%", "")
+    if case_insensitive:
+        text, pattern = text.lower(), pattern.lower()
+    return pattern in text
+
+
+class FakeQuery:
+    """
+    Builder compatible con el subconjunto de postgrest que usa la app
+    Las filas se guardan ya "embebidas" (ventas con venta_items, venta_items con
+    productos/ventas), así que select() no proyecta columnas: devuelve la fila.
+    """
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.operation = "select"
+        self.payload: Any = None
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.order_by: List[Tuple[str, bool]] = []
+        self.offset = 0
+        self.max_rows: Optional[int] = None
+        self.want_count = False
+
+    # ----- operaciones -----
+
+    def select(self, *columns: str, count: Optional[str] = None, **_: Any) -> "FakeQuery":
+        self.want_count = count is not None
+        return self
+
+    def insert(self, rows: Any, **_: Any) -> "FakeQuery":
+        self.operation, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows: Any, **_: Any) -> "FakeQuery":
+        self.operation, self.payload = "upsert", rows
+        return self
+
+    def update(self, values: Dict[str, Any], **_: Any) -> "FakeQuery":
+        self.operation, self.payload = "update", values
+        return self
+
+    def delete(self, **_: Any) -> "FakeQuery":
+        self.operation = "delete"
+        return self
+
+    # ----- filtros -----
+
+    def _add(self, predicate: Callable[[Dict[str, Any]], bool]) -> "FakeQuery":
+        self.filters.append(predicate)
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        return self._add(lambda row: _get_path(row, column) == value)
+
+    def neq(self, column: str, value: Any) -> "FakeQuery":
+        return self._add(lambda row: _get_path(row, column) != value)
+
+    def gt(self, column: str, value: Any) -> "FakeQuery":
+        return self._add(lambda row: (v := _get_path(row, column)) is not None and v > value)
+
+    def gte(self, column: str, value: Any) -> "FakeQuery":
+        return self._add(lambda row: (v := _get_path(row, column)) is not None and v >= value)
+
+    def lt(self, column: str, value: Any) -> "FakeQuery":
+        return self._add(lambda row: (v := _get_path(row, column)) is not None and v < value)
+
+    def lte(self, column: str, value: Any) -> "FakeQuery":
+        return self._add(lambda row: (v := _get_path(row, column)) is not None and v <= value)
+
+    def in_(self, column: str, values: List[Any]) -> "FakeQuery":
+        allowed = set(values)
+        return self._add(lambda row: _get_path(row, column) in allowed)
+
+    def is_(self, column: str, value: Any) -> "FakeQuery":
+        expected = None if value in (None, "null") else value
+        return self._add(lambda row: _get_path(row, column) is expected)
+
+    def like(self, column: str, pattern: str) -> "FakeQuery":
+        return self._add(lambda row: _like(_get_path(row, column), pattern, False))
+
+    def ilike(self, column: str, pattern: str) -> "FakeQuery":
+        return self._add(lambda row: _like(_get_path(row, column), pattern, True))
+
+    def or_(self, expression: str, **_: Any) -> "FakeQuery":
+        # Solo "col.ilike.%x%,col2.ilike.%x%" (búsquedas de texto)
+        terms = []
+        for term in expression.split(","):
+            column, _, rest = term.partition(".")
+            op, _, pattern = rest.partition(".")
+            terms.append((column, op, pattern))
+        return self._add(lambda row: any(
+            _like(_get_path(row, c), p, op == "ilike") for c, op, p in terms
+        ))
+
+    # ----- orden y paginación -----
+
+    def order(self, column: str, desc: bool = False, **_: Any) -> "FakeQuery":
+        self.order_by.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int) -> "FakeQuery":
+        self.offset, self.max_rows = start, end - start + 1
+        return self
+
+    def limit(self, size: int, **_: Any) -> "FakeQuery":
+        self.max_rows = size
+        return self
+
+    def single(self) -> "FakeQuery":
+        return self
+
+    def maybe_single(self) -> "FakeQuery":
+        return self
+
+    # ----- ejecución -----
+
+    def execute(self) -> FakeResult:
+        self.db.wait(self.table, self.operation)
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table, [])
+            matched = [row for row in rows if all(f(row) for f in self.filters)]
+
+            if self.operation in ("insert", "upsert"):
+                new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                created = [self.db.new_row(self.table, row) for row in new_rows]
+                rows.extend(created)
+                return FakeResult([dict(r) for r in created])
+            if self.operation == "update":
+                for row in matched:
+                    row.update(self.payload)
+                return FakeResult([dict(r) for r in matched])
+            if self.operation == "delete":
+                remaining = [row for row in rows if row not in matched]
+                self.db.tables[self.table] = remaining
+                return FakeResult([dict(r) for r in matched])
+
+            for column, desc in reversed(self.order_by):
+                matched.sort(key=lambda row: (_get_path(row, column) is None, _get_path(row, column) or 0), reverse=desc)
+            total = len(matched)
+            if self.max_rows is not None:
+                matched = matched[self.offset:self.offset + self.max_rows]
+            # Copia superficial: la app no debe mutar la "base"
+            return FakeResult([dict(r) for r in matched], total if self.want_count else None)
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", fn: str, params: Dict[str, Any]):
+        self.db, self.fn, self.params = db, fn, params
+
+    def execute(self) -> FakeResult:
+        handler = self.db.rpcs.get(self.fn)
+        if handler is None:
+            raise RuntimeError(f"RPC no soportada por el fake: {self.fn}")
+        self.db.wait(f"rpc/{self.fn}", "rpc")
+        with self.db.lock:
+            return FakeResult(handler(self.db, self.params))
+
+
+class FakeSupabase:
+    """Cliente de Supabase en memoria con latencia por consulta (time.sleep, como el cliente síncrono)"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, seed: int):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        # client_ticket_id → uuid de venta (unique index de la tabla real)
+        self.tickets: Dict[str, str] = {}
+        self.rpcs: Dict[str, Callable[["FakeSupabase", Dict[str, Any]], Any]] = {
+            "create_sale": _rpc_create_sale,
+            "create_sale_many": _rpc_create_sale_many,
+        }
+        self.calls = 0
+        # install_hooks de core.db_metrics espera la sesión httpx de postgrest; aquí se registra en wait()
+        self.postgrest = SimpleNamespace(session=SimpleNamespace(event_hooks={"request": [], "response": []}))
+
+    def wait(self, table: str, operation: str):
+        """Simular la ida a PostgREST y anotarla en el registro del request (Server-Timing, N+1)"""
+        self.calls += 1
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        queries = current_queries()
+        if queries is not None:
+            queries.record(table, operation, delay * 1000)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None, **_: Any) -> FakeRpc:
+        return FakeRpc(self, fn, params or {})
+
+    def new_row(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        now = _now_iso()
+        return {"uuid": str(uuid.uuid4()), "created_at": now, "updated_at": now, "is_deleted": False, **row}
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _insert_sale(db: FakeSupabase, payload: Dict[str, Any], fecha_hora: Optional[str] = None) -> Tuple[str, bool]:
+    """Insertar venta con sus items (idempotente por client_ticket_id); (uuid, duplicada)"""
+    ventas = db.tables.setdefault("ventas", [])
+    ticket = payload.get("client_ticket_id")
+    if ticket and ticket in db.tickets:
+        return db.tickets[ticket], True
+    productos = {p["uuid"]: p for p in db.tables.get("productos", [])}
+    fecha_hora = fecha_hora or datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    venta = db.new_row("ventas", {
+        "client_ticket_id": ticket,
+        "shift_uuid": payload.get("shift_uuid"),
+        "vendedor_uuid": payload.get("vendedor_uuid"),
+        "numero_ticket": payload.get("numero_ticket") or len(ventas) + 1,
+        "tipo": payload.get("tipo", "contado"),
+        "is_fiado": bool(payload.get("is_fiado")),
+        "total": round(sum(float(i["total_item"]) for i in payload.get("items", [])), 2),
+        "fecha_hora": fecha_hora,
+        "created_at": fecha_hora.replace(" ", "T"),
+        "estado": "completada",
+    })
+    items = []
+    for item in payload.get("items", []):
+        producto = productos.get(item["producto_uuid"], {})
+        items.append(db.new_row("venta_items", {
+            **item,
+            "venta_uuid": venta["uuid"],
+            "productos": {"nombre": producto.get("nombre"), "codigo": producto.get("codigo")},
+            "ventas": {"fecha_hora": fecha_hora, "is_deleted": False},
+        }))
+    venta["venta_items"] = items
+    ventas.append(venta)
+    db.tables.setdefault("venta_items", []).extend(items)
+    if ticket:
+        db.tickets[ticket] = venta["uuid"]
+    return venta["uuid"], False
+
+
+def _rpc_create_sale(db: FakeSupabase, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    venta_uuid, _ = _insert_sale(db, params["p_payload"])
+    return [{"venta_uuid": venta_uuid}]
+
+
+def _rpc_create_sale_many(db: FakeSupabase, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for idx, payload in enumerate(params["p_payloads"]):
+        venta_uuid, duplicada = _insert_sale(db, payload)
+        rows.append({"idx": idx, "venta_uuid": venta_uuid, "duplicada": duplicada, "mensaje_error": None})
+    return rows
+
+# ============= DATOS =============
+
+def seed(db: FakeSupabase, args: argparse.Namespace) -> Dict[str, Any]:
+    """Catálogo, turno abierto, meseros del turno e histórico de un mes de ventas"""
+    rng = random.Random(args.seed)
+    categorias = [db.new_row("categorias_producto", {"nombre": f"Categoría {i}", "orden": i, "activo": True}) for i in range(8)]
+    productos = [
+        db.new_row("productos", {
+            "codigo": f"P{i:04d}",
+            "nombre": f"Producto {i}",
+            "precio": float(rng.choice([2000, 3500, 5000, 8000, 12000])),
+            "activo": True,
+            "favorito": i < 12,
+            "categoria_uuid": categorias[i % len(categorias)]["uuid"],
+        })
+        for i in range(args.productos)
+    ]
+    shift = db.new_row("caja_shift", {"estado": "abierta", "apertura_fecha": _now_iso(), "efectivo_inicial": 100000})
+    fin_validity = (datetime.now(timezone.utc) + timedelta(hours=12)).isoformat()
+    meseros = [
+        db.new_row("usuarios_temporales", {
+            "username": f"mesero{i:02d}",
+            "display_name": f"Mesero {i}",
+            "pin_hash": hashlib.sha256(MESERO_PIN.encode()).hexdigest(),
+            "activo": True,
+            "fin_validity": fin_validity,
+            "shift_uuid": shift["uuid"],
+        })
+        for i in range(args.meseros)
+    ]
+    db.tables.update({
+        "categorias_producto": categorias,
+        "productos": productos,
+        "caja_shift": [shift],
+        "usuarios_temporales": meseros,
+    })
+
+    # Histórico del mes para los reportes
+    start = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=30)
+    for n in range(args.ventas_historicas):
+        fecha = start + timedelta(minutes=rng.randrange(30 * 24 * 60))
+        _insert_sale(db, {
+            "client_ticket_id": f"hist-{n}",
+            "shift_uuid": shift["uuid"],
+            "vendedor_uuid": rng.choice(meseros)["uuid"],
+            "items": _random_items(rng, productos),
+        }, fecha_hora=fecha.strftime("%Y-%m-%d %H:%M:%S"))
+
+    return {
+        "shift": shift,
+        "productos": productos,
+        "meseros": meseros,
+        "desde": start.strftime("%Y-%m-%d"),
+        "hasta": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+    }
+
+
+def _random_items(rng: random.Random, productos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    items = []
+    for producto in rng.sample(productos, rng.randint(1, 4)):
+        cantidad = rng.randint(1, 3)
+        items.append({
+            "producto_uuid": producto["uuid"],
+            "cantidad": cantidad,
+            "precio_unitario": producto["precio"],
+            "descuento": 0,
+            "total_item": producto["precio"] * cantidad,
+        })
+    return items
+
+
+def _venta_payload(rng: random.Random, ctx: Dict[str, Any], ticket: Optional[str] = None) -> Dict[str, Any]:
+    items = _random_items(rng, ctx["productos"])
+    return {
+        "client_ticket_id": ticket or str(uuid.uuid4()),
+        "shift_uuid": ctx["shift"]["uuid"],
+        "tipo": "contado",
+        "is_fiado": False,
+        "items": items,
+        "pagos": [{"metodo": "efectivo", "monto": sum(i["total_item"] for i in items)}],
+    }
+
+# ============= ESCENARIOS =============
+
+class Recorder:
+    """Latencias (ms) y errores de un escenario"""
+
+    def __init__(self):
+        self.requests = 0
+        self.samples: List[float] = []
+        self.errors: List[str] = []
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, ok: Tuple[int, ...] = (200,), **kwargs: Any) -> Optional[httpx.Response]:
+        self.requests += 1
+        # La red real cede el loop entre requests; por ASGI en proceso no pasa,
+        # y un cliente encadenaría todas sus requests sin dejar correr a los demás
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception as e:
+            self.errors.append(f"{method} {url}: {e!r}")
+            return None
+        self.samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code not in ok:
+            self.errors.append(f"{method} {url}: {response.status_code} {response.text[:200]}")
+        return response
+
+
+async def scenario_login_burst(client: httpx.AsyncClient, ctx: Dict[str, Any], args: argparse.Namespace, rec: Recorder):
+    """Todos los meseros inician sesión a la vez, varias veces (tablets que se reinician)"""
+    from core.mesero_sessions import active_meseros
+    active_meseros.revoke_all()  # en frío: la primera ronda consulta la base
+
+    async def mesero(row: Dict[str, Any]):
+        for _ in range(args.rounds):
+            await rec.request(client, "POST", "/api/pos/meseros/login",
+                              json={"username": row["username"], "pin": MESERO_PIN})
+
+    await asyncio.gather(*(mesero(m) for m in ctx["meseros"]))
+
+
+async def _vender(client: httpx.AsyncClient, ctx: Dict[str, Any], args: argparse.Namespace, rec: Recorder, rng: random.Random):
+    from utils.auth import create_access_token
+
+    async def mesero(row: Dict[str, Any]):
+        token = create_access_token({"sub": row["uuid"], "tipo": "mesero", "username": row["username"],
+                                     "permisos": ["crear_ventas", "crear_clientes_temporales"]})
+        headers = {"Authorization": f"Bearer {token}"}
+        for _ in range(args.ventas_por_mesero):
+            await rec.request(client, "POST", "/api/pos/ventas", json=_venta_payload(rng, ctx), headers=headers)
+
+    await asyncio.gather(*(mesero(m) for m in ctx["meseros"][:args.vendedores]))
+
+
+async def scenario_selling(client: httpx.AsyncClient, ctx: Dict[str, Any], args: argparse.Namespace, rec: Recorder):
+    """Meseros vendiendo en paralelo durante el servicio"""
+    await _vender(client, ctx, args, rec, random.Random(args.seed + 1))
+
+
+async def scenario_sync_push(client: httpx.AsyncClient, ctx: Dict[str, Any], args: argparse.Namespace, rec: Recorder):
+    """Tablets que recuperan la red y empujan sus ventas offline; parte son reintentos"""
+    rng = random.Random(args.seed + 2)
+    headers = _admin_headers()
+
+    async def tablet(n: int):
+        enviados: List[Dict[str, Any]] = []
+        for _ in range(args.lotes_por_tablet):
+            lote = [_venta_payload(rng, ctx, ticket=f"tablet{n}-{uuid.uuid4()}") for _ in range(args.lote)]
+            # Reintentos: ventas de lotes anteriores que el cliente no vio confirmadas
+            lote += rng.sample(enviados, min(len(enviados), args.lote // 5))
+            enviados.extend(lote)
+            await rec.request(client, "POST", "/api/pos/sync/push", json=lote, headers=headers)
+
+    await asyncio.gather(*(tablet(n) for n in range(args.tablets)))
+
+
+async def scenario_reports(client: httpx.AsyncClient, ctx: Dict[str, Any], args: argparse.Namespace, rec: Recorder):
+    """Cierre de mes: varios administradores consultando reportes del mes completo"""
+    headers = _admin_headers()
+    params = {"fecha_desde": ctx["desde"], "fecha_hasta": ctx["hasta"]}
+
+    async def admin():
+        for _ in range(args.rounds):
+            await rec.request(client, "GET", "/api/pos/reportes/ventas", params=params, headers=headers)
+            await rec.request(client, "GET", "/api/pos/reportes/productos", params=params, headers=headers)
+
+    await asyncio.gather(*(admin() for _ in range(args.admins)))
+
+
+async def scenario_selling_during_reports(client: httpx.AsyncClient, ctx: Dict[str, Any], args: argparse.Namespace, rec: Recorder):
+    """
+    Ventas en el mostrador mientras muchos administradores corren reportes sin parar
+    Solo se miden las ventas; los reportes rechazados por el bulkhead (429) son esperables.
+    Sin bulkheads las agregaciones de todos los reportes compiten a la vez con las
+    ventas (hilos y GIL) y el p99 de las ventas se dispara: el umbral de p99 lo detecta.
+    """
+    headers = _admin_headers()
+    params = {"fecha_desde": ctx["desde"], "fecha_hasta": ctx["hasta"]}
+    reportes = Recorder()
+    selling_done = asyncio.Event()
+
+    async def admin():
+        while not selling_done.is_set():
+            response = await reportes.request(client, "GET", "/api/pos/reportes/ventas",
+                                              ok=(200, 429), params=params, headers=headers)
+            if response is not None and response.status_code == 429:
+                await asyncio.sleep(0.2)  # el cliente real espera Retry-After
+
+    admins = [asyncio.create_task(admin()) for _ in range(args.admins_reportes)]
+    await asyncio.sleep(0)  # los reportes arrancan primero
+    try:
+        await _vender(client, ctx, args, rec, random.Random(args.seed + 3))
+    finally:
+        selling_done.set()
+        await asyncio.gather(*admins)
+    rec.errors.extend(reportes.errors)
+
+
+def _admin_headers() -> Dict[str, str]:
+    from utils.auth import create_access_token
+    token = create_access_token({"sub": "loadtest-admin", "role": "admin", "miembro_uuid": "loadtest-admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+SCENARIOS = {
+    "login_burst": scenario_login_burst,
+    "selling": scenario_selling,
+    "sync_push": scenario_sync_push,
+    "reports": scenario_reports,
+    "selling_during_reports": scenario_selling_during_reports,
+}
+
+# ============= REPORTE =============
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(name: str, rec: Recorder, elapsed: float, db_calls: int) -> Dict[str, Any]:
+    requests = rec.requests
+    return {
+        "scenario": name,
+        "requests": requests,
+        "errors": len(rec.errors),
+        "error_rate": round(len(rec.errors) / requests, 4) if requests else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1) if elapsed > 0 else 0.0,
+        "db_calls": db_calls,
+        "p50_ms": round(percentile(rec.samples, 0.50), 1),
+        "p95_ms": round(percentile(rec.samples, 0.95), 1),
+        "p99_ms": round(percentile(rec.samples, 0.99), 1),
+        "max_ms": round(max(rec.samples), 1) if rec.samples else 0.0,
+        "sample_errors": rec.errors[:3],
+    }
+
+
+def check_thresholds(result: Dict[str, Any], thresholds: Dict[str, Dict[str, float]]) -> List[str]:
+    limits = thresholds.get(result["scenario"], {})
+    failures = []
+    if "p95_ms" in limits and result["p95_ms"] > limits["p95_ms"]:
+        failures.append(f"p95 {result['p95_ms']}ms > {limits['p95_ms']}ms")
+    if "p99_ms" in limits and result["p99_ms"] > limits["p99_ms"]:
+        failures.append(f"p99 {result['p99_ms']}ms > {limits['p99_ms']}ms")
+    if "error_rate" in limits and result["error_rate"] > limits["error_rate"]:
+        failures.append(f"error_rate {result['error_rate']} > {limits['error_rate']}")
+    if "min_rps" in limits and result["throughput_rps"] < limits["min_rps"]:
+        failures.append(f"throughput {result['throughput_rps']} rps < {limits['min_rps']} rps")
+    return failures
+
+# ============= MAIN =============
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pruebas de carga de la API con Supabase en memoria")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Escenario(s) a correr (por defecto todos)")
+    parser.add_argument("--db-latency-ms", type=float, default=20.0, help="Latencia por consulta a la base")
+    parser.add_argument("--db-jitter-ms", type=float, default=10.0, help="Jitter uniforme adicional por consulta")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--productos", type=int, default=150)
+    parser.add_argument("--meseros", type=int, default=30)
+    parser.add_argument("--vendedores", type=int, default=20, help="Meseros vendiendo a la vez (selling)")
+    parser.add_argument("--ventas-por-mesero", type=int, default=10)
+    parser.add_argument("--tablets", type=int, default=8)
+    parser.add_argument("--lotes-por-tablet", type=int, default=3)
+    parser.add_argument("--lote", type=int, default=40, help="Ventas por lote de sync/push")
+    parser.add_argument("--admins", type=int, default=3)
+    parser.add_argument("--admins-reportes", type=int, default=12, help="Administradores con reportes en selling_during_reports")
+    parser.add_argument("--ventas-historicas", type=int, default=5000, help="Ventas del mes para los reportes")
+    parser.add_argument("--rounds", type=int, default=3, help="Repeticiones de login y reportes")
+    parser.add_argument("--thresholds", help="JSON con umbrales por escenario (reemplaza los de por defecto)")
+    parser.add_argument("--json", dest="json_out", help="Guardar los resultados en este archivo")
+    parser.add_argument("--check", action="store_true", help="Salir con código 1 si se supera algún umbral")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar los avisos del servidor (requests lentos, N+1)")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    fake = FakeSupabase(args.db_latency_ms, args.db_jitter_ms, args.seed)
+    config.supabase = fake  # los routers toman config.supabase al importarse
+    ctx = seed(fake, args)
+
+    # Los avisos de requests lentos y N+1 se repiten en cada request del escenario
+    # (y Firebase no se inicializa: no hay credenciales)
+    config.log_level = "WARNING" if args.verbose else "CRITICAL"
+    import server
+
+    results = []
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+        for name in args.scenario or list(SCENARIOS):
+            rec = Recorder()
+            calls_before = fake.calls
+            start = time.perf_counter()
+            await SCENARIOS[name](client, ctx, args, rec)
+            results.append(summarize(name, rec, time.perf_counter() - start, fake.calls - calls_before))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    thresholds = DEFAULT_THRESHOLDS
+    if args.thresholds:
+        with open(args.thresholds, encoding="utf-8") as f:
+            thresholds = json.load(f)
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(_STATE_DIR, ignore_errors=True)
+
+    print("=" * 106)
+    print(f"🔥 Pruebas de carga (latencia base {args.db_latency_ms:.0f}ms ± {args.db_jitter_ms:.0f}ms, seed {args.seed})")
+    print("=" * 106)
+    print(f"{'escenario':<24}{'requests':>9}{'errores':>9}{'req/s':>9}{'db calls':>10}{'p50':>10}{'p95':>10}{'p99':>10}  umbral")
+    failed = False
+    for result in results:
+        failures = check_thresholds(result, thresholds)
+        failed = failed or bool(failures)
+        status = "✅" if not failures else "❌ " + "; ".join(failures)
+        print(
+            f"{result['scenario']:<24}{result['requests']:>9}{result['errors']:>9}{result['throughput_rps']:>9}"
+            f"{result['db_calls']:>10}{result['p50_ms']:>8.1f}ms{result['p95_ms']:>8.1f}ms{result['p99_ms']:>8.1f}ms  {status}"
+        )
+        for error in result["sample_errors"]:
+            print(f"    ⚠️  {error}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+    return 1 if (failed and args.check) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
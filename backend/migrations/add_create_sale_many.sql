@@ -0,0 +1,46 @@
+-- Crear varias ventas offline en una sola llamada (sync/push)
+-- Cada venta se procesa en su propio bloque con manejo de excepciones
+-- (savepoint implícito), así un error en una venta no revierte las demás.
+-- Devuelve una fila por payload, en el mismo orden de entrada (idx base 0).
+
+CREATE OR REPLACE FUNCTION create_sale_many(p_payloads jsonb, p_actor_uuid text)
+RETURNS TABLE (idx integer, client_ticket_id text, venta_uuid text, duplicada boolean, mensaje_error text) AS $$
+DECLARE
+  v_payload jsonb;
+  v_ord bigint;
+  v_existing text;
+  v_new_uuid text;
+BEGIN
+  FOR v_payload, v_ord IN
+    SELECT e.value, e.ordinality FROM jsonb_array_elements(COALESCE(p_payloads, '[]'::jsonb)) WITH ORDINALITY AS e
+  LOOP
+    idx := (v_ord - 1)::integer;
+    client_ticket_id := v_payload->>'client_ticket_id';
+    venta_uuid := NULL;
+    duplicada := false;
+    mensaje_error := NULL;
+
+    -- Idempotencia: otro dispositivo pudo registrar el ticket entre la consulta y el commit
+    SELECT v.uuid::text INTO v_existing
+    FROM ventas v
+    WHERE v.client_ticket_id = v_payload->>'client_ticket_id'
+    LIMIT 1;
+
+    IF v_existing IS NOT NULL THEN
+      venta_uuid := v_existing;
+      duplicada := true;
+    ELSE
+      BEGIN
+        SELECT cs.venta_uuid::text INTO v_new_uuid FROM create_sale(v_payload, p_actor_uuid) cs;
+        venta_uuid := v_new_uuid;
+      EXCEPTION WHEN OTHERS THEN
+        mensaje_error := SQLERRM;
+      END;
+    END IF;
+
+    v_existing := NULL;
+    v_new_uuid := NULL;
+    RETURN NEXT;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
@@ -0,0 +1,8 @@
+-- Índices para el delta-sync (GET /api/pos/sync/pull)
+-- El cursor pagina por (updated_at, uuid); updated_at lo mantiene el trigger
+-- fn_mark_updated_set_sync en todas las tablas con columna needs_sync
+
+CREATE INDEX IF NOT EXISTS ix_productos_updated_at ON productos(updated_at, uuid);
+CREATE INDEX IF NOT EXISTS ix_categorias_producto_updated_at ON categorias_producto(updated_at, uuid);
+CREATE INDEX IF NOT EXISTS ix_cuentas_miembro_updated_at ON cuentas_miembro(updated_at, uuid);
+CREATE INDEX IF NOT EXISTS ix_usuarios_temp_updated_at ON usuarios_temporales(updated_at, uuid);
@@ -24,4 +24,8 @@ __all__ = [
       "Inventario",
       "CuentaMiembro",
       "MovimientoCuenta",
+      "ProductosListResponse",
+      "VentasListResponse",
+      "CuentasListResponse",
+      "MiembrosListResponse",
 ]
\ No newline at end of file
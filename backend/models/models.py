@@ -2,6 +2,7 @@ from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, validator
 from decimal import Decimal
+from core.money import Money
 # UUID removido - ahora usamos str para todos los identificadores
 
 class GoogleAuthRequest(BaseModel):
@@ -107,6 +108,8 @@ class MiembroResponse(BaseModel):
     notas: Optional[str]
     public_profile: bool
     foto_url: Optional[str]
+    foto_thumb_url: Optional[str] = None
+    foto_medium_url: Optional[str] = None
     created_at: str
     updated_at: str
     grupos: Optional[list] = []
@@ -150,7 +153,7 @@ class ProductoCreate(BaseModel):
     codigo: Optional[str] = None
     nombre: str
     descripcion: Optional[str] = None
-    precio: Decimal
+    precio: Money
     categoria_uuid: Optional[str] = None
     favorito: Optional[bool] = False
     activo: Optional[bool] = True
@@ -167,14 +170,14 @@ class CategoriaProducto(BaseModel):
 class VentaItem(BaseModel):
     producto_uuid: str
     cantidad: Decimal
-    precio_unitario: Decimal
-    descuento: Optional[Decimal] = 0
-    total_item: Decimal
+    precio_unitario: Money
+    descuento: Optional[Money] = 0
+    total_item: Money
     notas: Optional[str] = None
 
 class PagoVenta(BaseModel):
     metodo: str
-    monto: Decimal
+    monto: Money
     referencia: Optional[str] = None
     comprobante_url: Optional[str] = None
 
@@ -195,7 +198,7 @@ class MeseroPin(BaseModel):
 
 class CajaShiftCreate(BaseModel):
     apertura_por: str  # Firebase UID (not a standard UUID)
-    efectivo_inicial: Optional[Decimal] = None  # DESACTIVADO: Campo opcional para reactivar en futuro si se necesita
+    efectivo_inicial: Optional[Money] = None  # DESACTIVADO: Campo opcional para reactivar en futuro si se necesita
     meseros: Optional[List[MeseroPin]] = []  # Lista de PINs para crear meseros
 
 class CajaShiftResponse(CajaShiftCreate):
@@ -238,11 +241,87 @@ class Inventario(BaseModel):
 
 class CuentaMiembro(BaseModel):
     miembro_uuid: str
-    limite_credito: Optional[Decimal] = 0
+    limite_credito: Optional[Money] = 0
 
 class MovimientoCuenta(BaseModel):
     cuenta_uuid: str
     venta_uuid: Optional[str] = None
     tipo: str
-    monto: Decimal
+    monto: Money
     descripcion: Optional[str] = None
+
+class ProfileRequest(BaseModel):
+    pattern: str
+    requests: int = 10
+    ttl_seconds: int = 600
+
+# --- Listados de alto tráfico (esquemas de respuesta livianos) ---
+# Documentan la forma de la respuesta; los endpoints devuelven FastJSONResponse
+# directamente y no se validan fila por fila.
+class ProductoListItem(BaseModel):
+    uuid: str
+    codigo: Optional[str] = None
+    nombre: str
+    descripcion: Optional[str] = None
+    precio: float
+    activo: bool
+    favorito: Optional[bool] = False
+    categoria_uuid: Optional[str] = None
+
+class ProductosListResponse(BaseModel):
+    productos: List[ProductoListItem]
+
+class VentaListItem(BaseModel):
+    uuid: str
+    numero_ticket: Optional[int] = None
+    client_ticket_id: Optional[str] = None
+    shift_uuid: Optional[str] = None
+    vendedor_uuid: Optional[str] = None
+    miembro_uuid: Optional[str] = None
+    tipo: Optional[str] = None
+    estado: Optional[str] = None
+    is_fiado: Optional[bool] = False
+    total: float
+    fecha_hora: Optional[str] = None
+    created_at: Optional[str] = None
+
+class VentasListResponse(BaseModel):
+    ventas: List[VentaListItem]
+    total: Optional[int] = None
+    page: int
+    page_size: int
+
+class CuentaMiembroInfo(BaseModel):
+    uuid: str
+    nombres: str
+    apellidos: str
+    email: Optional[str] = None
+    telefono: Optional[str] = None
+
+class CuentaListItem(BaseModel):
+    uuid: str
+    miembro_uuid: str
+    saldo_deudor: float
+    limite_credito: Optional[float] = 0
+    miembros: Optional[CuentaMiembroInfo] = None
+
+class CuentasListResponse(BaseModel):
+    cuentas: List[CuentaListItem]
+
+class MiembroListItem(BaseModel):
+    uuid: str
+    documento: str
+    nombres: str
+    apellidos: str
+    telefono: Optional[str] = None
+    email: Optional[str] = None
+    foto_url: Optional[str] = None
+    foto_thumb_url: Optional[str] = None
+    foto_medium_url: Optional[str] = None
+    created_at: str
+
+class MiembrosListResponse(BaseModel):
+    miembros: List[MiembroListItem]
+    total: Optional[int] = None
+    page: int
+    page_size: int
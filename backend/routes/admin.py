@@ -2,9 +2,10 @@ from fastapi import APIRouter, HTTPException, Depends
 from models import InviteRequest, InviteResponse, ConsumeInviteRequest, AuthResponse, GoogleAuthRequest
 from utils import require_admin, create_access_token
 from core import config
+from core.etag import bump_resource_version
+from utils.firebase_tokens import verify_firebase_token, get_app_user, invalidate_app_user
 from datetime import datetime, timezone, timedelta
-from firebase_admin import auth as firebase_auth
-from typing import Dict, Any, cast
+from typing import Dict, Any
 import logging
 import uuid
 
@@ -72,6 +73,12 @@ async def revoke_invite(token: str, current_user: Dict[str, Any] = Depends(requi
         raise HTTPException(status_code=404, detail="Invitation not found")
     return {"message": "Invitation revoked"}
 
+@api_router.post("/admin/app-users/{uid}/invalidate")
+async def invalidate_app_user_cache(uid: str, current_user: Dict[str, Any] = Depends(require_admin)):
+    """Drop the cached app_users row after editing role/active directly in Supabase"""
+    invalidate_app_user(uid)
+    return {"message": "App user cache invalidated"}
+
 @api_router.post("/auth/consume-invite")
 async def consume_invite(req: ConsumeInviteRequest):
     """Consume invitation and register user"""
@@ -80,7 +87,7 @@ async def consume_invite(req: ConsumeInviteRequest):
         
         # Verify the Firebase ID token using Firebase Admin SDK
         try:
-            decoded_token = firebase_auth.verify_id_token(req.google_token)
+            decoded_token = await verify_firebase_token(req.google_token)
             email = decoded_token.get('email', '')
             google_uid = decoded_token['uid']
             logger.info(f"Firebase token verified for user: {email}")
@@ -112,11 +119,12 @@ async def consume_invite(req: ConsumeInviteRequest):
             raise HTTPException(status_code=400, detail=error_detail)
         
         # Create access token
-        user_result = config.supabase.table('app_users').select('*').eq('uid', google_uid).execute()
-        if not user_result.data or len(user_result.data) == 0:
+        # La invitación crea o actualiza el usuario (rol/activo): descartar lo cacheado
+        invalidate_app_user(google_uid)
+        user_data = get_app_user(google_uid)
+        if not user_data:
             raise HTTPException(status_code=404, detail="Usuario no encontrado después de crear")
         
-        user_data = cast(Dict[str, Any], user_result.data[0])
         role = str(user_data.get('role', ''))
         
         full_name = decoded_token.get('name', '').split(' ')
@@ -141,9 +149,11 @@ async def consume_invite(req: ConsumeInviteRequest):
 
             if not miembro_result.data or len(miembro_result.data) == 0:
                 raise HTTPException(status_code=500, detail="No se pudo crear el miembro")
+            bump_resource_version("miembros")
 
             # Actualiza el usuario con el miembro_uuid recién creado
             update_res = config.supabase.table('app_users').update({"miembro_uuid": miembro_uuid}).eq("uid", google_uid).execute()
+            invalidate_app_user(google_uid)
             logger.info(f"Updated app_users with miembro_uuid: {miembro_uuid}, update_res: {update_res.data}")
         else:
             miembro_uuid = user_data.get('miembro_uuid')
@@ -1,25 +1,13 @@
 # ============= AUTH ENDPOINTS =============
-from typing import Dict, Any, cast
+from typing import Dict, Any
 from models import AuthResponse, GoogleAuthRequest
 from fastapi import APIRouter, HTTPException, Depends
 from utils import create_access_token, get_current_user
+from utils.firebase_tokens import verify_firebase_token, get_app_user
 from core import config
-from firebase_admin import credentials, auth as firebase_auth
 import logging
-import firebase_admin
 
-# Inicializar Firebase Admin SDK
-
-
-if not firebase_admin._apps:
-    try:
-        cred = credentials.Certificate(config.FIREBASE_CREDENTIALS_PATH)
-        firebase_admin.initialize_app(cred)
-        logger = logging.getLogger(__name__)
-        logger.info("Firebase Admin SDK initialized successfully")
-    except Exception as e:
-        logger = logging.getLogger(__name__)
-        logger.error(f"Failed to initialize Firebase Admin SDK: {e}")
+# Firebase Admin SDK se inicializa en el primer login (utils.firebase_tokens.ensure_firebase_app)
 
 api_router = APIRouter()
 logging.basicConfig(
@@ -31,26 +19,25 @@ logger = logging.getLogger(__name__)
 @api_router.post("/auth/google", response_model=AuthResponse)
 async def google_auth(auth_req: GoogleAuthRequest):
     """Authenticate with Google OAuth token using Firebase"""
+    from firebase_admin import auth as firebase_auth  # precargado al arrancar (server.lifespan)
     try:
         # Verify Firebase ID token
-        decoded_token = firebase_auth.verify_id_token(auth_req.token)
+        decoded_token = await verify_firebase_token(auth_req.token)
         
         firebase_uid = decoded_token['uid']
         email = decoded_token.get('email', '')
         name = decoded_token.get('name', '')
         picture = decoded_token.get('picture', '')
         
-        # Check if user exists in app_users (usar config.supabase)
-        result = config.supabase.table('app_users').select('*').eq('uid', firebase_uid).execute()
+        # Check if user exists in app_users (caché compartido, invalidado en cambios)
+        user_data = get_app_user(firebase_uid)
         
-        if not result.data or len(result.data) == 0:
+        if not user_data:
             raise HTTPException(
                 status_code=403,
                 detail="Usuario no autorizado. Contacte al administrador para obtener una invitación."
             )
         
-        # Cast para tipado correcto
-        user_data = cast(Dict[str, Any], result.data[0])
         if not user_data.get('active', True):
             raise HTTPException(status_code=403, detail="Usuario desactivado")
         
@@ -99,25 +86,6 @@ async def get_me(current_user: Dict[str, Any] = Depends(get_current_user)) -> Di
 @api_router.get("/auth/permissions")
 async def get_user_permissions(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
     """Get current user's permissions and accessible sections"""
-    from utils.permissions import get_role_permissions, can_access_section
-    
-    user_role = current_user.get("role", "")
-    
-    # Obtener permisos del rol
-    permissions = get_role_permissions(user_role)
-    permissions_list = [perm.value for perm in permissions]
-    
-    # Obtener secciones accesibles
-    sections = {
-        "dashboard": can_access_section(user_role, "dashboard"),
-        "miembros": can_access_section(user_role, "miembros"),
-        "grupos": can_access_section(user_role, "grupos"),
-        "pos": can_access_section(user_role, "pos"),
-        "admin": can_access_section(user_role, "admin"),
-    }
+    from utils.permissions import get_permissions_payload
     
-    return {
-        "role": user_role,
-        "permissions": permissions_list,
-        "sections": sections
-    }
\ No newline at end of file
+    return get_permissions_payload(current_user.get("role", ""))
\ No newline at end of file
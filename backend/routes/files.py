@@ -1,16 +1,49 @@
 from fastapi import APIRouter, File, UploadFile, Depends, HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from utils.auth import require_any_authenticated
 from core import config
+from core.shared_state import SharedStore
+from core.uploads import spool_upload, upload_to_storage
 from logging import getLogger
+import asyncio
 import os
-import uuid
+import time
 
 logger = getLogger(__name__)
 
 supabase = config.supabase
 files_router = APIRouter(prefix="")
 
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# Índice sha256 → respuesta de upload, compartido entre workers. Vive en
+# /dev/shm (RAM): cada entrada vence y el índice se recorta periódicamente
+_uploaded_hashes = SharedStore('uploaded_hashes')
+_last_prune = 0.0
+
+
+def _index_expired(entry: Dict[str, Any]) -> bool:
+    return time.time() >= entry.get('expires_at', 0)
+
+
+def _index_get(key: str) -> Optional[Dict[str, str]]:
+    entry = _uploaded_hashes.get(key)
+    if entry is None or _index_expired(entry):
+        return None
+    return entry['response']
+
+
+async def _index_set(key: str, response: Dict[str, str]):
+    global _last_prune
+    _uploaded_hashes.set(key, {
+        'response': response,
+        'expires_at': time.time() + config.UPLOAD_DEDUP_TTL_SECONDS,
+    })
+    now = time.monotonic()
+    if now - _last_prune >= config.UPLOAD_DEDUP_PRUNE_SECONDS:
+        _last_prune = now
+        await asyncio.to_thread(_uploaded_hashes.prune, _index_expired, config.UPLOAD_DEDUP_MAX_ENTRIES)
+
 @files_router.post("/upload-image")
 async def upload_image(
     file: UploadFile = File(...),
@@ -23,35 +56,52 @@ async def upload_image(
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Tipo de archivo no permitido")
     
-    # Validate file size (max 10MB)
-    contents = await file.read()
-    if len(contents) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Archivo muy grande. Máximo 10MB")
+    # Validate file size (max 10MB) mientras se recibe, sin cargarlo entero en memoria
+    upload = await spool_upload(file, MAX_UPLOAD_BYTES, "Archivo muy grande. Máximo 10MB")
     
-    # Generate unique filename
+    # Nombre por contenido: los reintentos del mismo comprobante apuntan al mismo archivo
     filename = file.filename or "upload"
-    file_ext = os.path.splitext(filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
+    file_ext = os.path.splitext(filename)[1].lower()
+    unique_filename = f"{upload.sha256}{file_ext}"
     
     # Bucket name from parameter
     bucket_name = bucket or "transferencias"
+    index_key = f"{bucket_name}/{unique_filename}"
     
     try:
+        existing = _index_get(index_key)
+        if existing is not None:
+            return existing
+        
         # Upload to Supabase Storage
-        result = supabase.storage.from_(bucket_name).upload(
-            path=unique_filename,
-            file=contents,
-            file_options={"content-type": file.content_type}
-        )
+        from storage3.utils import StorageException  # storage3 se carga con el cliente de Supabase
+        try:
+            await asyncio.to_thread(
+                upload_to_storage, supabase.storage, bucket_name, unique_filename, upload, file.content_type
+            )
+        except StorageException as e:
+            # Otro worker/reintento ya lo subió (o el índice se perdió al reiniciar)
+            if not _is_duplicate(e):
+                raise
+            logger.info(f"Upload already stored, reusing {index_key}")
         
         # Get public URL
         public_url = supabase.storage.from_(bucket_name).get_public_url(unique_filename)
         
-        return {
+        response = {
             "url": public_url,
             "filename": unique_filename,
             "bucket": bucket_name
         }
+        await _index_set(index_key, response)
+        return response
     except Exception as e:
         logger.error(f"Error uploading file: {e}")
-        raise HTTPException(status_code=500, detail=f"Error al subir archivo: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al subir archivo: {str(e)}")
+    finally:
+        upload.cleanup()
+
+
+def _is_duplicate(error: Exception) -> bool:
+    """Storage responde 409 'Duplicate' cuando el objeto ya existe"""
+    return getattr(error, 'code', None) == 'Duplicate' or str(getattr(error, 'status', '')) == '409'
@@ -3,6 +3,7 @@ from models.models import GrupoCreate, GrupoUpdate, GrupoResponse
 from utils import require_auth_user, require_admin
 from core import config
 from core.cache import cached, invalidate_cache_pattern
+from core.etag import conditional_get, bump_resource_version
 from datetime import datetime, timezone
 from typing import Dict, Any
 
@@ -12,6 +13,7 @@ api_router = APIRouter(prefix="")
 # ============= GRUPOS =============
 @cached(ttl_seconds=600, key_prefix="grupos_list")
 @api_router.get("/grupos")
+@conditional_get("grupos")
 async def list_grupos(current_user: Dict[str, Any] = Depends(require_auth_user)):
     """List all groups with member count"""
     result = supabase.table('grupos').select('*, grupo_miembro(count)').eq('is_deleted', False).order('nombre').execute()
@@ -54,6 +56,7 @@ async def create_grupo(grupo: GrupoCreate, current_user: Dict[str, Any] = Depend
     """Create new group"""
     result = supabase.table('grupos').insert(grupo.model_dump()).execute()
     created_grupo = result.data[0]
+    bump_resource_version("grupos")
     created_grupo['total_miembros'] = 0
     created_grupo['miembros'] = []
     return created_grupo
@@ -76,6 +79,7 @@ async def update_grupo(grupo_uuid: str, grupo: GrupoUpdate, current_user: Dict[s
     
     # Invalidar caché después de actualización
     invalidate_cache_pattern("grupos")
+    bump_resource_version("grupos")
     
     # Obtener el grupo actualizado con miembros
     updated_grupo = supabase.table('grupos').select('*, miembros:grupo_miembro(miembro_uuid, miembros(*))').eq('uuid', grupo_uuid).execute()
@@ -103,6 +107,7 @@ async def delete_grupo(grupo_uuid: str, current_user: Dict[str, Any] = Depends(r
     
     # Invalidar caché después de eliminación
     invalidate_cache_pattern("grupos")
+    bump_resource_version("grupos")
     
     return {"message": "Grupo eliminado exitosamente"}
 
@@ -122,6 +127,7 @@ async def assign_member_to_group(
     
     # Invalidar caché después de asignar miembro
     invalidate_cache_pattern("grupos")
+    bump_resource_version("grupos")
     
     return {"message": "Miembro asignado al grupo", "data": result.data[0]}
 
@@ -136,5 +142,6 @@ async def remove_member_from_group(
     
     # Invalidar caché después de remover miembro
     invalidate_cache_pattern("grupos")
+    bump_resource_version("grupos")
     
     return {"message": "Miembro removido del grupo"}
\ No newline at end of file
@@ -1,27 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from models.models import MiembroCreate, MiembroUpdate, MiembroResponse
+from models.models import MiembroCreate, MiembroUpdate, MiembroResponse, MiembrosListResponse
 from utils import require_auth_user, require_admin
 from utils.auth import require_any_authenticated
 from core import config
 from core.cache import cached, invalidate_cache_pattern
+from core.etag import conditional_get, bump_resource_version
+from core.responses import FastJSONResponse
+from core.uploads import spool_upload, upload_to_storage, upload_bytes_to_storage
+from core.images import (
+    build_variants, extension_for, original_path, variant_path, variant_urls, with_variant_urls, IMMUTABLE_CACHE_SECONDS
+)
 from typing import Optional, Dict, Any, List, cast
 from datetime import datetime, timezone
+from logging import getLogger
+import asyncio
 import uuid
 import os
 
+logger = getLogger(__name__)
+
 supabase = config.supabase
 api_router = APIRouter(prefix="")
 
+MAX_FOTO_BYTES = 5 * 1024 * 1024
+
 # ============= MIEMBROS =============
 @cached(ttl_seconds=300, key_prefix="miembros_list")
-@api_router.get("/miembros", response_model=Dict[str, Any])
+@api_router.get("/miembros", response_model=MiembrosListResponse)
+@conditional_get("miembros")
 async def list_miembros(
     q: Optional[str] = None,
     grupo: Optional[str] = None,
     page: int = 1,
     page_size: int = 50,
     current_user: Dict[str, Any] = Depends(require_any_authenticated)
-) -> Dict[str, Any]:
+) -> FastJSONResponse:
     """List members with search and filters - Accessible by any authenticated user including meseros"""
     # Optimización: solo traer campos necesarios para la vista de lista
     query = supabase.table('miembros').select(
@@ -40,12 +53,12 @@ async def list_miembros(
     
     result = query.execute()
     
-    return {
-        "miembros": result.data,
+    return FastJSONResponse({
+        "miembros": [with_variant_urls(m) for m in cast(List[Dict[str, Any]], result.data)],
         "total": result.count,
         "page": page,
         "page_size": page_size
-    }
+    })
 
 @api_router.get("/miembros/{miembro_uuid}", response_model=MiembroResponse)
 async def get_miembro(miembro_uuid: str, current_user: Dict[str, Any] = Depends(require_auth_user)) -> Dict[str, Any]:
@@ -62,7 +75,7 @@ async def get_miembro(miembro_uuid: str, current_user: Dict[str, Any] = Depends(
     else:
         miembro['grupos'] = []
     
-    return miembro
+    return with_variant_urls(miembro)
 
 @api_router.post("/miembros", response_model=MiembroResponse)
 async def create_miembro(miembro: MiembroCreate, current_user: Dict[str, Any] = Depends(require_auth_user)) -> Dict[str, Any]:
@@ -81,8 +94,9 @@ async def create_miembro(miembro: MiembroCreate, current_user: Dict[str, Any] =
     
     # Invalidar caché después de crear miembro
     invalidate_cache_pattern("miembros")
+    bump_resource_version("miembros")
     
-    return cast(Dict[str, Any], result.data[0])
+    return with_variant_urls(cast(Dict[str, Any], result.data[0]))
 
 @api_router.put("/miembros/{miembro_uuid}", response_model=MiembroResponse)
 async def update_miembro(
@@ -106,8 +120,9 @@ async def update_miembro(
     
     # Invalidar caché después de actualizar miembro
     invalidate_cache_pattern("miembros")
+    bump_resource_version("miembros")
     
-    return cast(Dict[str, Any], result.data[0])
+    return with_variant_urls(cast(Dict[str, Any], result.data[0]))
 
 @api_router.delete("/miembros/{miembro_uuid}")
 async def delete_miembro(miembro_uuid: str, current_user: Dict[str, Any] = Depends(require_admin)) -> Dict[str, str]:
@@ -122,6 +137,7 @@ async def delete_miembro(miembro_uuid: str, current_user: Dict[str, Any] = Depen
     
     # Invalidar caché después de eliminar miembro
     invalidate_cache_pattern("miembros")
+    bump_resource_version("miembros")
     
     return {"message": "Miembro eliminado"}
 
@@ -183,6 +199,7 @@ async def create_temporal_miembro(
         'limite_credito': 300000  # Límite por defecto
     }
     supabase.table('cuentas_miembro').insert(cuenta_data).execute()
+    bump_resource_version("miembros")
     
     return miembro_creado
 
@@ -231,6 +248,7 @@ async def verificar_miembro_temporal(
         })\
         .eq('uuid', miembro_uuid)\
         .execute()
+    bump_resource_version("miembros")
     
     return {
         "message": "Cliente verificado exitosamente",
@@ -264,6 +282,7 @@ async def rechazar_miembro_temporal(
         })\
         .eq('uuid', miembro_uuid)\
         .execute()
+    bump_resource_version("miembros")
     
     return {
         "message": "Cliente temporal rechazado y eliminado"
@@ -273,43 +292,97 @@ async def rechazar_miembro_temporal(
 async def upload_foto_miembro(
     file: UploadFile = File(...),
     current_user: Dict[str, Any] = Depends(require_auth_user)
-) -> Dict[str, str]:
-    """Upload member photo to Supabase Storage"""
+) -> Dict[str, Optional[str]]:
+    """Upload member photo to Supabase Storage, with resized WebP variants"""
     # Validate file type
     allowed_types = ["image/jpeg", "image/jpg", "image/png", "image/webp", "image/gif"]
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Tipo de archivo no permitido. Use JPG, PNG, WEBP o GIF")
     
-    # Validate file size (max 5MB)
-    contents = await file.read()
-    if len(contents) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Archivo muy grande. Máximo 5MB")
+    # Validate file size (max 5MB) mientras se recibe, sin cargarlo entero en memoria
+    upload = await spool_upload(file, MAX_FOTO_BYTES, "Archivo muy grande. Máximo 5MB")
     
-    # Generate unique filename
     filename = file.filename or "upload"
-    file_ext = os.path.splitext(filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
+    file_ext = extension_for(file.content_type) or os.path.splitext(filename)[1]
+    foto_id = str(uuid.uuid4())
     
     # Bucket name
     bucket_name = config.STORAGE_NAME
     
     try:
-        # Upload to Supabase Storage
-        result = supabase.storage.from_(bucket_name).upload(
-            path=unique_filename,
-            file=contents,
-            file_options={"content-type": file.content_type}
+        # Variantes WebP (thumb/medium) fuera del event loop
+        try:
+            variants = await asyncio.to_thread(build_variants, upload.path)
+        except Exception as e:
+            # Imagen que Pillow no puede leer: se guarda solo el original, como antes
+            logger.warning(f"Could not build photo variants for {filename}: {e}")
+            variants = {}
+        
+        if variants:
+            unique_filename = original_path(foto_id, file_ext)
+        else:
+            unique_filename = f"{foto_id}{file_ext}"
+        
+        # Upload to Supabase Storage: primero el original (lo único obligatorio)
+        await asyncio.to_thread(
+            upload_to_storage, supabase.storage, bucket_name, unique_filename, upload,
+            file.content_type, IMMUTABLE_CACHE_SECONDS
         )
         
+        # Variantes en paralelo, sin hacer fallar el upload. Si alguna no sube,
+        # el original pasa al nombre sin variantes ({foto_id}{ext}): variant_urls
+        # no debe derivar URLs de objetos que no existen
+        if variants and not await _upload_variants(bucket_name, foto_id, variants):
+            legacy_filename = f"{foto_id}{file_ext}"
+            try:
+                await asyncio.to_thread(supabase.storage.from_(bucket_name).move, unique_filename, legacy_filename)
+            except Exception:
+                await _remove_from_storage(bucket_name, [unique_filename])
+                raise
+            unique_filename = legacy_filename
+        
         # Get public URL
         public_url = supabase.storage.from_(bucket_name).get_public_url(unique_filename)
         
         return {
             "url": public_url,
-            "filename": unique_filename
+            "filename": unique_filename,
+            **variant_urls(public_url)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al subir archivo: {str(e)}")
+    finally:
+        upload.cleanup()
+
+async def _upload_variants(bucket_name: str, foto_id: str, variants: Dict[str, bytes]) -> bool:
+    """Subir las variantes WebP; si alguna falla borra las que subieron y devuelve False"""
+    paths = [variant_path(foto_id, name) for name in variants]
+    results = await asyncio.gather(
+        *(
+            asyncio.to_thread(
+                upload_bytes_to_storage, supabase.storage, bucket_name, path, data,
+                "image/webp", IMMUTABLE_CACHE_SECONDS
+            )
+            for path, data in zip(paths, variants.values())
+        ),
+        return_exceptions=True
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if not errors:
+        return True
+    logger.warning(f"Could not upload photo variants for {foto_id}, keeping only the original: {errors[0]}")
+    uploaded = [path for path, r in zip(paths, results) if not isinstance(r, BaseException)]
+    await _remove_from_storage(bucket_name, uploaded)
+    return False
+
+async def _remove_from_storage(bucket_name: str, paths: List[str]):
+    """Borrar objetos sin propagar errores (limpieza de un upload fallido)"""
+    if not paths:
+        return
+    try:
+        await asyncio.to_thread(supabase.storage.from_(bucket_name).remove, paths)
+    except Exception as e:
+        logger.warning(f"Could not remove orphaned photo objects {paths}: {e}")
 
 @api_router.get("/miembros/storage-check")
 async def check_storage_bucket(current_user: Dict[str, Any] = Depends(require_auth_user)) -> Dict[str, Any]:
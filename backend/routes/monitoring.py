@@ -3,48 +3,122 @@ Módulo de Monitoreo y Métricas
 Endpoints para observabilidad y performance monitoring
 """
 
-from fastapi import APIRouter, Depends
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from typing import Dict, Any, Literal
+from models.models import ProfileRequest
+from core import config
 from core.cache import cache
-from utils.auth import require_admin
+from core.bulkhead import bulkheads
+from core.compression import compressed_bodies
+from core.idempotency import idempotency_store
+from core.mesero_sessions import active_meseros
+from core.metrics import request_metrics, summarize, prometheus_text
+from core.profiling import request_profiler, format_stats, dump_stats
+from utils.auth import require_admin, security, token_cache, verify_token
+from utils import firebase_tokens
+import hmac
+import pstats
 import time
 
 monitoring_router = APIRouter(prefix="/metrics", tags=["monitoring"])
 
-# Contadores globales (en producción usar Redis o similar)
 _start_time = time.time()
-_request_count = 0
-_total_response_time = 0.0
-_slow_requests = 0
+_PSTATS_SORT_KEYS = {key.value for key in pstats.SortKey}
 
-def track_request(response_time: float):
-    """Track request metrics"""
-    global _request_count, _total_response_time, _slow_requests
-    _request_count += 1
-    _total_response_time += response_time
-    if response_time > 1.0:
-        _slow_requests += 1
+async def require_metrics_reader(credentials: HTTPAuthorizationCredentials = Depends(security)) -> None:
+    """Admin (JWT) o el token fijo de scraping (METRICS_SCRAPE_TOKEN) si está configurado"""
+    scrape_token = config.METRICS_SCRAPE_TOKEN
+    if scrape_token and hmac.compare_digest(credentials.credentials.encode(), scrape_token.encode()):
+        return
+    await require_admin(verify_token(credentials.credentials))
 
 @monitoring_router.get("")
 async def get_metrics(current_user: Dict[str, Any] = Depends(require_admin)) -> Dict[str, Any]:
     """
     Performance metrics dashboard - Admin only
-    Retorna métricas de caché, tiempos de respuesta y uptime
+    Retorna métricas de caché, latencias por ruta (p50/p95/p99) y uptime
     """
     uptime_seconds = time.time() - _start_time
-    
+    transport = getattr(config.supabase, 'transport', None)
+
     return {
         "cache": cache.get_stats(),
+        "idempotency": idempotency_store.get_stats(),
+        "auth_tokens": token_cache.get_stats(),
+        "meseros": active_meseros.get_stats(),
+        "google_login": firebase_tokens.get_stats(),
+        "compression": compressed_bodies.get_stats(),
+        "bulkheads": bulkheads.get_stats(),
+        "supabase_http": transport.get_stats() if transport is not None else {},
         "uptime_seconds": round(uptime_seconds, 2),
         "uptime_formatted": _format_uptime(uptime_seconds),
-        "requests": {
-            "total": _request_count,
-            "avg_response_time_ms": round((_total_response_time / _request_count * 1000) if _request_count > 0 else 0, 2),
-            "slow_requests": _slow_requests,
-            "slow_request_rate": round((_slow_requests / _request_count * 100) if _request_count > 0 else 0, 2)
-        }
+        "requests": summarize(request_metrics.collect())
     }
 
+@monitoring_router.get("/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics(_: None = Depends(require_metrics_reader)) -> PlainTextResponse:
+    """Histogramas de latencia en formato de texto de Prometheus"""
+    cache_stats = cache.get_stats()
+    body = prometheus_text(request_metrics.collect(), extra_gauges=[
+        ("churchapp_uptime_seconds", "Seconds since this worker started", round(time.time() - _start_time, 2)),
+        ("churchapp_cache_entries", "Entries in the response cache of this worker", cache_stats["total_entries"]),
+    ])
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@monitoring_router.post("/profile")
+async def arm_profiler(
+    body: ProfileRequest,
+    current_user: Dict[str, Any] = Depends(require_admin)
+) -> Dict[str, Any]:
+    """
+    Perfilar con cProfile los próximos N requests cuyo path coincida con el patrón (glob) - Admin only
+    Ejemplo: {"pattern": "/api/pos/reportes/*", "requests": 20}
+    """
+    if not body.pattern.startswith("/"):
+        raise HTTPException(status_code=400, detail="El patrón debe empezar con /")
+    if body.requests < 1 or body.ttl_seconds < 1:
+        raise HTTPException(status_code=400, detail="requests y ttl_seconds deben ser positivos")
+    return request_profiler.arm(body.pattern, body.requests, body.ttl_seconds)
+
+@monitoring_router.get("/profile")
+async def get_profile(
+    format: Literal["text", "pstats"] = "text",
+    sort: str = "cumulative",
+    limit: int = 50,
+    current_user: Dict[str, Any] = Depends(require_admin)
+) -> Any:
+    """
+    Estado de la sesión de perfilado y estadísticas sumadas - Admin only
+    format=pstats devuelve el archivo binario (pstats.Stats, snakeviz, flameprof)
+    """
+    status = request_profiler.status()
+    if status is None:
+        raise HTTPException(status_code=404, detail="No hay sesión de perfilado armada")
+    if sort not in _PSTATS_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort inválido. Opciones: {', '.join(sorted(_PSTATS_SORT_KEYS))}")
+    
+    stats = request_profiler.stats()
+    if format == "pstats":
+        if stats is None:
+            raise HTTPException(status_code=404, detail="Todavía no hay requests perfilados")
+        return Response(
+            content=dump_stats(stats),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{status["id"]}.pstats"'}
+        )
+    return {
+        "session": status,
+        "stats": format_stats(stats, sort, limit) if stats is not None else None
+    }
+
+@monitoring_router.delete("/profile")
+async def disarm_profiler(current_user: Dict[str, Any] = Depends(require_admin)) -> Dict[str, str]:
+    """Desarmar la sesión de perfilado y borrar sus resultados - Admin only"""
+    request_profiler.disarm()
+    return {"message": "Perfilado desactivado"}
+
 @monitoring_router.post("/cache/clear")
 async def clear_cache(current_user: Dict[str, Any] = Depends(require_admin)) -> Dict[str, str]:
     """
@@ -52,6 +126,7 @@ async def clear_cache(current_user: Dict[str, Any] = Depends(require_admin)) ->
     Útil para debugging o después de actualizaciones masivas
     """
     cache.clear()
+    firebase_tokens.clear_app_users_cache()
     return {"message": "Cache cleared successfully"}
 
 def _format_uptime(seconds: float) -> str:
@@ -4,12 +4,17 @@ RF-CUENTA
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any, Optional, cast
+from typing import Dict, Any, List, Optional, cast
+from models.models import CuentasListResponse
 from core import config
+from core.db import gather_queries, run_query
+from core.profiling import to_thread
+from core.idempotency import idempotent
+from core.money import Money, to_cents, from_cents
+from core.responses import FastJSONResponse
 from utils.auth import require_pos_access, require_permission, require_admin
 from utils.permissions import Permission
 from datetime import datetime, timezone
-from decimal import Decimal
 import logging
 import uuid as uuid_lib
 
@@ -19,12 +24,12 @@ supabase = config.supabase
 
 # ============= CUENTAS DE MIEMBROS (RF-CUENTA) =============
 
-@pos_cuentas_router.get("/cuentas")
+@pos_cuentas_router.get("/cuentas", response_model=CuentasListResponse)
 async def list_cuentas_miembro(
     con_saldo: Optional[bool] = None,
     q: Optional[str] = None,
     current_user: Dict[str, Any] = Depends(require_pos_access)
-) -> Dict[str, Any]:
+) -> FastJSONResponse:
     """Listar cuentas de miembros con saldos"""
     try:
         query = supabase.table('cuentas_miembro').select(
@@ -50,7 +55,7 @@ async def list_cuentas_miembro(
                         filtered_cuentas.append(c_data)
             cuentas = filtered_cuentas
         
-        return {"cuentas": cuentas}
+        return FastJSONResponse({"cuentas": cuentas})
     except Exception as e:
         logger.error(f"Error listing cuentas: {e}")
         raise HTTPException(status_code=500, detail="Error al listar cuentas")
@@ -62,61 +67,53 @@ async def get_cuenta_miembro(
 ) -> Dict[str, Any]:
     """Obtener cuenta de un miembro específico con resumen financiero"""
     try:
-        cuenta_result = supabase.table('cuentas_miembro').select(
-            '*, miembros!inner(uuid, nombres, apellidos, email, telefono)'
-        ).eq('miembro_uuid', miembro_uuid).execute()
-        
+        # Los movimientos se filtran por miembro a través de la cuenta (join),
+        # así las cuatro consultas son independientes y se lanzan en paralelo
+        cuenta_result, ventas_result, movimientos_result, todos_movimientos = await gather_queries(
+            supabase.table('cuentas_miembro').select(
+                '*, miembros!inner(uuid, nombres, apellidos, email, telefono)'
+            ).eq('miembro_uuid', miembro_uuid),
+            supabase.table('ventas').select(
+                'uuid, total, created_at, is_fiado, estado, numero_ticket'
+            ).eq('miembro_uuid', miembro_uuid).eq('is_fiado', True).eq('is_deleted', False).order('created_at', desc=True),
+            supabase.table('movimientos_cuenta').select(
+                '*, cuentas_miembro!inner(miembro_uuid)'
+            ).eq('cuentas_miembro.miembro_uuid', miembro_uuid).eq('is_deleted', False).order('fecha', desc=True).limit(10),
+            supabase.table('movimientos_cuenta').select(
+                'tipo, monto, cuentas_miembro!inner(miembro_uuid)'
+            ).eq('cuentas_miembro.miembro_uuid', miembro_uuid).eq('is_deleted', False),
+        )
+
         if not cuenta_result.data:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
-        
+
         cuenta = cast(Dict[str, Any], cuenta_result.data[0])
-        
-        ventas_result = supabase.table('ventas').select(
-            'uuid, total, created_at, is_fiado, estado, numero_ticket'
-        ).eq('miembro_uuid', miembro_uuid).eq('is_fiado', True).eq('is_deleted', False).order('created_at', desc=True).execute()
-        
         ventas_fiadas = ventas_result.data or []
-        
-        movimientos_result = supabase.table('movimientos_cuenta').select('*').eq('cuenta_uuid', cuenta.get('uuid')).eq('is_deleted', False).order('fecha', desc=True).limit(10).execute()
-        
-        todos_movimientos = supabase.table('movimientos_cuenta').select('tipo, monto').eq('cuenta_uuid', cuenta.get('uuid')).eq('is_deleted', False).execute()
-        
-        # Calcular estadísticas
-        total_cargos = 0
-        total_pagos = 0
-        total_ajustes = 0
-        saldo_calculado = 0
-        
-        for mov_data in (todos_movimientos.data or []):
-            mov = cast(Dict[str, Any], mov_data)
-            tipo = mov.get('tipo')
-            monto = float(mov.get('monto', 0))
-            
-            if tipo == 'cargo':
-                total_cargos += monto
-                saldo_calculado += monto
-            elif tipo == 'pago':
-                total_pagos += monto
-                saldo_calculado -= monto
-            elif tipo == 'ajuste':
-                total_ajustes += monto
-                # Los ajustes pueden ser positivos (aumentan deuda) o negativos (disminuyen deuda)
-                saldo_calculado += monto
+
+        movimientos_recientes = []
+        for mov_data in (movimientos_result.data or []):
+            mov = dict(cast(Dict[str, Any], mov_data))
+            mov.pop('cuentas_miembro', None)
+            movimientos_recientes.append(mov)
+
+        # Calcular estadísticas (centavos)
+        totales = _totales_movimientos(todos_movimientos.data or [])
+        saldo_calculado = totales['saldo']
         
         # Actualizar saldo si difiere
-        if abs(saldo_calculado - float(cuenta.get('saldo_deudor', 0))) > 0.01:
+        if saldo_calculado != to_cents(cuenta.get('saldo_deudor')):
             supabase.table('cuentas_miembro').update({
-                'saldo_deudor': saldo_calculado
+                'saldo_deudor': from_cents(saldo_calculado)
             }).eq('miembro_uuid', miembro_uuid).execute()
         
         return {
             "cuenta": cuenta,
             "ventas_fiadas": ventas_fiadas,
-            "movimientos_recientes": movimientos_result.data or [],
+            "movimientos_recientes": movimientos_recientes,
             "estadisticas": {
-                "total_cargos": total_cargos,
-                "total_pagos": total_pagos,
-                "saldo_actual": saldo_calculado
+                "total_cargos": from_cents(totales['cargo']),
+                "total_pagos": from_cents(totales['pago']),
+                "saldo_actual": from_cents(saldo_calculado)
             }
         }
     except HTTPException:
@@ -125,6 +122,18 @@ async def get_cuenta_miembro(
         logger.error(f"Error getting cuenta: {e}")
         raise HTTPException(status_code=500, detail="Error al obtener cuenta")
 
+def _totales_movimientos(movimientos: List[Any]) -> Dict[str, int]:
+    """Totales por tipo y saldo deudor en centavos (cargo suma, pago resta, ajuste suma con su signo)"""
+    totales = {'cargo': 0, 'pago': 0, 'ajuste': 0}
+    for mov_data in movimientos:
+        mov = cast(Dict[str, Any], mov_data)
+        tipo = mov.get('tipo')
+        if tipo in totales:
+            totales[tipo] += to_cents(mov.get('monto'))
+    # Los ajustes pueden ser positivos (aumentan deuda) o negativos (disminuyen deuda)
+    totales['saldo'] = totales['cargo'] - totales['pago'] + totales['ajuste']
+    return totales
+
 @pos_cuentas_router.get("/cuentas/{miembro_uuid}/movimientos")
 async def get_movimientos_cuenta(
     miembro_uuid: str,
@@ -134,7 +143,12 @@ async def get_movimientos_cuenta(
 ) -> Dict[str, Any]:
     """Obtener historial completo de movimientos de una cuenta con paginación"""
     try:
-        cuenta_result = supabase.table('cuentas_miembro').select('uuid').eq('miembro_uuid', miembro_uuid).execute()
+        # Listado pesado (clase "reports" del bulkhead): las consultas van fuera del
+        # event loop para no frenar las ventas del mismo worker
+        timeout = config.REPORT_QUERY_TIMEOUT_SECONDS
+        cuenta_result = await run_query(
+            supabase.table('cuentas_miembro').select('uuid').eq('miembro_uuid', miembro_uuid), timeout
+        )
         
         if not cuenta_result.data or len(cuenta_result.data) == 0:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
@@ -145,11 +159,13 @@ async def get_movimientos_cuenta(
         if not cuenta_uuid:
             raise HTTPException(status_code=500, detail="Cuenta sin UUID")
         
-        movimientos_result = supabase.table('movimientos_cuenta').select('*').eq('cuenta_uuid', cuenta_uuid).eq('is_deleted', False).execute()
-        
-        ventas_pagadas_result = supabase.table('ventas').select(
-            'uuid, total, created_at, numero_ticket, is_fiado, vendedor_uuid'
-        ).eq('miembro_uuid', miembro_uuid).eq('is_fiado', False).eq('is_deleted', False).execute()
+        movimientos_result, ventas_pagadas_result = await gather_queries(
+            supabase.table('movimientos_cuenta').select('*').eq('cuenta_uuid', cuenta_uuid).eq('is_deleted', False),
+            supabase.table('ventas').select(
+                'uuid, total, created_at, numero_ticket, is_fiado, vendedor_uuid'
+            ).eq('miembro_uuid', miembro_uuid).eq('is_fiado', False).eq('is_deleted', False),
+            timeout=timeout,
+        )
         
         # Recopilar todos los venta_uuid únicos de movimientos
         venta_uuids = set()
@@ -162,9 +178,9 @@ async def get_movimientos_cuenta(
         # Obtener vendedor_uuid de todas las ventas en UNA sola query
         ventas_vendedores = {}
         if venta_uuids:
-            ventas_info_result = supabase.table('ventas').select(
-                'uuid, vendedor_uuid'
-            ).in_('uuid', list(venta_uuids)).execute()
+            ventas_info_result = await run_query(
+                supabase.table('ventas').select('uuid, vendedor_uuid').in_('uuid', list(venta_uuids)), timeout
+            )
             
             for venta_data in (ventas_info_result.data or []):
                 venta = cast(Dict[str, Any], venta_data)
@@ -194,15 +210,12 @@ async def get_movimientos_cuenta(
         # Buscar información de todos en miembros primero
         vendedores_info = {}
         if vendedor_uuids:
-            # Obtener nombres de miembros
-            miembros_result = supabase.table('miembros').select(
-                'uuid, nombres, apellidos'
-            ).in_('uuid', list(vendedor_uuids)).execute()
-            
-            # Obtener UUIDs de meseros (usuarios_temporales) con su miembro_uuid
-            meseros_result = supabase.table('usuarios_temporales').select(
-                'uuid, miembro_uuid'
-            ).in_('uuid', list(vendedor_uuids)).execute()
+            # Nombres de miembros y UUIDs de meseros (usuarios_temporales) con su miembro_uuid
+            miembros_result, meseros_result = await gather_queries(
+                supabase.table('miembros').select('uuid, nombres, apellidos').in_('uuid', list(vendedor_uuids)),
+                supabase.table('usuarios_temporales').select('uuid, miembro_uuid').in_('uuid', list(vendedor_uuids)),
+                timeout=timeout,
+            )
             
             # Mapear UUID de mesero -> miembro_uuid para buscar nombres
             meseros_uuids = set()
@@ -222,9 +235,10 @@ async def get_movimientos_cuenta(
             # Si hay meseros, buscar sus nombres en miembros por miembro_uuid
             meseros_nombres_dict = {}
             if miembro_uuids_adicionales:
-                meseros_nombres_result = supabase.table('miembros').select(
-                    'uuid, nombres, apellidos'
-                ).in_('uuid', list(miembro_uuids_adicionales)).execute()
+                meseros_nombres_result = await run_query(
+                    supabase.table('miembros').select('uuid, nombres, apellidos').in_('uuid', list(miembro_uuids_adicionales)),
+                    timeout
+                )
                 
                 # Crear diccionario miembro_uuid -> nombre para meseros
                 for miembro_data in (meseros_nombres_result.data or []):
@@ -263,55 +277,13 @@ async def get_movimientos_cuenta(
                     }
         
         
-        items = []
-        
-        for mov_data in (movimientos_result.data or []):
-            mov = cast(Dict[str, Any], mov_data)
-            item = {
-                'uuid': mov.get('uuid'),
-                'fecha': mov.get('fecha'),
-                'tipo': mov.get('tipo'),
-                'monto': float(mov.get('monto', 0)),
-                'descripcion': mov.get('descripcion'),
-                'venta_uuid': mov.get('venta_uuid'),
-                'metodo_pago': mov.get('metodo_pago')
-            }
-            
-            # Agregar información del vendedor
-            # Primero intentar con venta_uuid (para cargos)
-            venta_uuid = mov.get('venta_uuid')
-            if venta_uuid and venta_uuid in ventas_vendedores:
-                vendedor_uuid = ventas_vendedores[venta_uuid]
-                if vendedor_uuid and vendedor_uuid in vendedores_info:
-                    item['vendedor'] = vendedores_info[vendedor_uuid]
-            # Si no hay venta, usar created_by_uuid (para pagos/ajustes)
-            elif mov.get('created_by_uuid'):
-                created_by = mov.get('created_by_uuid')
-                if created_by in vendedores_info:
-                    item['vendedor'] = vendedores_info[created_by]
-            
-            items.append(item)
-        
-        for venta_data in (ventas_pagadas_result.data or []):
-            venta = cast(Dict[str, Any], venta_data)
-            item = {
-                'uuid': venta.get('uuid'),
-                'fecha': venta.get('created_at'),
-                'tipo': 'venta_pagada',
-                'monto': float(venta.get('total', 0)),
-                'descripcion': f"Venta #{venta.get('numero_ticket')} pagada directamente",
-                'venta_uuid': venta.get('uuid'),
-                'numero_ticket': venta.get('numero_ticket')
-            }
-            
-            # Agregar información del vendedor
-            vendedor_uuid = venta.get('vendedor_uuid')
-            if vendedor_uuid and vendedor_uuid in vendedores_info:
-                item['vendedor'] = vendedores_info[vendedor_uuid]
-            
-            items.append(item)
-        
-        items.sort(key=lambda x: x.get('fecha', ''), reverse=True)
+        items = await to_thread(
+            _merge_movimientos,
+            movimientos_result.data or [],
+            ventas_pagadas_result.data or [],
+            ventas_vendedores,
+            vendedores_info
+        )
         
         total_count = len(items)
         items_paginados = items[offset:offset + limit]
@@ -329,10 +301,69 @@ async def get_movimientos_cuenta(
         logger.error(f"Error getting movimientos: {e}")
         raise HTTPException(status_code=500, detail="Error al obtener movimientos")
 
+def _merge_movimientos(
+    movimientos: List[Any],
+    ventas_pagadas: List[Any],
+    ventas_vendedores: Dict[str, Any],
+    vendedores_info: Dict[str, Dict[str, str]]
+) -> List[Dict[str, Any]]:
+    """Unir movimientos de la cuenta y ventas pagadas de contado, con su vendedor, por fecha descendente"""
+    items = []
+    
+    for mov_data in movimientos:
+        mov = cast(Dict[str, Any], mov_data)
+        item = {
+            'uuid': mov.get('uuid'),
+            'fecha': mov.get('fecha'),
+            'tipo': mov.get('tipo'),
+            'monto': mov.get('monto') or 0,
+            'descripcion': mov.get('descripcion'),
+            'venta_uuid': mov.get('venta_uuid'),
+            'metodo_pago': mov.get('metodo_pago')
+        }
+        
+        # Agregar información del vendedor
+        # Primero intentar con venta_uuid (para cargos)
+        venta_uuid = mov.get('venta_uuid')
+        if venta_uuid and venta_uuid in ventas_vendedores:
+            vendedor_uuid = ventas_vendedores[venta_uuid]
+            if vendedor_uuid and vendedor_uuid in vendedores_info:
+                item['vendedor'] = vendedores_info[vendedor_uuid]
+        # Si no hay venta, usar created_by_uuid (para pagos/ajustes)
+        elif mov.get('created_by_uuid'):
+            created_by = mov.get('created_by_uuid')
+            if created_by in vendedores_info:
+                item['vendedor'] = vendedores_info[created_by]
+        
+        items.append(item)
+    
+    for venta_data in ventas_pagadas:
+        venta = cast(Dict[str, Any], venta_data)
+        item = {
+            'uuid': venta.get('uuid'),
+            'fecha': venta.get('created_at'),
+            'tipo': 'venta_pagada',
+            'monto': venta.get('total') or 0,
+            'descripcion': f"Venta #{venta.get('numero_ticket')} pagada directamente",
+            'venta_uuid': venta.get('uuid'),
+            'numero_ticket': venta.get('numero_ticket')
+        }
+        
+        # Agregar información del vendedor
+        vendedor_uuid = venta.get('vendedor_uuid')
+        if vendedor_uuid and vendedor_uuid in vendedores_info:
+            item['vendedor'] = vendedores_info[vendedor_uuid]
+        
+        items.append(item)
+    
+    items.sort(key=lambda x: x.get('fecha', ''), reverse=True)
+    return items
+
 @pos_cuentas_router.post("/cuentas/{miembro_uuid}/abonos")
+@idempotent("abonos")
 async def registrar_abono(
     miembro_uuid: str,
-    monto: Decimal,
+    monto: Money,
     metodo_pago: str = "efectivo",
     notas: Optional[str] = None,
     current_user: Dict[str, Any] = Depends(require_permission(Permission.MANAGE_PAYMENTS))
@@ -355,23 +386,12 @@ async def registrar_abono(
         # Calcular saldo real
         todos_movimientos = supabase.table('movimientos_cuenta').select('tipo, monto').eq('cuenta_uuid', cuenta_uuid).eq('is_deleted', False).execute()
         
-        saldo_real = 0
-        for mov_data in (todos_movimientos.data or []):
-            mov = cast(Dict[str, Any], mov_data)
-            tipo = mov.get('tipo')
-            monto_mov = float(mov.get('monto', 0))
-            if tipo == 'cargo':
-                saldo_real += monto_mov
-            elif tipo == 'pago':
-                saldo_real -= monto_mov
-            elif tipo == 'ajuste':
-                # Los ajustes pueden ser positivos o negativos
-                saldo_real += monto_mov
-        
-        if float(monto) > saldo_real:
+        saldo_real = _totales_movimientos(todos_movimientos.data or [])['saldo']
+        
+        if monto > saldo_real:
             raise HTTPException(
                 status_code=400,
-                detail=f"El abono ({monto}) excede el saldo actual ({saldo_real})"
+                detail=f"El abono ({from_cents(monto)}) excede el saldo actual ({from_cents(saldo_real)})"
             )
         
         # Registrar movimiento
@@ -379,7 +399,7 @@ async def registrar_abono(
             'uuid': str(uuid_lib.uuid4()),
             'cuenta_uuid': cuenta_uuid,
             'tipo': 'pago',
-            'monto': float(monto),
+            'monto': from_cents(monto),
             'descripcion': f"Abono - {metodo_pago}" + (f" - {notas}" if notas else ""),
             'created_by_uuid': actor_uuid,
             'fecha': datetime.now(timezone.utc).isoformat()
@@ -391,16 +411,16 @@ async def registrar_abono(
             raise HTTPException(status_code=500, detail="Error al registrar abono")
         
         # Actualizar saldo
-        nuevo_saldo = saldo_real - float(monto)
+        nuevo_saldo = saldo_real - monto
         supabase.table('cuentas_miembro').update({
-            'saldo_deudor': nuevo_saldo,
+            'saldo_deudor': from_cents(nuevo_saldo),
             'updated_at': datetime.now(timezone.utc).isoformat()
         }).eq('miembro_uuid', miembro_uuid).execute()
         
         return {
             "abono": movimiento_result.data[0],
-            "saldo_anterior": saldo_real,
-            "nuevo_saldo": nuevo_saldo
+            "saldo_anterior": from_cents(saldo_real),
+            "nuevo_saldo": from_cents(nuevo_saldo)
         }
     except HTTPException:
         raise
@@ -409,9 +429,10 @@ async def registrar_abono(
         raise HTTPException(status_code=500, detail="Error al registrar abono")
 
 @pos_cuentas_router.post("/cuentas/{miembro_uuid}/ajustes")
+@idempotent("ajustes")
 async def crear_ajuste_cuenta(
     miembro_uuid: str,
-    monto: Decimal,
+    monto: Money,
     justificacion: str,
     current_user: Dict[str, Any] = Depends(require_permission(Permission.MANAGE_PAYMENTS))
 ) -> Dict[str, Any]:
@@ -428,13 +449,13 @@ async def crear_ajuste_cuenta(
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
         
         cuenta = cast(Dict[str, Any], cuenta_result.data[0])
-        saldo_actual = float(cuenta.get('saldo_deudor', 0))
+        saldo_actual = to_cents(cuenta.get('saldo_deudor'))
         
         movimiento_data = {
             'uuid': str(uuid_lib.uuid4()),
             'cuenta_uuid': cuenta.get('uuid'),
             'tipo': 'ajuste',
-            'monto': float(monto),
+            'monto': from_cents(monto),
             'descripcion': f"Ajuste administrativo: {justificacion}",
             'created_by_uuid': actor_uuid,
             'fecha': datetime.now(timezone.utc).isoformat()
@@ -445,18 +466,18 @@ async def crear_ajuste_cuenta(
         if not movimiento_result.data:
             raise HTTPException(status_code=500, detail="Error al crear ajuste")
         
-        nuevo_saldo = saldo_actual + float(monto)
+        nuevo_saldo = saldo_actual + monto
         
         supabase.table('cuentas_miembro').update({
-            'saldo_deudor': nuevo_saldo,
+            'saldo_deudor': from_cents(nuevo_saldo),
             'updated_at': datetime.now(timezone.utc).isoformat()
         }).eq('miembro_uuid', miembro_uuid).execute()
         
         return {
             "ajuste": movimiento_result.data[0],
-            "saldo_anterior": saldo_actual,
-            "nuevo_saldo": nuevo_saldo,
-            "monto": float(monto)
+            "saldo_anterior": from_cents(saldo_actual),
+            "nuevo_saldo": from_cents(nuevo_saldo),
+            "monto": from_cents(monto)
         }
     except HTTPException:
         raise
@@ -7,10 +7,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict, Any, cast
 from models.models import UsuarioTemporalLogin
 from core import config
+from core.mesero_sessions import active_meseros, parse_validity
 from utils.auth import require_admin, create_access_token
 from datetime import datetime, timezone, timedelta
 import logging
 import hashlib
+import hmac
+import time
 
 logger = logging.getLogger(__name__)
 pos_meseros_router = APIRouter(prefix="", tags=["pos-meseros"])
@@ -22,31 +25,41 @@ supabase = config.supabase
 async def login_mesero(
     credentials: UsuarioTemporalLogin
 ) -> Dict[str, Any]:
-    """Autenticar mesero con username y PIN"""
+    """Autenticar mesero con username y PIN
+    
+    Las credenciales del turno se precargan al abrirlo; solo si no están
+    cargadas (p. ej. reinicio del servidor) se consulta usuarios_temporales
+    """
     try:
-        # Buscar mesero
-        result = supabase.table('usuarios_temporales')\
-            .select('*')\
-            .eq('username', credentials.username)\
-            .eq('activo', True)\
-            .eq('is_deleted', False)\
-            .execute()
+        mesero = active_meseros.get_credentials(credentials.username)
         
-        if not result.data or len(result.data) == 0:
-            raise HTTPException(status_code=401, detail="Usuario o PIN incorrecto")
-        
-        mesero = cast(Dict[str, Any], result.data[0])
+        if mesero is None:
+            generation = active_meseros.generation()
+            result = supabase.table('usuarios_temporales')\
+                .select('*')\
+                .eq('username', credentials.username)\
+                .eq('activo', True)\
+                .eq('is_deleted', False)\
+                .execute()
+            
+            if not result.data or len(result.data) == 0:
+                raise HTTPException(status_code=401, detail="Usuario o PIN incorrecto")
+            
+            row = cast(Dict[str, Any], result.data[0])
+            active_meseros.restore_credentials(row, generation)
+            mesero = active_meseros.get_credentials(credentials.username) or {
+                **row,
+                'expires_at': parse_validity(row.get('fin_validity')),
+            }
         
         # Verificar validez temporal
-        fin_validity_str = mesero.get('fin_validity')
-        if fin_validity_str and isinstance(fin_validity_str, str):
-            fin_validity = datetime.fromisoformat(fin_validity_str.replace('Z', '+00:00'))
-            if datetime.now(timezone.utc) > fin_validity:
-                raise HTTPException(status_code=401, detail="Usuario expirado")
+        expires_at = mesero.get('expires_at')
+        if expires_at is not None and time.time() > expires_at:
+            raise HTTPException(status_code=401, detail="Usuario expirado")
         
         # Verificar PIN
         pin_hash = hashlib.sha256(credentials.pin.encode()).hexdigest()
-        if pin_hash != mesero.get('pin_hash'):
+        if not hmac.compare_digest(pin_hash, str(mesero.get('pin_hash') or '')):
             raise HTTPException(status_code=401, detail="Usuario o PIN incorrecto")
         
         # Crear token JWT
@@ -126,6 +139,8 @@ async def desactivar_mesero(
         if not result.data:
             raise HTTPException(status_code=404, detail="Mesero no encontrado")
         
+        active_meseros.revoke(mesero_uuid)
+        
         return {"message": "Mesero desactivado exitosamente"}
     except HTTPException:
         raise
@@ -148,6 +163,7 @@ async def cerrar_meseros_expirados(
             .execute()
         
         cantidad = len(result.data) if result.data else 0
+        active_meseros.revoke_many(cast(Dict[str, Any], m)['uuid'] for m in (result.data or []))
         
         return {
             'message': f'{cantidad} meseros expirados desactivados',
@@ -5,9 +5,11 @@ RF-PROD
 
 from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict, Any, Optional, cast
-from models.models import ProductoCreate, CategoriaProducto
+from models.models import ProductoCreate, CategoriaProducto, ProductosListResponse
 from core import config
 from core.cache import cached, invalidate_cache_pattern
+from core.etag import conditional_get, bump_resource_version
+from core.responses import FastJSONResponse
 from utils.auth import require_admin, require_pos_access
 import logging
 import uuid as uuid_lib
@@ -19,13 +21,14 @@ supabase = config.supabase
 # ============= PRODUCTOS (RF-PROD) =============
 
 @cached(ttl_seconds=180, key_prefix="productos")
-@pos_productos_router.get("/productos")
+@pos_productos_router.get("/productos", response_model=ProductosListResponse)
+@conditional_get("productos")
 async def list_productos(
     q: Optional[str] = None,
     categoria_uuid: Optional[str] = None,
     favoritos: Optional[bool] = None,
     activo: bool = True
-) -> Dict[str, Any]:
+) -> FastJSONResponse:
     """RF-PROD-01: Listar productos con búsqueda y filtros rápidos para POS
     
     NOTA: Endpoint público para permitir acceso sin autenticación (catálogo)
@@ -51,7 +54,7 @@ async def list_productos(
         query = query.order('favorito', desc=True).order('nombre')
         result = query.execute()
         
-        return {"productos": result.data}
+        return FastJSONResponse({"productos": result.data})
     except Exception as e:
         logger.error(f"Error listing productos: {e}")
         raise HTTPException(status_code=500, detail="Error al listar productos")
@@ -67,6 +70,7 @@ async def create_producto(
         if producto.precio < 0:
             raise HTTPException(status_code=400, detail="El precio debe ser mayor o igual a 0")
         
+        # Money se serializa en pesos
         data = producto.model_dump()
         
         # Generar código automáticamente si no se proporciona
@@ -93,9 +97,6 @@ async def create_producto(
         
         # Generar UUID para el nuevo producto
         data['uuid'] = str(uuid_lib.uuid4())
-        # Convertir Decimal a float para JSON serialization
-        if 'precio' in data:
-            data['precio'] = float(data['precio'])
         # categoria_uuid ya es string, no necesita conversión
         if not data.get('categoria_uuid'):
             data['categoria_uuid'] = None
@@ -107,6 +108,7 @@ async def create_producto(
         
         # Invalidar caché después de crear producto
         invalidate_cache_pattern("productos")
+        bump_resource_version("productos")
         
         return cast(Dict[str, Any], result.data[0])
     except HTTPException:
@@ -133,9 +135,6 @@ async def update_producto(
             raise HTTPException(status_code=404, detail="Producto no encontrado")
         
         data = producto.model_dump(exclude_unset=True)
-        # Convertir Decimal a float para JSON serialization
-        if 'precio' in data:
-            data['precio'] = float(data['precio'])
         # Convertir UUID a string
         if data.get('categoria_uuid'):
             data['categoria_uuid'] = str(data['categoria_uuid'])
@@ -146,6 +145,7 @@ async def update_producto(
         
         # Invalidar caché después de actualizar producto
         invalidate_cache_pattern("productos")
+        bump_resource_version("productos")
         
         return cast(Dict[str, Any], result.data[0])
     except HTTPException:
@@ -168,6 +168,7 @@ async def delete_producto(
         
         # Invalidar caché después de eliminar producto
         invalidate_cache_pattern("productos")
+        bump_resource_version("productos")
         
         return {"message": "Producto eliminado"}
     except HTTPException:
@@ -179,6 +180,7 @@ async def delete_producto(
 # ============= CATEGORÍAS (RF-PROD-02) =============
 
 @pos_productos_router.get("/categorias")
+@conditional_get("categorias")
 async def list_categorias() -> Dict[str, Any]:
     """RF-PROD-02: Listar categorías para organización del POS
     
@@ -201,6 +203,7 @@ async def create_categoria(
         data = categoria.model_dump()
         data['uuid'] = str(uuid_lib.uuid4())  # Generar UUID
         result = supabase.table('categorias_producto').insert(data).execute()
+        bump_resource_version("categorias")
         return cast(Dict[str, Any], result.data[0])
     except Exception as e:
         logger.error(f"Error creating categoria: {e}")
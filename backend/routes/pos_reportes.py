@@ -4,13 +4,20 @@ RF-STOCK, RF-REPORT, RF-OFFLINE
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Dict, Any, Optional, cast
+from typing import List, Dict, Any, Optional, Tuple, cast
 from core import config
+from core.db import gather_queries, gather_queries_bounded, run_query
+from core.profiling import to_thread
+from core.idempotency import idempotent
+from core.money import Money, to_cents, from_cents, sum_cents
 from utils.auth import require_admin, require_pos_access, require_permission, require_auth_user
 from utils.permissions import Permission
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
+import base64
+import json
 import logging
+import uuid as uuid_lib
 
 logger = logging.getLogger(__name__)
 pos_reportes_router = APIRouter(prefix="", tags=["pos-reportes"])
@@ -129,6 +136,115 @@ async def ajuste_inventario(
 
 # ============= REPORTES (RF-REPORT) =============
 
+# Agregaciones como funciones puras (sin base de datos) para medirlas con benchmarks.py
+
+def _filtrar_ventas_por_producto(ventas: List[Any], producto_uuid: str) -> List[Any]:
+    """Ventas que incluyen el producto en alguno de sus items"""
+    ventas_filtradas = []
+    for venta in ventas:
+        if isinstance(venta, dict):
+            items = venta.get('venta_items', [])
+            if isinstance(items, list):
+                if any(isinstance(item, dict) and item.get('producto_uuid') == producto_uuid for item in items):
+                    ventas_filtradas.append(venta)
+    return ventas_filtradas
+
+def _resumir_ventas(ventas: List[Any]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """Totales por tipo de pago y agrupación por día: (resumen, ventas_por_dia)"""
+    # Se acumula en centavos y se pasa a pesos al final
+    total_ventas = 0
+    total_efectivo = 0
+    total_fiado = 0
+    num_transacciones = len(ventas)
+    ventas_por_dia: Dict[str, Dict[str, Any]] = {}
+    
+    for v in ventas:
+        if not isinstance(v, dict):
+            continue
+            
+        total = to_cents(v.get('total'))
+        total_ventas += total
+        
+        # Clasificar por tipo de pago
+        if v.get('is_fiado'):
+            total_fiado += total
+        else:
+            total_efectivo += total
+        
+        # Agrupar por día
+        fecha_str = v.get('created_at', '')[:10]  # YYYY-MM-DD
+        if fecha_str:
+            if fecha_str not in ventas_por_dia:
+                ventas_por_dia[fecha_str] = {'cantidad': 0, 'total': 0}
+            ventas_por_dia[fecha_str]['cantidad'] += 1
+            ventas_por_dia[fecha_str]['total'] += total
+    
+    for dia in ventas_por_dia.values():
+        dia['total'] = from_cents(dia['total'])
+    
+    resumen = {
+        "num_ventas": num_transacciones,
+        "num_transacciones": num_transacciones,
+        "total_ventas": from_cents(total_ventas),
+        "total_efectivo": from_cents(total_efectivo),
+        "total_fiado": from_cents(total_fiado)
+    }
+    return resumen, ventas_por_dia
+
+def _agrupar_productos_vendidos(items: List[Any]) -> Dict[str, Any]:
+    """Cantidades e ingresos por producto, ordenados por cantidad vendida"""
+    # Agrupar por producto
+    productos_stats = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        
+        producto_uuid = item.get('producto_uuid')
+        if not producto_uuid:
+            continue
+        
+        if producto_uuid not in productos_stats:
+            producto_info = item.get('productos', {})
+            productos_stats[producto_uuid] = {
+                'producto_uuid': producto_uuid,
+                'nombre': producto_info.get('nombre', 'N/A') if isinstance(producto_info, dict) else 'N/A',
+                'codigo': producto_info.get('codigo', '') if isinstance(producto_info, dict) else '',
+                'cantidad_vendida': 0,
+                'total_vendido': 0
+            }
+        
+        productos_stats[producto_uuid]['cantidad_vendida'] += float(item.get('cantidad', 0))
+        productos_stats[producto_uuid]['total_vendido'] += to_cents(item.get('total_item'))
+    
+    # Convertir a lista y ordenar por cantidad vendida
+    productos_list = sorted(
+        list(productos_stats.values()),
+        key=lambda x: x['cantidad_vendida'],
+        reverse=True
+    )
+    
+    # Formatear para el frontend
+    productos_vendidos = []
+    for p in productos_list:
+        productos_vendidos.append({
+            'producto': {
+                'uuid': p['producto_uuid'],
+                'nombre': p['nombre'],
+                'codigo': p['codigo']
+            },
+            'cantidad_total': p['cantidad_vendida'],
+            'ingresos_total': from_cents(p['total_vendido'])
+        })
+    
+    return {
+        "productos_vendidos": productos_vendidos,
+        "total_productos": len(productos_vendidos),
+        "resumen": {
+            "num_productos": len(productos_list),
+            "total_items_vendidos": sum(p['cantidad_vendida'] for p in productos_list)
+        }
+    }
+
 @pos_reportes_router.get("/reportes/ventas")
 async def reporte_ventas(
     fecha_desde: Optional[str] = None,
@@ -153,62 +269,26 @@ async def reporte_ventas(
             query = query.lt('fecha_hora', f"{fecha_siguiente} 05:00:00")
         
         query = query.order('fecha_hora', desc=True)
-        result = query.execute()
+        # Consulta y agregación fuera del event loop: un reporte de fin de mes no frena las ventas
+        result = await run_query(query, config.REPORT_QUERY_TIMEOUT_SECONDS)
         
         ventas = result.data or []
         
         # Filtrar por producto si se especifica
         if producto_uuid and ventas:
-            ventas_filtradas = []
-            for venta in ventas:
-                if isinstance(venta, dict):
-                    items = venta.get('venta_items', [])
-                    if isinstance(items, list):
-                        if any(isinstance(item, dict) and item.get('producto_uuid') == producto_uuid for item in items):
-                            ventas_filtradas.append(venta)
-            ventas = ventas_filtradas
-        
-        # Calcular totales
-        total_ventas = 0.0
-        total_efectivo = 0.0
-        total_fiado = 0.0
-        num_transacciones = len(ventas)
-        ventas_por_dia = {}
-        
-        for v in ventas:
-            if not isinstance(v, dict):
-                continue
-                
-            total = float(v.get('total', 0))
-            total_ventas += total
-            
-            # Clasificar por tipo de pago
-            if v.get('is_fiado'):
-                total_fiado += total
-            else:
-                total_efectivo += total
-            
-            # Agrupar por día
-            fecha_str = v.get('created_at', '')[:10]  # YYYY-MM-DD
-            if fecha_str:
-                if fecha_str not in ventas_por_dia:
-                    ventas_por_dia[fecha_str] = {'cantidad': 0, 'total': 0.0}
-                ventas_por_dia[fecha_str]['cantidad'] += 1
-                ventas_por_dia[fecha_str]['total'] += total
+            ventas = await to_thread(_filtrar_ventas_por_producto, ventas, producto_uuid)
+        
+        resumen, ventas_por_dia = await to_thread(_resumir_ventas, ventas)
         
         # TODO: Implementar export CSV si formato == 'csv'
         
         return {
             "ventas": ventas,
             "ventas_por_dia": ventas_por_dia,
-            "resumen": {
-                "num_ventas": num_transacciones,
-                "num_transacciones": num_transacciones,
-                "total_ventas": total_ventas,
-                "total_efectivo": total_efectivo,
-                "total_fiado": total_fiado
-            }
+            "resumen": resumen
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error reporte ventas: {e}")
         raise HTTPException(status_code=500, detail="Error al generar reporte")
@@ -235,59 +315,10 @@ async def reporte_productos(
             fecha_siguiente = (datetime.strptime(fecha_hasta, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
             query = query.lt('ventas.fecha_hora', f"{fecha_siguiente} 05:00:00")
         
-        result = query.execute()
-        items = result.data or []
-        # Agrupar por producto
-        productos_stats = {}
-        for item in items:
-            if not isinstance(item, dict):
-                continue
-            
-            producto_uuid = item.get('producto_uuid')
-            if not producto_uuid:
-                continue
-            
-            if producto_uuid not in productos_stats:
-                producto_info = item.get('productos', {})
-                productos_stats[producto_uuid] = {
-                    'producto_uuid': producto_uuid,
-                    'nombre': producto_info.get('nombre', 'N/A') if isinstance(producto_info, dict) else 'N/A',
-                    'codigo': producto_info.get('codigo', '') if isinstance(producto_info, dict) else '',
-                    'cantidad_vendida': 0,
-                    'total_vendido': 0
-                }
-            
-            productos_stats[producto_uuid]['cantidad_vendida'] += float(item.get('cantidad', 0))
-            productos_stats[producto_uuid]['total_vendido'] += float(item.get('total_item', 0))
-        
-        # Convertir a lista y ordenar por cantidad vendida
-        productos_list = sorted(
-            list(productos_stats.values()),
-            key=lambda x: x['cantidad_vendida'],
-            reverse=True
-        )
-        
-        # Formatear para el frontend
-        productos_vendidos = []
-        for p in productos_list:
-            productos_vendidos.append({
-                'producto': {
-                    'uuid': p['producto_uuid'],
-                    'nombre': p['nombre'],
-                    'codigo': p['codigo']
-                },
-                'cantidad_total': p['cantidad_vendida'],
-                'ingresos_total': p['total_vendido']
-            })
-        
-        return {
-            "productos_vendidos": productos_vendidos,
-            "total_productos": len(productos_vendidos),
-            "resumen": {
-                "num_productos": len(productos_list),
-                "total_items_vendidos": sum(p['cantidad_vendida'] for p in productos_list)
-            }
-        }
+        result = await run_query(query, config.REPORT_QUERY_TIMEOUT_SECONDS)
+        return await to_thread(_agrupar_productos_vendidos, result.data or [])
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error reporte productos: {e}")
         raise HTTPException(status_code=500, detail="Error al generar reporte de productos")
@@ -299,22 +330,27 @@ async def reporte_deudas(
     """Reporte de cuentas con saldo deudor (deudas)"""
     try:
         # Obtener todas las cuentas con sus totales
-        result = supabase.table('cuentas_miembro').select(
-            '*, miembro:miembros(documento, nombres, apellidos, telefono)'
-        ).eq('is_deleted', False).execute()
+        result = await run_query(
+            supabase.table('cuentas_miembro').select(
+                '*, miembro:miembros(documento, nombres, apellidos, telefono)'
+            ).eq('is_deleted', False),
+            config.REPORT_QUERY_TIMEOUT_SECONDS
+        )
         
         cuentas = result.data or []
         
         # Filtrar solo cuentas con saldo deudor > 0
         cuentas_deudoras = []
         todas_cuentas = []
+        total_deuda = 0  # centavos
         
         for cuenta in cuentas:
             if not isinstance(cuenta, dict):
                 continue
             
-            saldo_deudor = float(cuenta.get('saldo_deudor', 0))
+            saldo_deudor = to_cents(cuenta.get('saldo_deudor'))
             if saldo_deudor > 0:
+                total_deuda += saldo_deudor
                 miembro_info = cuenta.get('miembro', {})
                 if isinstance(miembro_info, dict):
                     nombres = miembro_info.get('nombres', '')
@@ -328,8 +364,8 @@ async def reporte_deudas(
                     'miembro_uuid': cuenta.get('miembro_uuid'),
                     'miembro_nombre': miembro_nombre,
                     'miembro_documento': miembro_info.get('documento', '') if isinstance(miembro_info, dict) else '',
-                    'saldo_deudor': saldo_deudor,
-                    'limite_credito': float(cuenta.get('limite_credito', 0))
+                    'saldo_deudor': from_cents(saldo_deudor),
+                    'limite_credito': from_cents(to_cents(cuenta.get('limite_credito')))
                 }
                 
                 cuentas_deudoras.append(cuenta_data)
@@ -341,19 +377,20 @@ async def reporte_deudas(
         # Top 10 mayores deudas
         top_deudas = cuentas_deudoras[:10]
         
-        total_deuda = sum(c['saldo_deudor'] for c in cuentas_deudoras)
-        deuda_promedio = total_deuda / len(cuentas_deudoras) if cuentas_deudoras else 0
+        deuda_promedio = round(total_deuda / len(cuentas_deudoras)) if cuentas_deudoras else 0
         
         return {
             "top_deudas": top_deudas,
             "todas_cuentas": todas_cuentas,
             "resumen": {
                 "miembros_con_deuda": len(cuentas_deudoras),
-                "deuda_total": total_deuda,
-                "deuda_promedio": deuda_promedio,
+                "deuda_total": from_cents(total_deuda),
+                "deuda_promedio": from_cents(deuda_promedio),
                 "num_cuentas_deudoras": len(cuentas_deudoras)
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error reporte deudas: {e}")
         raise HTTPException(status_code=500, detail="Error al generar reporte de deudas")
@@ -366,31 +403,31 @@ async def reporte_cuentas_pendientes(
     """RF-REPORT-03: Reporte de cuentas por miembro (deudas)"""
     try:
         # Usar vista creada en schema
-        result = supabase.table('vw_member_account_summary').select('*').execute()
+        result = await run_query(
+            supabase.table('vw_member_account_summary').select('*'), config.REPORT_QUERY_TIMEOUT_SECONDS
+        )
         
         cuentas = result.data or []
         
         # Filtrar solo con saldo deudor > 0
         cuentas_pendientes = [
             c for c in cuentas
-            if isinstance(c, dict) and float(cast(Dict[str, Any], c).get('saldo_deudor', 0)) > 0
+            if isinstance(c, dict) and to_cents(cast(Dict[str, Any], c).get('saldo_deudor')) > 0
         ]
         
         # TODO: Filtrar por antigüedad si se especifica
         
-        total_deuda = sum(
-            float(cast(Dict[str, Any], c).get('saldo_deudor', 0))
-            for c in cuentas_pendientes
-            if isinstance(c, dict)
-        )
+        total_deuda = sum_cents(cuentas_pendientes, 'saldo_deudor')
         
         return {
             "cuentas": cuentas_pendientes,
             "resumen": {
                 "num_cuentas": len(cuentas_pendientes),
-                "total_deuda": total_deuda
+                "total_deuda": from_cents(total_deuda)
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error reporte cuentas: {e}")
         raise HTTPException(status_code=500, detail="Error al generar reporte de cuentas")
@@ -446,7 +483,9 @@ async def sync_push(
 ) -> Dict[str, Any]:
     """RF-OFFLINE-01: Push de ventas creadas offline
     
-    Procesa lote de ventas con idempotencia usando client_ticket_id
+    Procesa lote de ventas con idempotencia usando client_ticket_id:
+    una sola consulta in_() detecta las ya registradas y el resto se crea
+    en bloques con create_sale_many (ver migrations/add_create_sale_many.sql)
     """
     try:
         resultados = {
@@ -454,61 +493,225 @@ async def sync_push(
             "fallidas": [],
             "duplicadas": []
         }
+        actor_uuid = current_user.get('sub') or current_user.get('uid')
+        batch_size = max(1, config.SYNC_PUSH_BATCH_SIZE)
         
+        # Validar client_ticket_id obligatorio y descartar repetidos dentro del mismo lote
+        pendientes: List[Dict[str, Any]] = []
+        repetidos: List[str] = []
+        vistos = set()
         for venta_data in ventas:
-            try:
-                # Validar client_ticket_id obligatorio
-                client_ticket_id = venta_data.get('client_ticket_id')
-                if not client_ticket_id:
+            client_ticket_id = venta_data.get('client_ticket_id')
+            if not client_ticket_id:
+                resultados['fallidas'].append({
+                    "venta": venta_data,
+                    "error": "client_ticket_id es obligatorio"
+                })
+                continue
+            if client_ticket_id in vistos:
+                repetidos.append(client_ticket_id)
+                continue
+            vistos.add(client_ticket_id)
+            pendientes.append(venta_data)
+        
+        # Verificar cuáles ya existen (idempotencia) con una consulta por bloque
+        ticket_ids = [v['client_ticket_id'] for v in pendientes]
+        existentes_results = await gather_queries(*[
+            supabase.table('ventas').select('uuid, client_ticket_id').in_('client_ticket_id', ticket_ids[i:i + batch_size])
+            for i in range(0, len(ticket_ids), batch_size)
+        ])
+        existentes: Dict[str, Any] = {}
+        for existentes_result in existentes_results:
+            for row_data in (existentes_result.data or []):
+                row = cast(Dict[str, Any], row_data)
+                existentes.setdefault(row.get('client_ticket_id'), row.get('uuid'))
+        
+        nuevas = []
+        for venta_data in pendientes:
+            client_ticket_id = venta_data['client_ticket_id']
+            if client_ticket_id in existentes:
+                resultados['duplicadas'].append({
+                    "client_ticket_id": client_ticket_id,
+                    "venta_uuid": existentes[client_ticket_id]
+                })
+            else:
+                nuevas.append(venta_data)
+        
+        # Crear las ventas nuevas en bloques, con concurrencia acotada
+        bloques = [nuevas[i:i + batch_size] for i in range(0, len(nuevas), batch_size)]
+        bloques_results = await gather_queries_bounded(
+            [
+                supabase.rpc('create_sale_many', {
+                    'p_payloads': bloque,
+                    'p_actor_uuid': actor_uuid
+                })
+                for bloque in bloques
+            ],
+            limit=config.SYNC_PUSH_CONCURRENCY
+        )
+        
+        creadas: Dict[str, Any] = {}
+        for bloque, bloque_result in zip(bloques, bloques_results):
+            if isinstance(bloque_result, BaseException):
+                if _rpc_no_disponible(bloque_result):
+                    # Migración sin aplicar: crear una a una con create_sale
+                    logger.warning(f"create_sale_many not available, falling back to create_sale: {bloque_result}")
+                    await _sync_push_individual(bloque, actor_uuid, resultados, creadas)
+                    continue
+                # Timeout u otro error: el RPC pudo haber confirmado (o seguir corriendo).
+                # Antes de reintentar se busca qué ventas del bloque ya quedaron registradas
+                logger.warning(f"create_sale_many failed for a block of {len(bloque)}, re-checking stored sales: {bloque_result}")
+                try:
+                    registradas = await _buscar_registradas([v['client_ticket_id'] for v in bloque])
+                except Exception as e:
+                    logger.error(f"Could not re-check sync block after create_sale_many failure: {e}")
+                    resultados['fallidas'].extend(
+                        {"venta": venta_data, "error": "No se pudo confirmar la venta, reintente la sincronización"}
+                        for venta_data in bloque
+                    )
+                    continue
+                existentes.update(registradas)
+                restantes = []
+                for venta_data in bloque:
+                    client_ticket_id = venta_data['client_ticket_id']
+                    if client_ticket_id in registradas:
+                        resultados['duplicadas'].append({
+                            "client_ticket_id": client_ticket_id,
+                            "venta_uuid": registradas[client_ticket_id]
+                        })
+                    else:
+                        restantes.append(venta_data)
+                await _sync_push_individual(restantes, actor_uuid, resultados, creadas)
+                continue
+            
+            filas = {
+                cast(Dict[str, Any], fila).get('idx'): cast(Dict[str, Any], fila)
+                for fila in (bloque_result.data or [])
+            }
+            for idx, venta_data in enumerate(bloque):
+                client_ticket_id = venta_data['client_ticket_id']
+                fila = filas.get(idx)
+                if not fila or (not fila.get('venta_uuid') and not fila.get('mensaje_error')):
                     resultados['fallidas'].append({
                         "venta": venta_data,
-                        "error": "client_ticket_id es obligatorio"
+                        "error": "Error al crear venta"
                     })
-                    continue
-                
-                # Verificar si ya existe (idempotencia)
-                existing = supabase.table('ventas').select('uuid').eq('client_ticket_id', client_ticket_id).execute()
-                
-                if existing.data:
+                elif fila.get('mensaje_error'):
+                    resultados['fallidas'].append({
+                        "venta": venta_data,
+                        "error": fila['mensaje_error']
+                    })
+                elif fila.get('duplicada'):
                     resultados['duplicadas'].append({
                         "client_ticket_id": client_ticket_id,
-                        "venta_uuid": cast(Dict[str, Any], existing.data[0]).get('uuid')
+                        "venta_uuid": fila['venta_uuid']
                     })
-                    continue
-                
-                # Crear venta usando función create_sale
-                actor_uuid = current_user.get('sub') or current_user.get('uid')
-                result = supabase.rpc('create_sale', {
-                    'p_payload': venta_data,
-                    'p_actor_uuid': actor_uuid
-                }).execute()
-                
-                if result.data and isinstance(result.data, list) and len(result.data) > 0:
-                    venta_uuid = cast(Dict[str, Any], result.data[0]).get('venta_uuid')
+                else:
+                    creadas[client_ticket_id] = fila['venta_uuid']
                     resultados['exitosas'].append({
                         "client_ticket_id": client_ticket_id,
-                        "venta_uuid": venta_uuid
-                    })
-                else:
-                    resultados['fallidas'].append({
-                        "venta": venta_data,
-                        "error": "Error al crear venta"
+                        "venta_uuid": fila['venta_uuid']
                     })
-                    
-            except Exception as e:
-                resultados['fallidas'].append({
-                    "venta": venta_data,
-                    "error": str(e)
-                })
+        
+        # Los repetidos dentro del lote apuntan a la venta ya creada/existente
+        for client_ticket_id in repetidos:
+            resultados['duplicadas'].append({
+                "client_ticket_id": client_ticket_id,
+                "venta_uuid": existentes.get(client_ticket_id) or creadas.get(client_ticket_id)
+            })
         
         return {
             "message": f"Sincronización completada: {len(resultados['exitosas'])} exitosas, {len(resultados['fallidas'])} fallidas, {len(resultados['duplicadas'])} duplicadas",
             "resultados": resultados
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error sync push: {e}")
         raise HTTPException(status_code=500, detail="Error en sincronización")
 
+def _rpc_no_disponible(error: BaseException) -> bool:
+    """True si PostgREST no encuentra la función (PGRST202) o Postgres no la tiene (42883)"""
+    return getattr(error, 'code', None) in ('PGRST202', '42883')
+
+def _es_clave_duplicada(error: BaseException) -> bool:
+    """Violación de unicidad (23505): p. ej. ux_ventas_client_ticket_shift_vendedor"""
+    return getattr(error, 'code', None) == '23505' or 'duplicate key' in str(error)
+
+async def _buscar_registradas(ticket_ids: List[str]) -> Dict[str, Any]:
+    """client_ticket_id -> venta_uuid de las ventas ya registradas"""
+    if not ticket_ids:
+        return {}
+    result = await run_query(
+        supabase.table('ventas').select('uuid, client_ticket_id').in_('client_ticket_id', ticket_ids)
+    )
+    registradas: Dict[str, Any] = {}
+    for row_data in (result.data or []):
+        row = cast(Dict[str, Any], row_data)
+        registradas.setdefault(row.get('client_ticket_id'), row.get('uuid'))
+    return registradas
+
+async def _sync_push_individual(
+    bloque: List[Dict[str, Any]],
+    actor_uuid: Optional[str],
+    resultados: Dict[str, List[Dict[str, Any]]],
+    creadas: Dict[str, Any]
+) -> None:
+    """Crear ventas de un bloque una a una con create_sale (concurrencia acotada)
+
+    Una venta que choca con el índice único la registró otro intento (p. ej.
+    el create_sale_many que venció el timeout): se informa como duplicada.
+    """
+    if not bloque:
+        return
+    results = await gather_queries_bounded(
+        [
+            supabase.rpc('create_sale', {
+                'p_payload': venta_data,
+                'p_actor_uuid': actor_uuid
+            })
+            for venta_data in bloque
+        ],
+        limit=config.SYNC_PUSH_CONCURRENCY
+    )
+    
+    chocadas = [
+        venta_data['client_ticket_id']
+        for venta_data, result in zip(bloque, results)
+        if isinstance(result, BaseException) and _es_clave_duplicada(result)
+    ]
+    registradas: Dict[str, Any] = {}
+    if chocadas:
+        try:
+            registradas = await _buscar_registradas(chocadas)
+        except Exception as e:
+            logger.error(f"Could not look up sales that hit the unique index: {e}")
+    
+    for venta_data, result in zip(bloque, results):
+        client_ticket_id = venta_data['client_ticket_id']
+        if isinstance(result, BaseException) and client_ticket_id in registradas:
+            resultados['duplicadas'].append({
+                "client_ticket_id": client_ticket_id,
+                "venta_uuid": registradas[client_ticket_id]
+            })
+        elif isinstance(result, BaseException):
+            resultados['fallidas'].append({
+                "venta": venta_data,
+                "error": getattr(result, 'detail', None) or str(result)
+            })
+        elif result.data and isinstance(result.data, list) and len(result.data) > 0:
+            venta_uuid = cast(Dict[str, Any], result.data[0]).get('venta_uuid')
+            creadas[venta_data['client_ticket_id']] = venta_uuid
+            resultados['exitosas'].append({
+                "client_ticket_id": venta_data['client_ticket_id'],
+                "venta_uuid": venta_uuid
+            })
+        else:
+            resultados['fallidas'].append({
+                "venta": venta_data,
+                "error": "Error al crear venta"
+            })
+
 @pos_reportes_router.get("/sync/pending")
 async def sync_pending(
     current_user: Dict[str, Any] = Depends(require_auth_user)
@@ -529,13 +732,106 @@ async def sync_pending(
         logger.error(f"Error sync pending: {e}")
         raise HTTPException(status_code=500, detail="Error al obtener items pendientes")
 
+# Tablas expuestas al delta-sync y columnas que recibe el cliente offline
+SYNC_PULL_TABLES: Dict[str, str] = {
+    'productos': 'uuid, codigo, nombre, descripcion, precio, activo, favorito, categoria_uuid, is_deleted, updated_at',
+    'categorias_producto': 'uuid, nombre, orden, activo, is_deleted, updated_at',
+    'cuentas_miembro': 'uuid, miembro_uuid, saldo_deudor, limite_credito, is_deleted, updated_at, miembros(uuid, nombres, apellidos)',
+    'usuarios_temporales': 'uuid, username, display_name, activo, fin_validity, shift_uuid, is_deleted, updated_at',
+}
+
+@pos_reportes_router.get("/sync/pull")
+async def sync_pull(
+    since: Optional[str] = None,
+    current_user: Dict[str, Any] = Depends(require_pos_access)
+) -> Dict[str, Any]:
+    """RF-OFFLINE-03: Delta-sync de catálogo, cuentas y meseros
+    
+    Devuelve solo las filas modificadas desde el cursor (opaco) de la
+    llamada anterior; sin cursor devuelve una instantánea completa.
+    Las eliminaciones llegan como filas con is_deleted=true. Si has_more
+    es true, el cliente debe volver a llamar con next_cursor.
+    cuentas_miembro (saldos y límites) solo se incluye con VIEW_MEMBER_ACCOUNTS.
+    """
+    try:
+        cursor = _decode_sync_cursor(since) if since else {}
+        page_size = max(1, config.SYNC_PULL_PAGE_SIZE)
+        # No devolver filas demasiado recientes: una transacción en curso podría
+        # confirmar después con un updated_at anterior al cursor
+        hasta = (datetime.now(timezone.utc) - timedelta(seconds=config.SYNC_PULL_LAG_SECONDS)).isoformat()
+        
+        tablas = [
+            tabla for tabla in SYNC_PULL_TABLES
+            if tabla != 'cuentas_miembro' or current_user.has_permission(Permission.VIEW_MEMBER_ACCOUNTS)
+        ]
+        queries = []
+        for tabla in tablas:
+            query = supabase.table(tabla).select(SYNC_PULL_TABLES[tabla]).lt('updated_at', hasta)
+            posicion = cursor.get(tabla)
+            if posicion:
+                ts, ultimo_uuid = posicion
+                query = query.or_(f'updated_at.gt."{ts}",and(updated_at.eq."{ts}",uuid.gt.{ultimo_uuid})')
+            queries.append(query.order('updated_at').order('uuid').limit(page_size))
+        
+        results = await gather_queries(*queries)
+        
+        cambios: Dict[str, List[Any]] = {}
+        next_cursor: Dict[str, Any] = dict(cursor)
+        has_more = False
+        for tabla, result in zip(tablas, results):
+            filas = result.data or []
+            cambios[tabla] = filas
+            if filas:
+                ultima = cast(Dict[str, Any], filas[-1])
+                next_cursor[tabla] = [ultima.get('updated_at'), ultima.get('uuid')]
+            if len(filas) >= page_size:
+                has_more = True
+        
+        return {
+            "cambios": cambios,
+            "next_cursor": _encode_sync_cursor(next_cursor),
+            "has_more": has_more,
+            "count": sum(len(filas) for filas in cambios.values())
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error sync pull: {e}")
+        raise HTTPException(status_code=500, detail="Error al obtener cambios")
+
+def _encode_sync_cursor(cursor: Dict[str, Any]) -> str:
+    """Serializar cursor {tabla: [updated_at, uuid]} como string opaco"""
+    raw = json.dumps(cursor, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_sync_cursor(token: str) -> Dict[str, Any]:
+    """Leer cursor generado por _encode_sync_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        cursor = json.loads(raw)
+        if not isinstance(cursor, dict):
+            raise ValueError("cursor no es un objeto")
+        posiciones = {}
+        for tabla, pos in cursor.items():
+            if tabla not in SYNC_PULL_TABLES or not isinstance(pos, list) or len(pos) != 2:
+                continue
+            # Los valores van dentro de un filtro or_() de PostgREST: solo se aceptan
+            # un timestamp y un uuid válidos, re-serializados (nunca el texto original)
+            ts = datetime.fromisoformat(pos[0])
+            ultimo_uuid = uuid_lib.UUID(pos[1])
+            posiciones[tabla] = (ts.isoformat(), str(ultimo_uuid))
+        return posiciones
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Cursor de sincronización inválido")
+
 # ============= PAGOS ADICIONALES (RF-SALE-04) =============
 
 @pos_reportes_router.post("/ventas/{venta_uuid}/pagos")
+@idempotent("pagos_venta")
 async def agregar_pago(
     venta_uuid: str,
     metodo: str,
-    monto: Decimal,
+    monto: Money,
     referencia: Optional[str] = None,
     current_user: Dict[str, Any] = Depends(require_auth_user)
 ) -> Dict[str, Any]:
@@ -558,7 +854,7 @@ async def agregar_pago(
         pago_data = {
             'venta_uuid': venta_uuid,
             'metodo': metodo,
-            'monto': float(monto),
+            'monto': from_cents(monto),
             'referencia': referencia,
             'recibido_por_uuid': actor_uuid,
             'fecha': datetime.now(timezone.utc).isoformat()
@@ -567,11 +863,11 @@ async def agregar_pago(
         result = supabase.table('pagos_venta').insert(pago_data).execute()
         
         # Actualizar pago_estado de la venta
-        total_venta = float(venta.get('total', 0))
+        total_venta = to_cents(venta.get('total'))
         
         # Calcular total pagado
         pagos_result = supabase.table('pagos_venta').select('monto').eq('venta_uuid', venta_uuid).execute()
-        total_pagado = sum(float(cast(Dict[str, Any], p).get('monto', 0)) for p in (pagos_result.data or []))
+        total_pagado = sum_cents(cast(List[Dict[str, Any]], pagos_result.data or []), 'monto')
         
         # Determinar estado de pago
         if total_pagado >= total_venta:
@@ -585,8 +881,8 @@ async def agregar_pago(
         
         return {
             "pago": result.data[0] if result.data else None,
-            "total_venta": total_venta,
-            "total_pagado": total_pagado,
+            "total_venta": from_cents(total_venta),
+            "total_pagado": from_cents(total_pagado),
             "pago_estado": nuevo_estado
         }
     except HTTPException:
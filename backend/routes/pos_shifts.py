@@ -7,12 +7,14 @@ from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict, Any, Optional, cast
 from models.models import CajaShiftCreate, CajaShiftClose
 from core import config
+from core.db import gather_queries, run_query
+from core.etag import conditional_get, bump_resource_version
+from core.mesero_sessions import active_meseros
+from core.money import to_cents, from_cents, sum_cents
 from utils.auth import require_admin, require_auth_user, require_any_authenticated, require_pos_access
 from datetime import datetime, timezone, timedelta
-from decimal import Decimal
 import logging
 import uuid as uuid_lib
-import bcrypt
 import hashlib
 
 logger = logging.getLogger(__name__)
@@ -42,12 +44,11 @@ async def open_shift(
             )
         
         # Crear el turno
+        # Money se serializa en pesos
         shift_data = shift.model_dump(exclude={'meseros'})
         shift_data['uuid'] = str(uuid_lib.uuid4())
         
-        if 'efectivo_inicial' in shift_data and shift_data['efectivo_inicial'] is not None:
-            shift_data['efectivo_inicial'] = float(shift_data['efectivo_inicial'])
-        elif 'efectivo_inicial' in shift_data:
+        if shift_data.get('efectivo_inicial') is None:
             shift_data['efectivo_inicial'] = 0  # Valor por defecto si es None
         if 'apertura_por' in shift_data:
             shift_data['apertura_por'] = str(shift_data['apertura_por'])
@@ -56,6 +57,7 @@ async def open_shift(
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Error al abrir shift")
+        bump_resource_version("caja_shift")
         
         shift_created = result.data[0]
         
@@ -115,13 +117,16 @@ async def open_shift(
                 
                 # Verificar si ya existe un usuario temporal con ese documento activo
                 existing_user = supabase.table('usuarios_temporales')\
-                    .select('uuid')\
+                    .select('uuid, username, display_name, pin_hash, fin_validity')\
                     .eq('username', username)\
                     .eq('activo', True)\
                     .execute()
                 
                 if existing_user.data and len(existing_user.data) > 0:
                     logger.info(f"Usuario temporal con documento {username} ya existe y está activo")
+                    existing_row = cast(Dict[str, Any], existing_user.data[0])
+                    active_meseros.activate(existing_row['uuid'], existing_row.get('fin_validity'))
+                    active_meseros.preload_credentials(existing_row)
                     meseros_creados.append({
                         'username': username,
                         'display_name': display_name,
@@ -150,6 +155,8 @@ async def open_shift(
                 mesero_result = supabase.table('usuarios_temporales').insert(mesero_data).execute()
                 
                 if mesero_result.data:
+                    active_meseros.activate(mesero_data['uuid'], mesero_data['fin_validity'])
+                    active_meseros.preload_credentials(mesero_data)
                     meseros_creados.append({
                         'username': username,
                         'display_name': display_name,
@@ -175,24 +182,25 @@ async def get_shift_summary(
 ) -> Dict[str, Any]:
     """RF-SHIFT-02: Obtener resumen de turno para cierre"""
     try:
-        shift_result = supabase.table('caja_shift').select('*').eq('uuid', shift_uuid).execute()
+        # Fase 1: turno, ventas, pagos y meseros son independientes entre sí
+        # (los pagos se filtran por turno a través del join con ventas)
+        shift_result, ventas_result, pagos_result, meseros_result = await gather_queries(
+            supabase.table('caja_shift').select('*').eq('uuid', shift_uuid),
+            supabase.table('ventas').select('*').eq('shift_uuid', shift_uuid).eq('is_deleted', False),
+            supabase.table('pagos_venta').select(
+                'metodo, monto, ventas!inner(shift_uuid, is_deleted)'
+            ).eq('ventas.shift_uuid', shift_uuid).eq('ventas.is_deleted', False),
+            supabase.table('usuarios_temporales').select(
+                'uuid, username, display_name, miembro_uuid, pin_plain'
+            ).eq('shift_uuid', shift_uuid),
+        )
         
         if not shift_result.data:
             raise HTTPException(status_code=404, detail="Turno no encontrado")
         
         shift = cast(Dict[str, Any], shift_result.data[0])
-        
-        ventas_result = supabase.table('ventas').select('*').eq('shift_uuid', shift_uuid).eq('is_deleted', False).execute()
         ventas = ventas_result.data or []
-        
-        # Obtener UUIDs de ventas de este turno
-        venta_uuids = [cast(Dict[str, Any], v).get('uuid') for v in ventas if isinstance(v, dict)]
-        
-        # Obtener pagos de estas ventas
-        pagos = []
-        if venta_uuids:
-            pagos_result = supabase.table('pagos_venta').select('*').in_('venta_uuid', venta_uuids).execute()
-            pagos = pagos_result.data or []
+        pagos = pagos_result.data or []
         
         # Calcular totales por método de pago
         pagos_por_metodo = {}
@@ -201,40 +209,15 @@ async def get_shift_summary(
             metodo = pago.get('metodo', 'efectivo')
             if metodo not in pagos_por_metodo:
                 pagos_por_metodo[metodo] = {'metodo': metodo, 'total': 0}
-            pagos_por_metodo[metodo]['total'] += float(pago.get('monto', 0))
+            pagos_por_metodo[metodo]['total'] += to_cents(pago.get('monto'))
         
-        pagos_por_metodo_list = list(pagos_por_metodo.values())
+        pagos_por_metodo_list = [{**p, 'total': from_cents(p['total'])} for p in pagos_por_metodo.values()]
         
-        total_ventas = sum(
-            float(cast(Dict[str, Any], v).get('total', 0))
-            for v in ventas
-            if isinstance(v, dict)
-        )
-        total_fiado = sum(
-            float(cast(Dict[str, Any], v).get('total', 0))
-            for v in ventas
-            if isinstance(v, dict) and cast(Dict[str, Any], v).get('is_fiado')
-        )
+        ventas_dict = [cast(Dict[str, Any], v) for v in ventas if isinstance(v, dict)]
+        total_ventas = sum_cents(ventas_dict, 'total')
+        total_fiado = sum_cents((v for v in ventas_dict if v.get('is_fiado')), 'total')
         num_tickets = len(ventas)
         
-        # Obtener información del cajero que abrió el turno
-        cajero_info = None
-        apertura_por = shift.get('apertura_por')
-        if apertura_por:
-            try:
-                miembro_result = supabase.table('miembros').select('nombres, apellidos, uuid').eq('uuid', apertura_por).limit(1).execute()
-                if miembro_result.data:
-                    miembro = cast(Dict[str, Any], miembro_result.data[0])
-                    cajero_info = {
-                        'tipo': 'admin',
-                        'nombre': f"{miembro.get('nombres', '')} {miembro.get('apellidos', '')}".strip(),
-                        'uuid': miembro.get('uuid')
-                    }
-            except:
-                pass
-        
-        # Obtener todos los meseros asignados a este turno (no solo los que vendieron)
-        meseros_result = supabase.table('usuarios_temporales').select('uuid, username, display_name, miembro_uuid, pin_plain').eq('shift_uuid', shift_uuid).execute()
         meseros_data = meseros_result.data or []
         mesero_uuids = {cast(Dict[str, Any], m).get('uuid') for m in meseros_data}
         
@@ -245,23 +228,59 @@ async def get_shift_summary(
             if isinstance(v, dict) and cast(Dict[str, Any], v).get('vendedor_uuid')
         )
         
+        # Otros vendedores (no meseros del turno ni el cajero) que hicieron ventas
+        apertura_por = shift.get('apertura_por')
+        otros_vendedores_uuids = vendedor_uuids_con_ventas - mesero_uuids
+        otros_vendedores_uuids.discard(apertura_por)
+        otros_vendedores_uuids = [u for u in otros_vendedores_uuids if u]
+        
+        # Fase 2: nombres del cajero, de los meseros y de otros vendedores en una sola
+        # consulta in_() (los meseros ya traen su miembro_uuid de la fase 1).
+        # Son datos de enriquecimiento: si falla, el resumen sale sin nombres.
+        miembro_uuids = set(otros_vendedores_uuids)
+        if apertura_por:
+            miembro_uuids.add(apertura_por)
+        miembro_uuids.update(
+            cast(Dict[str, Any], m)['miembro_uuid'] for m in meseros_data
+            if cast(Dict[str, Any], m).get('miembro_uuid')
+        )
+        miembros_dict: Dict[str, Dict[str, Any]] = {}
+        if miembro_uuids:
+            try:
+                miembros_result = await run_query(
+                    supabase.table('miembros').select('uuid, nombres, apellidos').in_('uuid', list(miembro_uuids))
+                )
+            except Exception as e:
+                logger.warning(f"Could not load seller names for shift {shift_uuid}: {e}")
+            else:
+                for miembro_data in (miembros_result.data or []):
+                    miembro = cast(Dict[str, Any], miembro_data)
+                    if miembro.get('uuid'):
+                        miembros_dict[miembro['uuid']] = miembro
+        
+        def _nombre(miembro: Dict[str, Any]) -> str:
+            return f"{miembro.get('nombres', '')} {miembro.get('apellidos', '')}".strip()
+        
+        # Información del cajero que abrió el turno
+        cajero_info = None
+        if apertura_por in miembros_dict:
+            cajero_info = {
+                'tipo': 'admin',
+                'nombre': _nombre(miembros_dict[apertura_por]),
+                'uuid': apertura_por
+            }
+        
         # Verificar si el cajero/admin hizo ventas
         cajero_vendio = False
         if cajero_info and cajero_info['uuid'] in vendedor_uuids_con_ventas:
             cajero_vendio = True
         
+        # Todos los meseros asignados a este turno (no solo los que vendieron)
         meseros_info = []
         for mesero_data in meseros_data:
             mesero = cast(Dict[str, Any], mesero_data)
-            miembro_nombre = None
-            if mesero.get('miembro_uuid'):
-                try:
-                    miembro_result = supabase.table('miembros').select('nombres, apellidos, documento').eq('uuid', mesero['miembro_uuid']).limit(1).execute()
-                    if miembro_result.data:
-                        miembro = cast(Dict[str, Any], miembro_result.data[0])
-                        miembro_nombre = f"{miembro.get('nombres', '')} {miembro.get('apellidos', '')}".strip()
-                except:
-                    pass
+            miembro = miembros_dict.get(mesero.get('miembro_uuid') or '')
+            miembro_nombre = _nombre(miembro) if miembro else None
             
             meseros_info.append({
                 'tipo': 'mesero',
@@ -273,32 +292,22 @@ async def get_shift_summary(
                 'hizo_ventas': mesero.get('uuid') in vendedor_uuids_con_ventas  # Indicador si vendió o no
             })
         
-        # Buscar otros vendedores (no meseros del turno ni el cajero) que hicieron ventas
-        otros_vendedores_uuids = vendedor_uuids_con_ventas - mesero_uuids
-        if cajero_info:
-            otros_vendedores_uuids.discard(cajero_info['uuid'])
-        
         otros_vendedores = []
         for vendedor_uuid in otros_vendedores_uuids:
-            if vendedor_uuid:
-                try:
-                    # Buscar en miembros
-                    miembro_result = supabase.table('miembros').select('nombres, apellidos').eq('uuid', vendedor_uuid).limit(1).execute()
-                    if miembro_result.data:
-                        miembro = cast(Dict[str, Any], miembro_result.data[0])
-                        otros_vendedores.append({
-                            'tipo': 'otro',
-                            'nombre': f"{miembro.get('nombres', '')} {miembro.get('apellidos', '')}".strip(),
-                            'hizo_ventas': True
-                        })
-                except:
-                    pass
+            miembro = miembros_dict.get(vendedor_uuid)
+            if not miembro:
+                continue
+            otros_vendedores.append({
+                'tipo': 'otro',
+                'nombre': _nombre(miembro),
+                'hizo_ventas': True
+            })
         
         return {
             "shift": shift,
             "num_tickets": num_tickets,
-            "total_ventas": total_ventas,
-            "total_fiado": total_fiado,
+            "total_ventas": from_cents(total_ventas),
+            "total_fiado": from_cents(total_fiado),
             "pagos_por_metodo": pagos_por_metodo_list,
             "cajero": cajero_info,
             "cajero_vendio": cajero_vendio,
@@ -328,7 +337,7 @@ async def close_shift(
             raise HTTPException(status_code=404, detail="Turno no encontrado")
         
         shift = cast(Dict[str, Any], shift_result.data[0])
-        efectivo_inicial = float(shift.get('efectivo_inicial', 0)) if shift.get('efectivo_inicial') else 0
+        efectivo_inicial = to_cents(shift.get('efectivo_inicial'))
         
         # Obtener todas las ventas del turno
         ventas_result = supabase.table('ventas').select('uuid').eq('shift_uuid', shift_uuid).eq('is_deleted', False).execute()
@@ -341,25 +350,22 @@ async def close_shift(
             pagos_result = supabase.table('pagos_venta').select('*').in_('venta_uuid', venta_uuids).eq('metodo', 'efectivo').execute()
             pagos = pagos_result.data or []
             
-            total_efectivo = sum(
-                float(cast(Dict[str, Any], p).get('monto', 0))
-                for p in pagos
-                if isinstance(p, dict)
-            )
+            total_efectivo = sum_cents((cast(Dict[str, Any], p) for p in pagos if isinstance(p, dict)), 'monto')
         
-        # Calcular efectivo esperado: inicial + ventas en efectivo
+        # Calcular efectivo esperado: inicial + ventas en efectivo (centavos)
         efectivo_calculado = efectivo_inicial + total_efectivo
         
         result = supabase.table('caja_shift').update({
             'cierre_por': actor_uuid,
             'cierre_fecha': datetime.now(timezone.utc).isoformat(),
-            'efectivo_recuento': efectivo_calculado,  # Calculado automáticamente
+            'efectivo_recuento': from_cents(efectivo_calculado),  # Calculado automáticamente
             'estado': 'cerrada',
             'notas': close_data.notas
         }).eq('uuid', shift_uuid).execute()
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Turno no encontrado")
+        bump_resource_version("caja_shift")
         
         # Desactivar todos los usuarios temporales activos
         desactivar_result = supabase.table('usuarios_temporales')\
@@ -368,14 +374,15 @@ async def close_shift(
             .execute()
         
         usuarios_desactivados = len(desactivar_result.data) if desactivar_result.data else 0
+        active_meseros.revoke_all()
         
         logger.info(f"Turno {shift_uuid} cerrado. {usuarios_desactivados} usuarios temporales desactivados.")
         
         return {
             "message": f"Turno cerrado exitosamente. {usuarios_desactivados} meseros desactivados.",
-            "efectivo_calculado": efectivo_calculado,
-            "total_ventas_efectivo": total_efectivo,
-            "efectivo_inicial": efectivo_inicial
+            "efectivo_calculado": from_cents(efectivo_calculado),
+            "total_ventas_efectivo": from_cents(total_efectivo),
+            "efectivo_inicial": from_cents(efectivo_inicial)
         }
     except HTTPException:
         raise
@@ -437,6 +444,7 @@ async def list_shifts(
         raise HTTPException(status_code=500, detail="Error al listar turnos")
 
 @pos_shifts_router.get("/caja-shifts/activo")
+@conditional_get("caja_shift")
 async def get_active_shift() -> Dict[str, Any]:
     """Obtener el turno actualmente abierto (si existe) con información enriquecida"""
     try:
@@ -5,11 +5,15 @@ RF-SALE
 
 from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict, Any, Optional, cast
-from models.models import Venta
+from models.models import Venta, VentasListResponse
 from core import config
+from core.db import gather_queries
+from core.idempotency import idempotent
+from core.mesero_sessions import active_meseros
+from core.money import to_cents
+from core.responses import FastJSONResponse
 from utils.auth import require_pos_access, require_any_authenticated, require_admin
 from datetime import datetime, timezone
-from decimal import Decimal
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,6 +23,7 @@ supabase = config.supabase
 # ============= VENTAS (RF-SALE) =============
 
 @pos_ventas_router.post("/ventas")
+@idempotent("ventas", key_from=lambda kwargs: kwargs['venta'].client_ticket_id)
 async def create_venta(
     venta: Venta,
     current_user: Dict[str, Any] = Depends(require_any_authenticated)
@@ -49,14 +54,23 @@ async def create_venta(
         # VALIDACIÓN CRÍTICA 2: Determinar vendedor_uuid
         if current_user.get('tipo') == 'mesero':
             vendedor_uuid = current_user.get('sub')
-            usuario_temp = supabase.table('usuarios_temporales')\
-                .select('uuid, activo')\
-                .eq('uuid', vendedor_uuid)\
-                .eq('activo', True)\
-                .execute()
-            
-            if not usuario_temp.data:
-                raise HTTPException(status_code=403, detail="Usuario temporal no autorizado")
+            # Meseros habilitados en el turno: sin consulta por venta.
+            # Si no está en el conjunto (p. ej. reinicio) se verifica en la base
+            if not active_meseros.is_active(vendedor_uuid):
+                generation = active_meseros.generation()
+                usuario_temp = supabase.table('usuarios_temporales')\
+                    .select('uuid, activo, fin_validity')\
+                    .eq('uuid', vendedor_uuid)\
+                    .eq('activo', True)\
+                    .execute()
+                
+                if not usuario_temp.data:
+                    raise HTTPException(status_code=403, detail="Usuario temporal no autorizado")
+                active_meseros.restore(
+                    vendedor_uuid,
+                    cast(Dict[str, Any], usuario_temp.data[0]).get('fin_validity'),
+                    generation
+                )
         else:
             vendedor_uuid = current_user.get('miembro_uuid')
             print(f"DEBUG - vendedor_uuid: {current_user}")  # Debug log
@@ -82,10 +96,10 @@ async def create_venta(
             
             if cuenta_result.data:
                 cuenta = cast(Dict[str, Any], cuenta_result.data[0])
-                # Calcular total de la venta sumando los items
-                total_venta = sum(float(item.total_item) for item in venta.items)
-                nuevo_saldo = float(cuenta.get('saldo_deudor', 0)) + total_venta
-                if nuevo_saldo > float(cuenta.get('limite_credito', 0)):
+                # Calcular total de la venta sumando los items (centavos)
+                total_venta = sum(item.total_item for item in venta.items)
+                nuevo_saldo = to_cents(cuenta.get('saldo_deudor')) + total_venta
+                if nuevo_saldo > to_cents(cuenta.get('limite_credito')):
                     raise HTTPException(status_code=400, detail="Límite de crédito excedido")
         
         actor_uuid = current_user.get('sub') or current_user.get('uid')
@@ -105,26 +119,12 @@ async def create_venta(
             if ultimo_ticket:
                 siguiente_ticket = int(ultimo_ticket) + 1
         
-        payload = venta.model_dump()
+        # Modo JSON: montos en pesos y cantidades como texto numérico (create_sale castea a numeric)
+        payload = venta.model_dump(mode='json')
         payload['shift_uuid'] = shift_uuid
         payload['vendedor_uuid'] = vendedor_uuid
         payload['numero_ticket'] = siguiente_ticket
         
-        # Convertir Decimals a float
-        for item in payload.get('items', []):
-            if 'cantidad' in item:
-                item['cantidad'] = float(item['cantidad'])
-            if 'precio_unitario' in item:
-                item['precio_unitario'] = float(item['precio_unitario'])
-            if 'descuento' in item:
-                item['descuento'] = float(item['descuento'])
-            if 'total_item' in item:
-                item['total_item'] = float(item['total_item'])
-        
-        for pago in payload.get('pagos', []):
-            if 'monto' in pago:
-                pago['monto'] = float(pago['monto'])
-        
         result = supabase.rpc('create_sale', {
             'p_payload': payload,
             'p_actor_uuid': actor_uuid
@@ -155,7 +155,7 @@ async def create_venta(
         logger.error(f"Error creating venta: {e}")
         raise HTTPException(status_code=500, detail=f"Error al crear venta: {str(e)}")
 
-@pos_ventas_router.get("/ventas")
+@pos_ventas_router.get("/ventas", response_model=VentasListResponse)
 async def list_ventas(
     shift_uuid: Optional[str] = None,
     miembro_uuid: Optional[str] = None,
@@ -165,7 +165,7 @@ async def list_ventas(
     page: int = 1,
     page_size: int = 50,
     current_user: Dict[str, Any] = Depends(require_pos_access)
-) -> Dict[str, Any]:
+) -> FastJSONResponse:
     """RF-REPORT-02: Listar ventas con filtros"""
     try:
         query = supabase.table('ventas').select('*').eq('is_deleted', False)
@@ -187,12 +187,12 @@ async def list_ventas(
         
         result = query.execute()
         
-        return {
+        return FastJSONResponse({
             "ventas": result.data,
             "total": result.count,
             "page": page,
             "page_size": page_size
-        }
+        })
     except Exception as e:
         logger.error(f"Error listing ventas: {e}")
         raise HTTPException(status_code=500, detail="Error al listar ventas")
@@ -204,15 +204,17 @@ async def get_venta(
 ) -> Dict[str, Any]:
     """Obtener detalle de venta con items y pagos"""
     try:
-        venta_result = supabase.table('ventas').select('*').eq('uuid', venta_uuid).execute()
-        
+        venta_result, items_result, pagos_result = await gather_queries(
+            supabase.table('ventas').select('*').eq('uuid', venta_uuid),
+            supabase.table('venta_items').select('*').eq('venta_uuid', venta_uuid),
+            supabase.table('pagos_venta').select('*').eq('venta_uuid', venta_uuid),
+        )
+
         if not venta_result.data:
             raise HTTPException(status_code=404, detail="Venta no encontrada")
-        
+
         venta = venta_result.data[0]
-        items_result = supabase.table('venta_items').select('*').eq('venta_uuid', venta_uuid).execute()
-        pagos_result = supabase.table('pagos_venta').select('*').eq('venta_uuid', venta_uuid).execute()
-        
+
         return {
             "venta": venta,
             "items": items_result.data,
@@ -231,27 +233,27 @@ async def get_venta_detalle(
 ) -> Dict[str, Any]:
     """Obtener detalle completo de una venta incluyendo items y productos"""
     try:
-        venta_result = supabase.table('ventas').select(
-            '*, miembros!ventas_miembro_uuid_fkey(nombres, apellidos)'
-        ).eq('uuid', venta_uuid).execute()
-        
+        venta_result, items_result, pagos_result = await gather_queries(
+            supabase.table('ventas').select(
+                '*, miembros!ventas_miembro_uuid_fkey(nombres, apellidos)'
+            ).eq('uuid', venta_uuid),
+            supabase.table('venta_items').select(
+                '*, productos(nombre, precio, categoria_uuid, categorias_producto(nombre))'
+            ).eq('venta_uuid', venta_uuid).eq('is_deleted', False),
+            supabase.table('pagos_venta').select('*').eq('venta_uuid', venta_uuid),
+        )
+
         if not venta_result.data:
             raise HTTPException(status_code=404, detail="Venta no encontrada")
-        
+
         venta = cast(Dict[str, Any], venta_result.data[0])
-        
-        items_result = supabase.table('venta_items').select(
-            '*, productos(nombre, precio, categoria_uuid, categorias_producto(nombre))'
-        ).eq('venta_uuid', venta_uuid).eq('is_deleted', False).execute()
-        
-        pagos_result = supabase.table('pagos_venta').select('*').eq('venta_uuid', venta_uuid).execute()
-        
+
         return {
             "venta": venta,
             "items": items_result.data or [],
             "pagos": pagos_result.data or [],
-            "subtotal": float(venta.get('subtotal', 0)),
-            "total": float(venta.get('total', 0))
+            "subtotal": venta.get('subtotal') or 0,
+            "total": venta.get('total') or 0
         }
     except HTTPException:
         raise
@@ -1,24 +1,30 @@
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter
+from fastapi.exceptions import RequestValidationError
 from starlette.middleware.cors import CORSMiddleware
-from starlette.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from core import config
 from routes import (
     admin_router, auth_router, miembros_router, observaciones_router, grupos_router, dashboard_router,
-    pos_reportes_router, pos_inventario_router, pos_meseros_router, pos_shifts_router, pos_ventas_router, pos_cuentas_router,
-    files_router
+    pos_productos_router, pos_reportes_router, pos_inventario_router, pos_meseros_router, pos_shifts_router,
+    pos_ventas_router, pos_cuentas_router, files_router
 )
-from routes.pos_productos import pos_productos_router
-from routes.pos_ventas import pos_ventas_router
-from routes.pos_shifts import pos_shifts_router
-from routes.pos_cuentas import pos_cuentas_router
-from routes.pos_meseros import pos_meseros_router
-from routes.pos_inventario import pos_inventario_router
 from routes.monitoring import monitoring_router
+from routes.files import MAX_UPLOAD_BYTES
+from routes.miembros import MAX_FOTO_BYTES
+from core.uploads import UploadSizeLimitMiddleware
+from core.bulkhead import Bulkhead, BulkheadMiddleware, WRITE_METHODS
+from core.timing import RequestTimingMiddleware
+from core.compression import CompressionMiddleware
+from core.responses import FastJSONResponse, validation_exception_handler
+from utils.firebase_tokens import ensure_firebase_app
+import asyncio
 import os
 import logging
-import time
-from starlette.requests import Request
 
 logging.basicConfig(
        level=getattr(logging, config.log_level.upper()),
@@ -28,12 +34,42 @@ logger = logging.getLogger(__name__)
 
 supabase = config.supabase
 
+
+def _warm_up_clients():
+    """Crear el cliente de Supabase e inicializar Firebase fuera del camino del primer request"""
+    started = time.perf_counter()
+    try:
+        supabase.get_client()
+    except Exception as e:
+        logger.error(f"Supabase client warm-up failed: {e}")
+    ensure_firebase_app()
+    logger.info(f"Clients warmed up in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Los clientes pesados (supabase, firebase_admin) se cargan en segundo plano:
+    # el worker empieza a aceptar conexiones sin esperarlos
+    logger.info(f"App ready in {(time.perf_counter() - _import_started) * 1000:.0f}ms")
+    warm_up = None
+    if getattr(supabase, 'initialized', True) is False:
+        warm_up = asyncio.create_task(asyncio.to_thread(_warm_up_clients))
+    yield
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
+    if hasattr(supabase, 'close'):
+        supabase.close()
+
+
 app = FastAPI(
     title="Sistema Iglesia API",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
+app.add_exception_handler(RequestValidationError, validation_exception_handler)
 api_router = APIRouter()
 
 
@@ -73,6 +109,41 @@ app.include_router(pos_reportes_router, prefix="/api/pos")
 
 # ============= MIDDLEWARE (Orden importa!) =============
 
+# 0. Límite de tamaño en uploads: se agrega primero para quedar dentro de CORS
+#    (el 413 sale con sus headers) y rechazar antes de parsear el multipart
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/api/upload-image": MAX_UPLOAD_BYTES,
+        "/api/miembros/upload-foto": MAX_FOTO_BYTES,
+    },
+)
+
+# 0b. Bulkheads por prioridad: las ventas no compiten con los reportes pesados.
+#     Dentro de CORS y de timing: los 429/503 salen con sus headers y se miden
+if config.BULKHEADS_ENABLED:
+    app.add_middleware(
+        BulkheadMiddleware,
+        classes=[
+            Bulkhead("pos_critical", config.BULKHEAD_POS_CONCURRENCY, config.BULKHEAD_POS_QUEUE,
+                     config.BULKHEAD_POS_QUEUE_TIMEOUT, shed_status=503, retry_after=2),
+            Bulkhead("interactive", config.BULKHEAD_INTERACTIVE_CONCURRENCY, config.BULKHEAD_INTERACTIVE_QUEUE,
+                     config.BULKHEAD_INTERACTIVE_QUEUE_TIMEOUT, shed_status=503, retry_after=5),
+            Bulkhead("reports", config.BULKHEAD_REPORTS_CONCURRENCY, config.BULKHEAD_REPORTS_QUEUE,
+                     config.BULKHEAD_REPORTS_QUEUE_TIMEOUT, shed_status=429, retry_after=30),
+        ],
+        rules=[
+            ("reports", ("GET",), "/api/pos/reportes/*"),
+            ("reports", ("GET",), "/api/pos/cuentas/*/movimientos"),
+            ("reports", ("GET",), "/api/pos/sync/pull"),
+            ("reports", ("GET",), "/api/pos/admin/audit-logs"),
+            ("reports", ("GET",), "/api/dashboard/stats"),
+            ("pos_critical", WRITE_METHODS, "/api/pos/*"),
+        ],
+        default="interactive",
+        exempt=["/", "/health", "/api/metrics*", "/docs*", "/redoc", "/openapi.json"],
+    )
+
 # 1. Trusted Host (seguridad)
 allowed_hosts = os.environ.get('ALLOWED_HOSTS', '*').split(',')
 if '*' not in allowed_hosts:
@@ -87,19 +158,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 3. GZip Compression (reduce tamaño de respuestas en ~70%)
-app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=6)
-
-# 4. Request timing middleware (performance monitoring)
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(f"{process_time:.4f}")
-    
-    # Log slow requests (> 1 segundo)
-    if process_time > 1.0:
-        logger.warning(f"Slow request: {request.method} {request.url.path} took {process_time:.4f}s")
-    
-    return response
\ No newline at end of file
+# 3. Compresión br/zstd/gzip (reduce tamaño de respuestas en ~70-80%);
+#    los GET repetidos se sirven desde la caché de cuerpos comprimidos
+app.add_middleware(CompressionMiddleware, minimum_size=config.COMPRESSION_MIN_SIZE)
+
+# 4. Request timing (performance monitoring): el último agregado queda afuera
+#    de todos, mide el request completo y los bytes ya comprimidos
+app.add_middleware(RequestTimingMiddleware, db_client=supabase)
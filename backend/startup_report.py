@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Reporte de tiempos de importación al arrancar la app
+Corre `python -X importtime -c "import server"` en un proceso nuevo (sin
+cachés de módulos del proceso actual) y muestra:
+
+- tiempo total de `import server` (reloj de pared)
+- los módulos más lentos por tiempo acumulado (incluye sus dependencias)
+- el total por paquete de primer nivel (fastapi, supabase, firebase_admin...)
+
+Sirve para detectar imports pesados que se cuelan al arranque: supabase y
+firebase_admin deberían cargarse recién en el precalentamiento o en el primer
+request, no al importar la app.
+
+Ejecutar con:
+    python startup_report.py [--top 25] [--budget-ms 800] [--repeat 3] [--json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# El reloj de pared se mide dentro del proceso hijo, así no cuenta el arranque del intérprete
+_IMPORT_SNIPPET = (
+    "import time, sys; t = time.perf_counter(); import server; "
+    "sys.stderr.write(f'@@wall_us {(time.perf_counter() - t) * 1e6:.0f}\\n')"
+)
+
+
+def _child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("FIREBASE_CREDENTIALS_PATH", "firebase-disabled.json")
+    env.setdefault("LOG_LEVEL", "CRITICAL")
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    # Sin .pyc desactualizados de por medio: lo que se mide es el arranque normal
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def run_importtime() -> Tuple[int, List[Tuple[str, int, int]]]:
+    """Importar server en un proceso nuevo; devuelve (pared_us, [(módulo, self_us, acumulado_us)])"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _IMPORT_SNIPPET],
+        cwd=BACKEND_DIR,
+        env=_child_env(),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import server falló:\n{proc.stderr[-2000:]}")
+
+    wall_us = 0
+    modules: List[Tuple[str, int, int]] = []
+    for line in proc.stderr.splitlines():
+        if line.startswith("@@wall_us "):
+            wall_us = int(line.split()[1])
+            continue
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # encabezado "self [us] | cumulative | imported package"
+        modules.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return wall_us, modules
+
+
+def summarize(wall_us: int, modules: List[Tuple[str, int, int]], top: int) -> Dict:
+    packages: Dict[str, int] = {}
+    for name, self_us, _ in modules:
+        package = name.split(".", 1)[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    slowest = sorted(modules, key=lambda m: m[2], reverse=True)[:top]
+    return {
+        "wall_ms": round(wall_us / 1000, 1),
+        "modules_imported": len(modules),
+        "slowest_modules": [
+            {"module": name, "self_ms": round(s / 1000, 1), "cumulative_ms": round(c / 1000, 1)}
+            for name, s, c in slowest
+        ],
+        "packages": [
+            {"package": name, "self_ms": round(us / 1000, 1)}
+            for name, us in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top]
+        ],
+    }
+
+
+def print_report(report: Dict, budget_ms: Optional[float]):
+    print("=" * 64)
+    print(f"🚀 Arranque: import server en {report['wall_ms']:.0f}ms ({report['modules_imported']} módulos)")
+    print("=" * 64)
+
+    print(f"\n{'módulo (acumulado)':<48}{'propio':>8}{'total':>8}")
+    for row in report["slowest_modules"]:
+        print(f"{row['module'][:47]:<48}{row['self_ms']:>7.1f}{row['cumulative_ms']:>8.1f}")
+
+    print(f"\n{'paquete':<48}{'propio':>8}")
+    for row in report["packages"]:
+        print(f"{row['package'][:47]:<48}{row['self_ms']:>7.1f}")
+
+    if budget_ms is not None:
+        mark = "✅" if report["wall_ms"] <= budget_ms else "❌"
+        print(f"\n{mark} Presupuesto: {report['wall_ms']:.0f}ms / {budget_ms:.0f}ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tiempos de importación al arrancar la app")
+    parser.add_argument("--top", type=int, default=25, help="Cantidad de módulos / paquetes a mostrar")
+    parser.add_argument("--repeat", type=int, default=3, help="Corridas; se reporta la más rápida")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Sale con código 1 si import server tarda más")
+    parser.add_argument("--json", action="store_true", help="Imprimir el reporte como JSON")
+    args = parser.parse_args(argv)
+
+    # La más rápida de varias corridas: la primera suele pagar caché de disco fría
+    runs = [run_importtime() for _ in range(max(1, args.repeat))]
+    wall_us, modules = min(runs, key=lambda run: run[0])
+    report = summarize(wall_us, modules, args.top)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.budget_ms)
+
+    if args.budget_ms is not None and report["wall_ms"] > args.budget_ms:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
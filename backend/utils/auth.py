@@ -1,15 +1,20 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, FrozenSet
+from collections import OrderedDict
 import jwt
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import hashlib
 import os
-from .permissions import Permission, Role, has_permission, has_any_permission, can_access_section
+import threading
+import time
+from .permissions import Permission, Role, PERMISSION_BITS, SECTION_MASKS, get_role_mask, get_role_permissions, permissions_mask
 
 # JWT config
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'super-secret-key-change-in-production')
 JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRE_MINUTES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRE_MINUTES', '1440'))
+TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '2048'))
 
 security = HTTPBearer()
 
@@ -23,14 +28,99 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
-    token = credentials.credentials
+class Principal(dict):
+    """
+    Payload verificado del token, inmutable y con la autorización precalculada
+
+    Sigue siendo un dict (los handlers usan current_user.get('sub')), pero no
+    admite modificaciones porque la misma instancia se reutiliza entre requests.
+    """
+    __slots__ = ('role', 'permissions', 'permission_mask', 'is_mesero', 'expires_at')
+
+    def __init__(self, payload: Dict[str, Any]):
+        super().__init__(payload)
+        self.role: Optional[str] = payload.get("role")
+        self.permissions: FrozenSet[Permission] = frozenset(get_role_permissions(self.role)) if self.role else frozenset()
+        self.permission_mask: int = get_role_mask(self.role) if self.role else 0
+        self.is_mesero: bool = payload.get("tipo") == "mesero"
+        self.expires_at: Optional[float] = payload.get("exp")
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Principal es de solo lectura")
+
+    __setitem__ = __delitem__ = _readonly
+    update = pop = popitem = setdefault = clear = _readonly
+
+    def has_permission(self, permission: Permission) -> bool:
+        return bool(self.permission_mask & PERMISSION_BITS[permission])
+
+    def has_any_mask(self, mask: int) -> bool:
+        return bool(self.permission_mask & mask)
+
+    def can_access_section(self, section: str) -> bool:
+        return bool(self.permission_mask & SECTION_MASKS.get(section, 0))
+
+
+class TokenCache:
+    """LRU acotado de tokens ya verificados (clave: digest del token)"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Principal]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, digest: bytes) -> Optional[Principal]:
+        """Obtener principal si el token sigue vigente"""
+        with self._lock:
+            principal = self._entries.get(digest)
+            if principal is None:
+                self._misses += 1
+                return None
+            if principal.expires_at is not None and time.time() >= principal.expires_at:
+                del self._entries[digest]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self._hits += 1
+            return principal
+
+    def set(self, digest: bytes, principal: Principal):
+        with self._lock:
+            self._entries[digest] = principal
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self._hits + self._misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': f"{(self._hits / total * 100):.2f}%" if total else "0.00%",
+        }
+
+
+# Instancia global (por worker)
+token_cache = TokenCache(max_entries=TOKEN_CACHE_SIZE)
+
+
+def verify_token(token: str) -> Principal:
+    """Verificar un JWT y devolver su principal, usando el caché cuando es posible"""
+    digest = hashlib.sha256(token.encode()).digest()
+    principal = token_cache.get(digest)
+    if principal is not None:
+        return principal
+
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        uid = payload.get("sub")
-        if uid is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return payload
     except jwt.ExpiredSignatureError:
         print("❌ Token expired")
         raise HTTPException(status_code=401, detail="Token expired")
@@ -38,18 +128,28 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         print(f"❌ JWT Error: {e}")
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    principal = Principal(payload)
+    token_cache.set(digest, principal)
+    return principal
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    return verify_token(credentials.credentials)
+
 # Guards tradicionales (mantener compatibilidad)
-async def require_admin(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
-    if current_user.get("role") not in ["admin", "ti"]:
+async def require_admin(current_user: Principal = Depends(get_current_user)) -> Dict[str, Any]:
+    if current_user.role not in ["admin", "ti"]:
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
-async def require_auth_user(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
-    if current_user.get("role") not in ["admin", "pastor", "secretaria", "ti"]:
+async def require_auth_user(current_user: Principal = Depends(get_current_user)) -> Dict[str, Any]:
+    if current_user.role not in ["admin", "pastor", "secretaria", "ti"]:
         raise HTTPException(status_code=403, detail="Authorized user required")
     return current_user
 
-async def require_any_authenticated(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+async def require_any_authenticated(current_user: Principal = Depends(get_current_user)) -> Dict[str, Any]:
     """Guard que permite cualquier usuario autenticado (incluyendo meseros)"""
     return current_user
 
@@ -59,12 +159,12 @@ def require_permission(permission: Permission):
     Dependency factory que requiere un permiso específico
     Uso: current_user: Dict = Depends(require_permission(Permission.VIEW_MIEMBROS))
     """
-    async def permission_checker(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    async def permission_checker(current_user: Principal = Depends(get_current_user)) -> Dict[str, Any]:
         user_role = current_user.get("role")
         if not user_role:
             raise HTTPException(status_code=403, detail="No role assigned")
         
-        if not has_permission(user_role, permission):
+        if not current_user.has_permission(permission):
             raise HTTPException(
                 status_code=403, 
                 detail=f"Permission denied. Required: {permission.value}"
@@ -77,12 +177,14 @@ def require_any_permission(permissions: List[Permission]):
     Dependency factory que requiere al menos uno de los permisos especificados
     Uso: current_user: Dict = Depends(require_any_permission([Permission.VIEW_MIEMBROS, Permission.CREATE_MIEMBROS]))
     """
-    async def permission_checker(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    required_mask = permissions_mask(permissions)
+
+    async def permission_checker(current_user: Principal = Depends(get_current_user)) -> Dict[str, Any]:
         user_role = current_user.get("role")
         if not user_role:
             raise HTTPException(status_code=403, detail="No role assigned")
         
-        if not has_any_permission(user_role, permissions):
+        if not current_user.has_any_mask(required_mask):
             perms_str = ", ".join([p.value for p in permissions])
             raise HTTPException(
                 status_code=403, 
@@ -96,7 +198,7 @@ def require_role(allowed_roles: List[str]):
     Dependency factory que requiere uno de los roles especificados
     Uso: current_user: Dict = Depends(require_role([Role.ADMIN, Role.AGENTE_RESTAURANTE]))
     """
-    async def role_checker(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    async def role_checker(current_user: Principal = Depends(get_current_user)) -> Dict[str, Any]:
         user_role = current_user.get("role")
         if not user_role:
             raise HTTPException(status_code=403, detail="No role assigned")
@@ -111,23 +213,20 @@ def require_role(allowed_roles: List[str]):
     return role_checker
 
 # Guards específicos para secciones
-async def require_pos_access(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+async def require_pos_access(current_user: Principal = Depends(get_current_user)) -> Dict[str, Any]:
     """Requiere acceso al módulo POS"""
-    user_role = current_user.get("role")
-    if not user_role or not can_access_section(user_role, "pos"):
+    if not current_user.can_access_section("pos"):
         raise HTTPException(status_code=403, detail="POS access denied")
     return current_user
 
-async def require_miembros_access(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+async def require_miembros_access(current_user: Principal = Depends(get_current_user)) -> Dict[str, Any]:
     """Requiere acceso a la gestión de miembros"""
-    user_role = current_user.get("role")
-    if not user_role or not can_access_section(user_role, "miembros"):
+    if not current_user.can_access_section("miembros"):
         raise HTTPException(status_code=403, detail="Miembros access denied")
     return current_user
 
-async def require_grupos_access(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+async def require_grupos_access(current_user: Principal = Depends(get_current_user)) -> Dict[str, Any]:
     """Requiere acceso a la gestión de grupos"""
-    user_role = current_user.get("role")
-    if not user_role or not can_access_section(user_role, "grupos"):
+    if not current_user.can_access_section("grupos"):
         raise HTTPException(status_code=403, detail="Grupos access denied")
     return current_user
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Verificación de ID tokens de Google (Firebase) para el login
+Al inicio del servicio todo el personal inicia sesión a la vez; para que esos
+logins no se serialicen:
+- los certificados de Google se guardan en memoria según su Cache-Control
+  (max-age) y solo un hilo los descarga cuando vencen
+- los ID tokens ya verificados se recuerdan hasta su exp
+- la fila de app_users se guarda en un caché compartido entre workers (TTL
+  corto; las rutas que la modifican la invalidan)
+- la verificación corre en un hilo para no bloquear el event loop
+- firebase_admin se importa e inicializa en el primer uso (o en el
+  precalentamiento al arrancar), no al importar la app
+"""
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from core import config
+from core.shared_state import SharedStore
+from google.auth import exceptions as google_exceptions
+from google.auth import transport
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class _CachedResponse(transport.Response):
+    """Respuesta HTTP guardada en memoria"""
+
+    def __init__(self, status: int, headers: Dict[str, str], data: bytes):
+        self._status = status
+        self._headers = headers
+        self._data = data
+
+    @property
+    def status(self):
+        return self._status
+
+    @property
+    def headers(self):
+        return self._headers
+
+    @property
+    def data(self):
+        return self._data
+
+
+class CertificateCache(transport.Request):
+    """
+    Transporte de google-auth que sirve los certificados desde memoria
+
+    Respeta el max-age que envía Google. Cuando vence, un solo hilo descarga
+    de nuevo mientras los demás esperan el resultado; si la descarga falla se
+    siguen usando los certificados anteriores.
+    """
+
+    def __init__(self, delegate: Optional[transport.Request] = None, default_max_age: int = 3600):
+        self._delegate_request = delegate
+        self._default_max_age = default_max_age
+        self._entries: Dict[str, Tuple[_CachedResponse, float]] = {}
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    @property
+    def _delegate(self) -> transport.Request:
+        # google.auth.transport.requests carga requests/urllib3: solo al primer uso
+        if self._delegate_request is None:
+            import google.auth.transport.requests
+            self._delegate_request = google.auth.transport.requests.Request()
+        return self._delegate_request
+
+    def __call__(self, url, method='GET', body=None, headers=None, timeout=None, **kwargs):
+        if method != 'GET':
+            return self._delegate(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+        entry = self._entries.get(url)
+        if entry is not None and time.time() < entry[1]:
+            return entry[0]
+
+        with self._lock:
+            # Otro hilo pudo haber renovado mientras esperábamos el lock
+            entry = self._entries.get(url)
+            if entry is not None and time.time() < entry[1]:
+                return entry[0]
+            try:
+                response = self._delegate(url, method='GET', headers=headers, timeout=timeout, **kwargs)
+            except google_exceptions.TransportError as e:
+                if entry is not None:
+                    logger.warning(f"Certificate refresh failed, serving cached certs: {e}")
+                    return entry[0]
+                raise
+            self.fetches += 1
+            if response.status != 200:
+                return response
+
+            cached = _CachedResponse(response.status, dict(response.headers), response.data)
+            match = _MAX_AGE_RE.search(response.headers.get('Cache-Control', '') or '')
+            max_age = int(match.group(1)) if match else self._default_max_age
+            self._entries[url] = (cached, time.time() + max_age)
+            return cached
+
+
+class _VerifiedTokens:
+    """LRU acotado de ID tokens verificados, válidos hasta su exp"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            claims = self._entries.get(digest)
+            if claims is None:
+                return None
+            if time.time() >= claims.get('exp', 0):
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return claims
+
+    def set(self, digest: bytes, claims: Dict[str, Any]):
+        with self._lock:
+            self._entries[digest] = claims
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+certificate_cache = CertificateCache(default_max_age=config.FIREBASE_CERTS_DEFAULT_MAX_AGE)
+_verified_tokens = _VerifiedTokens(max_entries=config.FIREBASE_TOKEN_CACHE_SIZE)
+_app_users = SharedStore('app_users')
+_install_lock = threading.Lock()
+# Versiones mayores de firebase_admin con _get_client(app)._token_verifier.request
+_SUPPORTED_SDK_MAJORS = (6, 7)
+_installed = False
+_app_lock = threading.Lock()
+
+
+def ensure_firebase_app() -> bool:
+    """Inicializar Firebase Admin SDK si hace falta (idempotente); False si falló"""
+    import firebase_admin
+    if firebase_admin._apps:
+        return True
+    with _app_lock:
+        if firebase_admin._apps:
+            return True
+        try:
+            from firebase_admin import credentials
+            firebase_admin.initialize_app(credentials.Certificate(config.FIREBASE_CREDENTIALS_PATH))
+            logger.info("Firebase Admin SDK initialized successfully")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to initialize Firebase Admin SDK: {e}")
+            return False
+
+
+def _install_certificate_cache():
+    """Hacer que el verificador del SDK use el caché de certificados"""
+    global _installed
+    if _installed:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        try:
+            import firebase_admin
+            from firebase_admin import auth as firebase_auth
+            # Atributos privados del SDK: solo en las versiones donde se verificó
+            # la estructura; en otras se usa su transporte (que también cachea)
+            major = int(firebase_admin.__version__.split('.', 1)[0])
+            if major not in _SUPPORTED_SDK_MAJORS:
+                logger.info(
+                    f"firebase_admin {firebase_admin.__version__} not verified for the certificate cache; "
+                    f"using the SDK transport"
+                )
+            else:
+                verifier = firebase_auth._get_client(None)._token_verifier
+                if not isinstance(getattr(verifier, 'request', None), transport.Request):
+                    raise TypeError(f"unexpected token verifier transport {type(getattr(verifier, 'request', None))}")
+                verifier.request = certificate_cache
+        except Exception as e:
+            # App sin inicializar o SDK con otra estructura: se usa el transporte por defecto
+            logger.warning(f"Could not install Firebase certificate cache: {e}")
+        _installed = True
+
+
+def _verify_sync(id_token: str) -> Dict[str, Any]:
+    digest = hashlib.sha256(id_token.encode()).digest()
+    claims = _verified_tokens.get(digest)
+    if claims is None:
+        ensure_firebase_app()
+        _install_certificate_cache()
+        from firebase_admin import auth as firebase_auth
+        claims = firebase_auth.verify_id_token(id_token)
+        _verified_tokens.set(digest, claims)
+    return dict(claims)
+
+
+async def verify_firebase_token(id_token: str) -> Dict[str, Any]:
+    """
+    Verificar un ID token de Firebase (mismas excepciones que firebase_auth.verify_id_token)
+    Se ejecuta en un hilo; las verificaciones repetidas del mismo token no vuelven a validar
+    """
+    return await asyncio.to_thread(_verify_sync, id_token)
+
+
+# ============= FILAS app_users =============
+
+def get_app_user(uid: str) -> Optional[Dict[str, Any]]:
+    """Obtener la fila de app_users (caché compartido con TTL); None si no existe"""
+    entry = _app_users.get(uid)
+    if entry is not None and time.time() < entry.get('expires_at', 0):
+        return entry['row']
+
+    result = config.supabase.table('app_users').select('*').eq('uid', uid).execute()
+    if not result.data:
+        # No se guarda la ausencia: el usuario puede aceptar una invitación enseguida
+        _app_users.delete(uid)
+        return None
+
+    row = dict(result.data[0])
+    _app_users.set(uid, {'row': row, 'expires_at': time.time() + config.APP_USERS_CACHE_TTL_SECONDS})
+    return row
+
+
+def invalidate_app_user(uid: str):
+    """
+    Invalidar tras cambios de rol, estado activo o miembro asociado
+
+    Lo llaman las rutas que escriben app_users (consume_invite y
+    /admin/app-users/{uid}/invalidate). Un cambio hecho directo en Supabase
+    no pasa por aquí: se ve al vencer APP_USERS_CACHE_TTL_SECONDS.
+    """
+    _app_users.delete(uid)
+
+
+def clear_app_users_cache():
+    _app_users.clear()
+
+
+def get_stats() -> Dict[str, Any]:
+    return {
+        'verified_tokens': len(_verified_tokens),
+        'certificate_fetches': certificate_cache.fetches,
+        'app_users_cached': sum(1 for _ in _app_users.keys()),
+    }
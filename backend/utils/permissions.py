@@ -1,8 +1,9 @@
 """
 Sistema de permisos basado en roles para ChurchApp
 """
-from typing import Dict, List, Set
+from typing import Any, Dict, Iterable, List, Set
 from enum import Enum
+import functools
 
 class Permission(str, Enum):
     """Enum con todos los permisos disponibles en el sistema"""
@@ -257,24 +258,51 @@ ROLE_PERMISSIONS: Dict[str, Set[Permission]] = {
     },
 }
 
+# Secciones de la app y los permisos que dan acceso a cada una
+SECTION_PERMISSIONS: Dict[str, List[Permission]] = {
+    "dashboard": [Permission.VIEW_DASHBOARD],
+    "miembros": [Permission.VIEW_MIEMBROS],
+    "grupos": [Permission.VIEW_GRUPOS],
+    "pos": [Permission.VIEW_POS],
+    "admin": [Permission.MANAGE_USERS, Permission.MANAGE_INVITES],
+}
+
+# ============= BITMASKS COMPILADOS =============
+# Cada permiso es un bit; roles y secciones se compilan una sola vez al
+# importar, así cada verificación es un AND de enteros
+
+PERMISSION_BITS: Dict[Permission, int] = {perm: 1 << i for i, perm in enumerate(Permission)}
+
+def permissions_mask(permissions: Iterable[Permission]) -> int:
+    """Compila una colección de permisos en un bitmask"""
+    mask = 0
+    for perm in permissions:
+        mask |= PERMISSION_BITS[perm]
+    return mask
+
+ROLE_MASKS: Dict[str, int] = {str(role.value): permissions_mask(perms) for role, perms in ROLE_PERMISSIONS.items()}
+SECTION_MASKS: Dict[str, int] = {section: permissions_mask(perms) for section, perms in SECTION_PERMISSIONS.items()}
+
+def get_role_mask(role: str) -> int:
+    """Obtiene el bitmask de permisos de un rol (0 si no existe)"""
+    return ROLE_MASKS.get(role, 0)
+
 def get_role_permissions(role: str) -> Set[Permission]:
     """Obtiene los permisos de un rol específico"""
     return ROLE_PERMISSIONS.get(role, set())
 
 def has_permission(role: str, permission: Permission) -> bool:
     """Verifica si un rol tiene un permiso específico"""
-    role_perms = get_role_permissions(role)
-    return permission in role_perms
+    return bool(ROLE_MASKS.get(role, 0) & PERMISSION_BITS[permission])
 
-def has_any_permission(role: str, permissions: List[Permission]) -> bool:
+def has_any_permission(role: str, permissions: Iterable[Permission]) -> bool:
     """Verifica si un rol tiene al menos uno de los permisos especificados"""
-    role_perms = get_role_permissions(role)
-    return any(perm in role_perms for perm in permissions)
+    return bool(ROLE_MASKS.get(role, 0) & permissions_mask(permissions))
 
-def has_all_permissions(role: str, permissions: List[Permission]) -> bool:
+def has_all_permissions(role: str, permissions: Iterable[Permission]) -> bool:
     """Verifica si un rol tiene todos los permisos especificados"""
-    role_perms = get_role_permissions(role)
-    return all(perm in role_perms for perm in permissions)
+    required = permissions_mask(permissions)
+    return ROLE_MASKS.get(role, 0) & required == required
 
 def can_access_section(role: str, section: str) -> bool:
     """
@@ -287,13 +315,17 @@ def can_access_section(role: str, section: str) -> bool:
     - pos: Módulo POS/Restaurante
     - admin: Administración del sistema
     """
-    section_permissions = {
-        "dashboard": [Permission.VIEW_DASHBOARD],
-        "miembros": [Permission.VIEW_MIEMBROS],
-        "grupos": [Permission.VIEW_GRUPOS],
-        "pos": [Permission.VIEW_POS],
-        "admin": [Permission.MANAGE_USERS, Permission.MANAGE_INVITES],
+    return bool(ROLE_MASKS.get(role, 0) & SECTION_MASKS.get(section, 0))
+
+@functools.lru_cache(maxsize=64)
+def get_permissions_payload(role: str) -> Dict[str, Any]:
+    """
+    Respuesta de /auth/permissions para un rol (memoizada)
+    Los permisos de un rol no cambian en tiempo de ejecución; no modificar el resultado
+    """
+    mask = ROLE_MASKS.get(role, 0)
+    return {
+        "role": role,
+        "permissions": [perm.value for perm, bit in PERMISSION_BITS.items() if mask & bit],
+        "sections": {section: bool(mask & section_mask) for section, section_mask in SECTION_MASKS.items()},
     }
-    
-    required_perms = section_permissions.get(section, [])
-    return has_any_permission(role, required_perms)
@@ -358,7 +358,7 @@ const MiembroDetalle = () => {
           <div className="flex justify-center items-center p-4">
             {miembro.foto_url ? (
               <img
-                src={miembro.foto_url}
+                src={miembro.foto_medium_url || miembro.foto_url}
                 alt={`${miembro.nombres} ${miembro.apellidos}`}
                 className="max-w-full max-h-[70vh] object-contain rounded-lg"
                 onError={(_) => {
@@ -168,6 +168,13 @@ export const syncService = {
     const response = await api.get(`${ENDPOINTS.SYNC}/pending`);
     return response.data;
   },
+
+  pullCambios: async (since = null) => {
+    const response = await api.get(`${ENDPOINTS.SYNC}/pull`, {
+      params: since ? { since } : {}
+    });
+    return response.data;
+  },
 };
 
 // ============= INVENTARIO =============
@@ -209,6 +216,7 @@ export const searchMiembros = miembrosService.search;
 export const getMiembroCuenta = miembrosService.getCuenta;
 export const syncPushVentas = syncService.pushVentas;
 export const getSyncPending = syncService.getPending;
+export const syncPullCambios = syncService.pullCambios;
 export const fetchInventario = inventarioService.getAll;
 export const getReporteVentas = reportesService.getVentas;
 export const getReporteCuentasPendientes = reportesService.getCuentasPendientes;